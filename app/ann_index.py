@@ -0,0 +1,150 @@
+# app/ann_index.py
+# ──────────────────────────────────────────────────────────────
+# Índices ANN seleccionables (Flat, IVF-Flat, IVF-PQ, HNSW) a partir
+# del índice plano canónico, y benchmark de recall@k / latencia.
+#
+#   python app/ann_index.py --specs Flat IVF64,Flat IVF64,PQ16 HNSW32 --k 4
+# ──────────────────────────────────────────────────────────────
+import os
+import time
+import json
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+import faiss
+
+ANN_FILE = "ann.faiss"
+ANN_TRAIN_SIZE = int(os.getenv("ANN_TRAIN_SIZE", 50_000))
+
+# Parámetros de búsqueda por defecto según el tipo de índice
+DEFAULT_SEARCH_PARAMS = {"IVF": "nprobe=16", "HNSW": "efSearch=64"}
+
+
+def is_flat(spec: Optional[str]) -> bool:
+    return not spec or spec.replace(" ", "").lower() == "flat"
+
+
+def default_search_params(spec: str) -> str:
+    for prefix, params in DEFAULT_SEARCH_PARAMS.items():
+        if spec.upper().startswith(prefix):
+            return params
+    return ""
+
+
+def flat_vectors(index) -> np.ndarray:
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def build_ann_index(vectors: np.ndarray, spec: str, train_size: int = ANN_TRAIN_SIZE,
+                    search_params: Optional[str] = None, seed: int = 0):
+    """Construye `spec` (sintaxis de `faiss.index_factory`) con las mismas posiciones que `vectors`."""
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    index = faiss.index_factory(vectors.shape[1], spec, faiss.METRIC_L2)
+
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if len(vectors) > train_size:
+            sample = vectors[rng.choice(len(vectors), train_size, replace=False)]
+        try:
+            index.train(sample)
+        except RuntimeError as exc:
+            raise ValueError(
+                f"No se pudo entrenar '{spec}' con {len(sample)} vectores; "
+                "reduce nlist/PQ o usa Flat/HNSW para corpus pequeños"
+            ) from exc
+
+    index.add(vectors)
+    set_search_params(index, spec, search_params)
+    return index
+
+
+def set_search_params(index, spec: str, params: Optional[str] = None) -> None:
+    params = params if params is not None else default_search_params(spec)
+    if params:
+        faiss.ParameterSpace().set_index_parameters(index, params)
+
+
+def index_bytes(index) -> int:
+    return int(faiss.serialize_index(index).size)
+
+
+# ──────────────────────────────────────────────────────────────
+# Benchmark
+# ──────────────────────────────────────────────────────────────
+def sample_queries(vectors: np.ndarray, n_queries: int = 200, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    # Consultas sintéticas: vectores del corpus con ruido gaussiano
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)]
+    scale = noise * float(np.linalg.norm(vectors, axis=1).mean()) / np.sqrt(vectors.shape[1])
+    return (picked + rng.normal(0, scale, picked.shape)).astype("float32")
+
+
+def _latencies_ms(index, queries: np.ndarray, k: int):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids[0])
+    return np.array(latencies), np.array(results)
+
+
+def benchmark(vectors: np.ndarray, specs: List[str], queries: np.ndarray, k: int = 4) -> List[Dict]:
+    """recall@k frente a Flat exacto, latencia p50/p95 por consulta y tamaño del índice."""
+    baseline = build_ann_index(vectors, "Flat")
+    _, truth = _latencies_ms(baseline, queries, k)
+
+    rows = []
+    for spec in specs:
+        start = time.perf_counter()
+        index = build_ann_index(vectors, spec)
+        build_s = time.perf_counter() - start
+        latencies, found = _latencies_ms(index, queries, k)
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+        rows.append({
+            "spec": spec,
+            "recall_at_k": round(float(recall), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+            "build_s": round(build_s, 3),
+            "index_mb": round(index_bytes(index) / 1e6, 3),
+        })
+    return rows
+
+
+def format_benchmark(rows: List[Dict], k: int) -> str:
+    lines = [f"{'índice':<20} {f'recall@{k}':>10} {'p50 ms':>9} {'p95 ms':>9} {'build s':>8} {'MB':>9}"]
+    for r in rows:
+        lines.append(
+            f"{r['spec']:<20} {r['recall_at_k']:>10.3f} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} "
+            f"{r['build_s']:>8.2f} {r['index_mb']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de índices ANN sobre el vectorstore")
+    parser.add_argument("--vectorstore", default="vectorstore")
+    parser.add_argument("--specs", nargs="+", default=["Flat", "IVF64,Flat", "IVF64,PQ16", "HNSW32"])
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output", help="Ruta JSON opcional para guardar los resultados")
+    args = parser.parse_args(argv)
+
+    flat = faiss.read_index(os.path.join(args.vectorstore, "index.faiss"))
+    vectors = flat_vectors(flat)
+    queries = sample_queries(vectors, args.queries)
+    rows = benchmark(vectors, args.specs, queries, k=args.k)
+
+    print(f"📐 {len(vectors)} vectores · dim {vectors.shape[1]} · {len(queries)} consultas")
+    print(format_benchmark(rows, args.k))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# app/answer_cache.py
+# ──────────────────────────────────────────────────────────────
+# Caché semántica de respuestas delante de la cadena conversacional.
+# La clave es el embedding de la pregunta autónoma (ya condensada con
+# el historial) dentro de un espacio de nombres formado por la versión
+# del prompt, la versión del índice y las entradas extra (p. ej. sport).
+# ──────────────────────────────────────────────────────────────
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from langchain.chains.conversational_retrieval.base import _get_chat_history
+
+ANSWER_CACHE_THRESHOLD   = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+ANSWER_CACHE_TTL         = float(os.getenv("ANSWER_CACHE_TTL", 24 * 3600))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1_000))
+
+
+class SemanticAnswerCache:
+    """Caché en memoria por similitud coseno, con TTL y desalojo LRU."""
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl: float = ANSWER_CACHE_TTL,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES, clock: Callable[[], float] = time.time):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _expire(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if now - entry["created"] > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, vector, namespace: Tuple) -> Optional[Dict[str, Any]]:
+        query = _normalize(vector)
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            candidates = [(key, e) for key, e in self._entries.items() if e["namespace"] == namespace]
+            if candidates:
+                sims = np.stack([e["vector"] for _, e in candidates]) @ query
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)  # LRU
+                    self.hits += 1
+                    self.saved_seconds += entry["latency"]
+                    return {**entry["output"], "cache_similarity": float(sims[best])}
+            self.misses += 1
+            return None
+
+    def store(self, vector, namespace: Tuple, output: Dict[str, Any], latency: float) -> None:
+        with self._lock:
+            self._entries[self._next_id] = {
+                "vector": _normalize(vector),
+                "namespace": namespace,
+                "output": output,
+                "latency": latency,
+                "created": self.clock(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "entries": len(self._entries),
+        }
+
+
+def _normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype="float32")
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class CachedConversationalChain:
+    """Envuelve la cadena de `build_chain` y responde desde caché si la pregunta es equivalente.
+
+    Condensa la pregunta con el historial una sola vez: en caso de fallo de
+    caché, la cadena se invoca con la pregunta ya autónoma y sin historial,
+    y el retriever reutiliza el embedding calculado para la búsqueda en caché.
+    """
+
+    def __init__(self, chain, embeddings, prompt_version: str, index_version: Callable[[], str],
+                 cache: Optional[SemanticAnswerCache] = None):
+        self.chain = chain
+        self.embeddings = embeddings
+        self.prompt_version = prompt_version
+        self.index_version = index_version
+        self.cache = cache if cache is not None else SemanticAnswerCache()
+        self._seen_version = None
+
+    def __getattr__(self, name):
+        # Acceso transparente a retriever, question_generator, etc.
+        if name == "chain":
+            raise AttributeError(name)
+        return getattr(self.chain, name)
+
+    def standalone_question(self, question: str, chat_history, config=None) -> str:
+        history = _get_chat_history(chat_history or [])
+        if not history:
+            return question
+        return self.chain.question_generator.invoke(
+            {"question": question, "chat_history": history}, config=config
+        )["text"]
+
+    def invoke(self, inputs: Dict[str, Any], config=None, **kwargs) -> Dict[str, Any]:
+        # Si el vectorstore se reconstruyó, todo lo cacheado queda obsoleto
+        version = self.index_version()
+        if version != self._seen_version:
+            self.cache.clear()
+            self._seen_version = version
+
+        question = self.standalone_question(inputs["question"], inputs.get("chat_history"), config)
+        extra = tuple(sorted((k, str(v)) for k, v in inputs.items() if k not in ("question", "chat_history")))
+        namespace = (self.prompt_version, version) + extra
+        vector = self.embeddings.embed_query(question)
+
+        cached = self.cache.lookup(vector, namespace)
+        if cached is not None:
+            return {**cached, "question": inputs["question"], "cached": True}
+
+        from app.retrievers import reuse_query_vector
+
+        start = time.perf_counter()
+        with reuse_query_vector(question, vector):
+            output = self.chain.invoke({**inputs, "question": question, "chat_history": []}, config=config, **kwargs)
+        output = {**output, "question": inputs["question"], "chat_history": inputs.get("chat_history", [])}
+        cacheable = {k: output[k] for k in ("answer", "source_documents") if k in output}
+        self.cache.store(vector, namespace, cacheable, time.perf_counter() - start)
+        return {**output, "cached": False}
+
+    def stats(self) -> Dict[str, float]:
+        return self.cache.stats()
@@ -0,0 +1,264 @@
+# app/api.py
+# ──────────────────────────────────────────────────────────────
+# API HTTP (ASGI) del asistente, sin Streamlit:
+#
+#   POST   /chat                 respuesta completa o en streaming (SSE)
+#   POST   /retrieve             solo recuperación (fragmentos + fuentes)
+#   DELETE /sessions/{id}        borra el historial de una sesión
+#   GET    /healthz · /readyz    vida del proceso · índice y cadena cargados
+#
+#   uvicorn app.api:app --host 0.0.0.0 --port 8000 --workers 4
+#
+# Cada worker carga el vectorstore y la cadena una sola vez al arrancar
+# (en segundo plano: /readyz responde 503 hasta que termina). La cadena
+# es síncrona; cada turno corre en el pool de hilos y los tokens llegan
+# al bucle de eventos por una cola. El historial de cada sesión vive en
+# el worker que la atiende: el balanceador debe usar afinidad por sesión
+# (cabecera o cookie con el session_id).
+# ──────────────────────────────────────────────────────────────
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi import FastAPI, HTTPException  # noqa: E402
+from fastapi.responses import JSONResponse, StreamingResponse  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+from starlette.concurrency import run_in_threadpool  # noqa: E402
+
+from app.history import ChatHistory  # noqa: E402
+from app.streaming import StreamHandler  # noqa: E402
+from app.tracing import Tracer  # noqa: E402
+
+API_PROMPT_VERSION  = os.getenv("API_PROMPT_VERSION", "v1_asistente_rrhh")
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", 8))          # turnos simultáneos por worker
+API_SESSION_TTL     = float(os.getenv("API_SESSION_TTL", 2 * 3600))     # s sin actividad
+API_MAX_SESSIONS    = int(os.getenv("API_MAX_SESSIONS", 10_000))
+
+
+# ──────────────────────────────────────────────────────────────
+# Recursos compartidos por worker
+# ──────────────────────────────────────────────────────────────
+class Resources:
+    """Vectorstore, cadena y retriever cargados una vez por proceso."""
+
+    def __init__(self, vectordb, chain, retriever, new_history: Callable[[], ChatHistory]):
+        self.vectordb = vectordb
+        self.chain = chain
+        self.retriever = retriever
+        self.new_history = new_history
+
+
+def load_resources() -> Resources:
+    from app.rag_pipeline import build_chain, build_history, load_vectorstore_from_disk
+
+    vectordb = load_vectorstore_from_disk()
+    # Caché semántica compartida por todas las sesiones del worker (como en las UIs)
+    chain = build_chain(vectordb, prompt_version=API_PROMPT_VERSION, cache_answers=True)
+    return Resources(vectordb, chain, chain.retriever, build_history)
+
+
+class SessionStore:
+    """Historiales por sesión en memoria, con caducidad y desalojo LRU."""
+
+    def __init__(self, new_history: Callable[[], ChatHistory], ttl: float = API_SESSION_TTL,
+                 max_sessions: int = API_MAX_SESSIONS, clock: Callable[[], float] = time.time):
+        self.new_history = new_history
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        """Entrada {history, lock}; el lock serializa los turnos de una misma sesión."""
+        with self._lock:
+            now = self.clock()
+            expired = [sid for sid, s in self._sessions.items() if now - s["seen"] > self.ttl]
+            for sid in expired:
+                del self._sessions[sid]
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = {"history": self.new_history(), "lock": asyncio.Lock(), "seen": now}
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            session["seen"] = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+
+# ──────────────────────────────────────────────────────────────
+# Esquemas
+# ──────────────────────────────────────────────────────────────
+class ChatRequest(BaseModel):
+    question: str
+    session_id: Optional[str] = None
+    sport: Optional[str] = None
+    stream: bool = True
+
+
+class RetrieveRequest(BaseModel):
+    question: str
+    sport: Optional[str] = None
+
+
+def serialize_docs(docs) -> List[Dict[str, Any]]:
+    return [
+        {
+            "content": doc.page_content,
+            "source": os.path.basename(str(doc.metadata.get("source", ""))),
+            "page": doc.metadata.get("page"),
+        }
+        for doc in docs
+    ]
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# ──────────────────────────────────────────────────────────────
+# Aplicación
+# ──────────────────────────────────────────────────────────────
+def create_app(loader: Callable[[], Resources] = load_resources, tracer: Optional[Tracer] = None) -> FastAPI:
+    state: Dict[str, Any] = {"resources": None, "error": None, "sessions": None}
+    tracer = tracer or Tracer()
+    slots = asyncio.Semaphore(max(1, API_MAX_CONCURRENCY))
+
+    async def load() -> None:
+        try:
+            resources = await run_in_threadpool(loader)
+            state["sessions"] = SessionStore(resources.new_history)
+            state["resources"] = resources
+        except Exception as exc:  # /readyz informa del fallo; /healthz sigue respondiendo
+            state["error"] = repr(exc)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        task = asyncio.create_task(load())
+        yield
+        task.cancel()
+
+    app = FastAPI(title="Endurance Lab AI", lifespan=lifespan)
+    app.state.rag = state
+
+    def resources() -> Resources:
+        if state["resources"] is None:
+            raise HTTPException(status_code=503, detail="Cargando la base de conocimientos")
+        return state["resources"]
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    @app.get("/readyz")
+    async def readyz():
+        if state["resources"] is not None:
+            return {"status": "ready", "sessions": len(state["sessions"])}
+        status = "error" if state["error"] else "loading"
+        return JSONResponse({"status": status, "error": state["error"]}, status_code=503)
+
+    @app.post("/retrieve")
+    async def retrieve(request: RetrieveRequest):
+        res = resources()
+        async with slots:
+            # Como la cadena: la disciplina llega al retriever como metadato de la ejecución
+            docs = await run_in_threadpool(res.retriever.invoke, request.question,
+                                           config={"metadata": {"sport": request.sport}})
+        return {"question": request.question, "documents": serialize_docs(docs)}
+
+    @app.delete("/sessions/{session_id}")
+    async def drop_session(session_id: str):
+        resources()
+        if not state["sessions"].drop(session_id):
+            raise HTTPException(status_code=404, detail="Sesión no encontrada")
+        return {"session_id": session_id, "deleted": True}
+
+    @app.post("/chat")
+    async def chat(request: ChatRequest):
+        res = resources()
+        session_id = request.session_id or uuid.uuid4().hex
+        session = state["sessions"].get(session_id)
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+
+        def push(event: str, data: Any) -> None:
+            loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+        handler = StreamHandler(
+            on_token=(lambda token, _: push("token", token)) if request.stream else None,
+            on_sources=(lambda docs: push("sources", serialize_docs(docs))) if request.stream else None,
+        )
+
+        def run_turn() -> Dict[str, Any]:
+            history: ChatHistory = session["history"]
+            with tracer.turn(api="chat", sport=request.sport or "") as trace:
+                result = res.chain.invoke(
+                    {
+                        "question": request.question,
+                        "chat_history": history.for_question(request.question),
+                        "sport": request.sport,
+                    },
+                    config={"callbacks": [handler, trace]},
+                )
+            history.add(request.question, result["answer"])
+            sources = handler.sources if handler.sources is not None else result.get("source_documents", [])
+            return {
+                "session_id": session_id,
+                "answer": result["answer"],
+                "sources": serialize_docs(sources),
+                "cached": bool(result.get("cached", False)),
+                "timings": handler.timings(),
+            }
+
+        async def turn() -> Dict[str, Any]:
+            # Turnos de una sesión en orden; el semáforo acota los turnos simultáneos del worker
+            async with session["lock"], slots:
+                return await run_in_threadpool(run_turn)
+
+        if not request.stream:
+            return await turn()
+
+        async def stream():
+            task = asyncio.create_task(turn())
+            task.add_done_callback(lambda _: events.put_nowait(("end", None)))
+            yield _sse("session", {"session_id": session_id})
+            sent_sources = False
+            while True:
+                event, data = await events.get()
+                if event == "end":
+                    break
+                sent_sources = sent_sources or event == "sources"
+                yield _sse(event, data)
+            try:
+                output = task.result()
+            except Exception as exc:
+                yield _sse("error", {"detail": repr(exc)})
+                return
+            if not sent_sources:  # respuesta desde caché: no hubo recuperación
+                yield _sse("sources", output["sources"])
+            yield _sse("done", output)
+
+        return StreamingResponse(stream(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,317 @@
+# app/benchmark.py
+# ──────────────────────────────────────────────────────────────
+# Benchmark offline del pipeline RAG: parseo (load_documents), troceo,
+# construcción y persistencia del índice, arranque en frío
+# (load_vectorstore_from_disk + retriever), latencia de consulta y
+# turnos completos de build_chain. Sin red: embeddings deterministas
+# falsos y un chat falso con streaming, así que solo se mide nuestro código.
+#
+# Corpus: los PDFs incluidos y un corpus sintético ×N (copias de los PDFs
+# para el parseo; páginas con las frases barajadas para el resto).
+#
+#   python app/benchmark.py --scales 10 100 --save          # → benchmarks/baseline.json
+#   python app/benchmark.py --scales 10 100 --compare --threshold 0.25
+# ──────────────────────────────────────────────────────────────
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+from itertools import cycle
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("LANGCHAIN_VERBOSE", "0")  # los logs de la cadena falsearían las latencias
+
+import numpy as np  # noqa: E402
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+from langchain_core.language_models import GenericFakeChatModel  # noqa: E402
+
+from app.rag_pipeline import (  # noqa: E402
+    DATA_DIR, RETRIEVER_K, build_chain, get_retriever, list_pdfs, load_documents,
+    load_vectorstore_from_disk, persist_vectorstore, split_documents,
+)
+from app.streaming_ingest import index_stream  # noqa: E402
+
+BENCHMARK_DIR       = os.getenv("BENCHMARK_DIR", "benchmarks")
+BENCHMARK_DIM       = int(os.getenv("BENCHMARK_DIM", 1536))          # mismo tamaño que text-embedding-ada-002
+BENCHMARK_REPEAT    = int(os.getenv("BENCHMARK_REPEAT", 3))          # mediana de N ejecuciones por etapa
+BENCHMARK_QUERIES   = int(os.getenv("BENCHMARK_QUERIES", 50))
+BENCHMARK_TURNS     = int(os.getenv("BENCHMARK_TURNS", 20))
+BENCHMARK_THRESHOLD = float(os.getenv("BENCHMARK_THRESHOLD", 0.25))  # +25 % = regresión
+BENCHMARK_MIN_DELTA = float(os.getenv("BENCHMARK_MIN_DELTA", 0.002)) # s; por debajo es ruido
+DATASET_PATH        = os.getenv("DATASET_PATH", "tests/eval_dataset.json")
+BASELINE_FILE       = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+FAKE_ANSWER = "Para mejorar el umbral combina rodajes suaves, series al umbral y descanso suficiente."
+
+
+class FakeChatModel(GenericFakeChatModel):
+    """Chat falso que emite tokens como ChatOpenAI(streaming=True)."""
+
+    streaming: bool = False
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        result = super()._generate(messages, stop, None, **kwargs)
+        if self.streaming and run_manager:
+            for token in result.generations[0].message.content.split(" "):
+                run_manager.on_llm_new_token(token + " ")
+        return result
+
+
+def fake_embeddings(dim: int = BENCHMARK_DIM) -> DeterministicFakeEmbedding:
+    return DeterministicFakeEmbedding(size=dim)
+
+
+def fake_llms() -> Tuple[FakeChatModel, FakeChatModel]:
+    answer = FakeChatModel(messages=cycle([FAKE_ANSWER]), streaming=True, tags=["generation"])
+    condense = FakeChatModel(messages=cycle(["¿Cómo entreno el umbral de lactato?"]), tags=["condense_question"])
+    return answer, condense
+
+
+# ──────────────────────────────────────────────────────────────
+# Corpus sintético
+# ──────────────────────────────────────────────────────────────
+def replicate_pdfs(scale: int, directory: str, path: str = DATA_DIR) -> List[str]:
+    """`scale` copias (enlaces) de cada PDF: el parseo crece linealmente."""
+    files = []
+    for copy in range(scale):
+        for file in list_pdfs(path):
+            name = f"copy{copy:03d}_{file}"
+            target = os.path.join(directory, name)
+            try:
+                os.symlink(os.path.abspath(os.path.join(path, file)), target)
+            except OSError:  # sistemas sin enlaces simbólicos
+                shutil.copyfile(os.path.join(path, file), target)
+            files.append(name)
+    return files
+
+
+def synthetic_corpus(docs: List[Document], scale: int, seed: int = 0) -> List[Document]:
+    """Páginas ×`scale`; cada copia baraja las frases para que los chunks no se repitan."""
+    rng = random.Random(seed)
+    corpus = list(docs)
+    for copy in range(1, scale):
+        for doc in docs:
+            sentences = doc.page_content.split(". ")
+            rng.shuffle(sentences)
+            metadata = {**doc.metadata, "source": f"synthetic/copy{copy:03d}/{os.path.basename(str(doc.metadata.get('source', '')))}"}
+            corpus.append(Document(page_content=". ".join(sentences), metadata=metadata))
+    return corpus
+
+
+# ──────────────────────────────────────────────────────────────
+# Medición
+# ──────────────────────────────────────────────────────────────
+def timed(fn: Callable[[], Any], repeat: int = BENCHMARK_REPEAT) -> Tuple[float, Any]:
+    """Mediana de `repeat` ejecuciones (segundos) y el resultado de la última."""
+    times, result = [], None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def latencies_ms(fn: Callable[[Any], Any], items: List[Any]) -> Dict[str, float]:
+    fn(items[0])  # calentamiento
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": float(np.percentile(latencies, 50)), "p95_ms": float(np.percentile(latencies, 95))}
+
+
+def load_questions(n: int, path: str = DATASET_PATH) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        questions = [pair["question"] for pair in json.load(f)]
+    return [question for question, _ in zip(cycle(questions), range(n))]
+
+
+def build_index(chunks: List[Document], persist_path: str, embeddings, chunk_size: int, chunk_overlap: int):
+    vectordb = index_stream(((f"bench-{i}", chunk) for i, chunk in enumerate(chunks)), embeddings)
+    persist_vectorstore(vectordb, {}, chunk_size, chunk_overlap, persist_path, index_spec="Flat", dedup=False)
+    return vectordb
+
+
+def bench_corpus(files: List[str], pdf_dir: str, scale: int, workdir: str, chunk_size: int = 512,
+                 chunk_overlap: int = 50, k: int = RETRIEVER_K, repeat: int = BENCHMARK_REPEAT,
+                 n_queries: int = BENCHMARK_QUERIES, n_turns: int = BENCHMARK_TURNS,
+                 dim: int = BENCHMARK_DIM, base_docs: Optional[List[Document]] = None) -> Dict[str, float]:
+    """Todas las etapas sobre un corpus; devuelve tiempos (s / ms) y tamaños."""
+    row: Dict[str, float] = {"scale": scale, "n_files": len(files)}
+
+    # 1) Parseo de los PDFs (con scale > 1, copias de los incluidos)
+    row["load_documents_s"], docs = timed(lambda: load_documents(pdf_dir, files=files), repeat)
+    if base_docs is not None and scale > 1:
+        docs = synthetic_corpus(base_docs, scale)
+    row["n_pages"] = len(docs)
+
+    # 2) Troceo
+    row["split_s"], chunks = timed(lambda: split_documents(docs, chunk_size, chunk_overlap), repeat)
+    row["n_chunks"] = len(chunks)
+
+    # 3) Índice: embeddings falsos + FAISS + docstore SQLite + BM25 + manifest
+    persist_path = os.path.join(workdir, f"vectorstore_x{scale}")
+    embeddings = fake_embeddings(dim)
+
+    def build():
+        shutil.rmtree(persist_path, ignore_errors=True)
+        return build_index(chunks, persist_path, embeddings, chunk_size, chunk_overlap)
+
+    row["index_build_s"], _ = timed(build, repeat)
+
+    # 4) Arranque en frío: índice mapeado + BM25 + retriever
+    def cold_start():
+        vectordb = load_vectorstore_from_disk(persist_path, embeddings=embeddings)
+        return vectordb, get_retriever(vectordb, persist_path, k=k)
+
+    row["cold_start_s"], (vectordb, retriever) = timed(cold_start, repeat)
+
+    # 5) Latencia de consulta del retriever
+    questions = load_questions(n_queries)
+    query = latencies_ms(retriever.invoke, questions)
+    row["query_p50_ms"], row["query_p95_ms"] = query["p50_ms"], query["p95_ms"]
+
+    # 6) Turnos completos (condensación + recuperación + generación con streaming)
+    llm, condense = fake_llms()
+    chain = build_chain(vectordb, retriever=retriever, persist_path=persist_path, llm=llm,
+                        condense_question_llm=condense)
+    history = [("¿Qué es el umbral de lactato?", FAKE_ANSWER)]
+    turn = latencies_ms(lambda q: chain.invoke({"question": q, "chat_history": history}),
+                        load_questions(n_turns))
+    row["turn_p50_ms"], row["turn_p95_ms"] = turn["p50_ms"], turn["p95_ms"]
+    return row
+
+
+def run_benchmark(scales: List[int], path: str = DATA_DIR, repeat: int = BENCHMARK_REPEAT,
+                  n_queries: int = BENCHMARK_QUERIES, n_turns: int = BENCHMARK_TURNS,
+                  dim: int = BENCHMARK_DIM, chunk_size: int = 512, chunk_overlap: int = 50) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "dim": dim,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "k": RETRIEVER_K,
+            "repeat": repeat,
+        },
+        "corpora": {},
+    }
+    options = dict(chunk_size=chunk_size, chunk_overlap=chunk_overlap, repeat=repeat,
+                   n_queries=n_queries, n_turns=n_turns, dim=dim)
+    with tempfile.TemporaryDirectory(prefix="rag_bench_") as workdir:
+        print("⏱️  Corpus: PDFs incluidos")
+        report["corpora"]["pdfs"] = bench_corpus(list_pdfs(path), path, 1, workdir, **options)
+        base_docs = load_documents(path)
+        for scale in scales:
+            print(f"⏱️  Corpus sintético ×{scale}")
+            pdf_dir = os.path.join(workdir, f"pdfs_x{scale}")
+            os.makedirs(pdf_dir)
+            files = replicate_pdfs(scale, pdf_dir, path)
+            report["corpora"][f"x{scale}"] = bench_corpus(files, pdf_dir, scale, workdir,
+                                                          base_docs=base_docs, **options)
+    return report
+
+
+# ──────────────────────────────────────────────────────────────
+# Comparación con una línea base
+# ──────────────────────────────────────────────────────────────
+def _as_seconds(metric: str, value: float) -> float:
+    return value / 1000 if metric.endswith("_ms") else value
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = BENCHMARK_THRESHOLD,
+            min_delta: float = BENCHMARK_MIN_DELTA) -> List[Dict[str, Any]]:
+    """Métricas de tiempo comunes; regresión si empeora > threshold y > min_delta segundos."""
+    rows = []
+    for corpus, metrics in current["corpora"].items():
+        reference = baseline.get("corpora", {}).get(corpus)
+        if reference is None:
+            continue
+        for metric, value in metrics.items():
+            if not metric.endswith(("_s", "_ms")) or metric not in reference:
+                continue
+            before = reference[metric]
+            change = (value - before) / before if before else 0.0
+            delta = _as_seconds(metric, value - before)
+            rows.append({
+                "corpus": corpus,
+                "metric": metric,
+                "baseline": before,
+                "current": value,
+                "change": change,
+                "regression": change > threshold and delta > min_delta,
+            })
+    return rows
+
+
+def format_comparison(rows: List[Dict[str, Any]], threshold: float) -> str:
+    lines = [f"{'corpus':<8} {'métrica':<18} {'base':>10} {'actual':>10} {'cambio':>8}"]
+    for r in rows:
+        flag = "  ❌" if r["regression"] else ""
+        lines.append(f"{r['corpus']:<8} {r['metric']:<18} {r['baseline']:>10.4f} {r['current']:>10.4f} "
+                     f"{r['change']:>+8.1%}{flag}")
+    n = sum(r["regression"] for r in rows)
+    lines.append(f"{n} regresiones (umbral +{threshold:.0%})" if n else f"✅ Sin regresiones (umbral +{threshold:.0%})")
+    return "\n".join(lines)
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"{'corpus':<8} {'chunks':>7} {'parseo s':>9} {'troceo s':>9} {'índice s':>9} {'frío s':>8} "
+             f"{'query p50/p95 ms':>17} {'turno p50/p95 ms':>17}"]
+    for corpus, r in report["corpora"].items():
+        lines.append(
+            f"{corpus:<8} {r['n_chunks']:>7} {r['load_documents_s']:>9.2f} {r['split_s']:>9.3f} "
+            f"{r['index_build_s']:>9.2f} {r['cold_start_s']:>8.3f} "
+            f"{r['query_p50_ms']:>8.2f}/{r['query_p95_ms']:<8.2f} {r['turn_p50_ms']:>8.2f}/{r['turn_p95_ms']:<8.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Benchmark offline de ingesta, recuperación y chat")
+    parser.add_argument("--scales", type=int, nargs="*", default=[10], help="factores del corpus sintético")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--repeat", type=int, default=BENCHMARK_REPEAT)
+    parser.add_argument("--queries", type=int, default=BENCHMARK_QUERIES)
+    parser.add_argument("--turns", type=int, default=BENCHMARK_TURNS)
+    parser.add_argument("--dim", type=int, default=BENCHMARK_DIM)
+    parser.add_argument("--save", nargs="?", const=BASELINE_FILE, help="guarda el resultado como línea base JSON")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_FILE, help="línea base JSON con la que comparar")
+    parser.add_argument("--threshold", type=float, default=BENCHMARK_THRESHOLD)
+    parser.add_argument("--min-delta", type=float, default=BENCHMARK_MIN_DELTA)
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.scales, args.data_dir, args.repeat, args.queries, args.turns, args.dim)
+    print(format_report(report))
+
+    if args.save:
+        if os.path.dirname(args.save):
+            os.makedirs(os.path.dirname(args.save), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Línea base guardada en {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold, args.min_delta)
+        print(format_comparison(rows, args.threshold))
+        if any(r["regression"] for r in rows):
+            sys.exit(1)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# app/bm25.py
+# ──────────────────────────────────────────────────────────────
+# Índice invertido BM25 precomputado en la ingesta. Se guarda como
+# `bm25.npz` junto al índice FAISS (arrays numpy, sin pickle). Los
+# pesos BM25 de cada posting se calculan al construir, así que una
+# consulta solo suma idf·peso de las listas de sus términos.
+#
+# La construcción recorre los textos en streaming: solo acumula las
+# listas de postings (arrays compactos), nunca los textos ni un Counter
+# por chunk, así que la RAM de la ingesta no crece con los textos.
+# ──────────────────────────────────────────────────────────────
+import os
+import re
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BM25_FILE = "bm25.npz"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:/[a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    # Minúsculas sin tildes; conserva unidades compuestas como "cho/h"
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(text)
+
+
+class BM25Index:
+    def __init__(self, ids, terms, offsets, postings_doc, postings_weight, idf):
+        self.ids = ids
+        self.terms = terms
+        self.offsets = offsets
+        self.postings_doc = postings_doc
+        self.postings_weight = postings_weight
+        self.idf = idf
+        self._term_index = {term: i for i, term in enumerate(terms.tolist())}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids: Sequence[str], texts: Sequence[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        return cls.build_stream(zip(ids, texts), k1=k1, b=b)
+
+    @classmethod
+    def build_stream(cls, docs: Iterable[Tuple[str, str]], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """Construye desde (id, texto) en orden de posición sin retener los textos."""
+        ids: List[str] = []
+        doc_len = array("f")
+        postings: Dict[str, Tuple[array, array]] = {}  # término → (docs, tf)
+        for doc, (doc_id, text) in enumerate(docs):
+            counter = Counter(tokenize(text))
+            ids.append(doc_id)
+            doc_len.append(sum(counter.values()))
+            for term, tf in counter.items():
+                plist = postings.get(term)
+                if plist is None:
+                    plist = postings[term] = (array("i"), array("i"))
+                plist[0].append(doc)
+                plist[1].append(tf)
+
+        doc_len_np = np.frombuffer(doc_len, dtype="float32") if doc_len else np.zeros(0, dtype="float32")
+        avg_len = float(doc_len_np.mean()) if len(doc_len_np) else 1.0
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype="int64")
+        docs_np = np.empty(sum(len(p[0]) for p in postings.values()), dtype="int32")
+        weights = np.empty(len(docs_np), dtype="float32")
+        for i, term in enumerate(terms):
+            plist_docs, plist_tf = postings.pop(term)
+            start = offsets[i]
+            offsets[i + 1] = end = start + len(plist_docs)
+            term_docs = np.frombuffer(plist_docs, dtype="int32")
+            tf = np.frombuffer(plist_tf, dtype="int32").astype("float32")
+            norm = k1 * (1 - b + b * doc_len_np[term_docs] / avg_len)
+            docs_np[start:end] = term_docs
+            weights[start:end] = tf * (k1 + 1) / (tf + norm)
+
+        n_docs = len(ids)
+        df = np.diff(offsets).astype("float32")
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5)).astype("float32")
+        return cls(
+            np.array(ids, dtype=str),
+            np.array(terms, dtype=str),
+            offsets,
+            docs_np,
+            weights,
+            idf,
+        )
+
+    def search(self, query: str, k: int = 4, mask: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        # `mask` (booleano por posición) limita la búsqueda a un shard (app/sports.py)
+        scores = np.zeros(len(self.ids), dtype="float32")
+        for term in set(tokenize(query)):
+            i = self._term_index.get(term)
+            if i is None:
+                continue
+            start, end = self.offsets[i], self.offsets[i + 1]
+            scores[self.postings_doc[start:end]] += self.idf[i] * self.postings_weight[start:end]
+        if mask is not None:
+            scores[~mask] = 0
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(str(self.ids[i]), float(scores[i])) for i in hits]
+
+    def save(self, persist_path: str) -> str:
+        path = os.path.join(persist_path, BM25_FILE)
+        np.savez_compressed(
+            path,
+            ids=self.ids,
+            terms=self.terms,
+            offsets=self.offsets,
+            postings_doc=self.postings_doc,
+            postings_weight=self.postings_weight,
+            idf=self.idf,
+        )
+        return path
+
+    @classmethod
+    def load(cls, persist_path: str) -> "BM25Index":
+        with np.load(os.path.join(persist_path, BM25_FILE), allow_pickle=False) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+
+def build_from_vectorstore(vectordb) -> BM25Index:
+    # Docstore SQLite: los chunks se leen por páginas (ver app/docstore.py)
+    from app.docstore import iter_documents
+
+    ids = vectordb.index_to_docstore_id
+    return BM25Index.build_stream((ids[position], doc.page_content) for position, doc in iter_documents(vectordb))
@@ -0,0 +1,170 @@
+# app/cache.py
+# ──────────────────────────────────────────────────────────────
+# Cachés persistentes en SQLite (clave → valor) con límite de tamaño
+# y desalojo LRU. La caché de embeddings envuelve cualquier modelo de
+# LangChain y se comparte entre todas las rutas de construcción.
+# ──────────────────────────────────────────────────────────────
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(CACHE_DIR, "embeddings.sqlite"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 500_000))
+
+
+def text_hash(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class SQLiteCache:
+    """Almacén clave → BLOB en SQLite con tope de entradas (LRU) y contadores."""
+
+    def __init__(self, path: str, table: str = "cache", max_entries: Optional[int] = None):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # timeout: varios procesos (sweep.py) pueden escribir a la vez en la misma caché
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_lru ON {table}(last_used)")
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        found: Dict[str, bytes] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # SQLite limita el número de parámetros por consulta
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM {self.table} WHERE key IN ({marks})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    f"UPDATE {self.table} SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items: Dict[str, bytes]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, last_used) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items.items()],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def set(self, key: str, value: bytes) -> None:
+        self.set_many({key: value})
+
+    def _evict(self) -> None:
+        if not self.max_entries:
+            return
+        (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY last_used ASC LIMIT ?)",
+                (excess,),
+            )
+            self.evictions += excess
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return count
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        self.hits = self.misses = self.evictions = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _model_name(embeddings: Embeddings) -> str:
+    return str(getattr(embeddings, "model", None) or type(embeddings).__name__)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings con caché en disco por (modelo, hash del texto del chunk).
+
+    Las consultas (`embed_query`) no se cachean: son únicas y de bajo coste.
+    """
+
+    def __init__(self, underlying: Embeddings, cache: Optional[SQLiteCache] = None):
+        self.underlying = underlying
+        self.model = _model_name(underlying)
+        if cache is None:
+            cache = SQLiteCache(EMBEDDING_CACHE_PATH, table="embeddings", max_entries=EMBEDDING_CACHE_MAX_ENTRIES)
+        self.cache = cache
+
+    def _keys(self, texts: Iterable[str]) -> List[str]:
+        return [text_hash(self.model, text) for text in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = self._keys(texts)
+        found = self.cache.get_many(keys)
+
+        # Solo se envían al proveedor los textos que faltan (sin duplicados)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            fresh = {key: array("f", vector).tobytes() for key, vector in zip(missing, vectors)}
+            self.cache.set_many(fresh)
+            found.update(fresh)
+
+        return [array("f", found[key]).tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+    def stats(self) -> Dict[str, float]:
+        return self.cache.stats()
@@ -0,0 +1,165 @@
+# app/cassette.py
+# ──────────────────────────────────────────────────────────────
+# Grabación / reproducción ("cassettes") de las llamadas a modelos de
+# chat y de embeddings. Se controla con LLM_CASSETTE_MODE:
+#
+#   off     → comportamiento normal (por defecto)
+#   record  → llama al proveedor y guarda petición/respuesta en disco
+#   replay  → sirve las respuestas grabadas, sin red; un fallo de
+#             cassette es un error (hay que volver a grabar)
+#
+# Los chats se interceptan con la caché global de LangChain (`set_llm_cache`),
+# así que cubre la cadena RAG y los jueces de run_eval sin tocarlos.
+# Los embeddings se guardan en binario (float32) para que los cassettes
+# quepan en el repo: ~6 KB por chunk en vez de ~30 KB de JSON.
+# ──────────────────────────────────────────────────────────────
+import os
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.embeddings import Embeddings
+from langchain_core.globals import set_llm_cache
+from langchain_core.load import dumps, loads
+
+from app.cache import text_hash
+
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off")
+LLM_CASSETTE_DIR  = os.getenv("LLM_CASSETTE_DIR", "tests/cassettes")
+
+MODES = ("off", "record", "replay")
+
+
+class CassetteMissError(RuntimeError):
+    pass
+
+
+class CassetteLLMCache(BaseCache):
+    """Una petición de chat por archivo JSON: `<dir>/chat/<sha256>.json`."""
+
+    def __init__(self, directory: str, mode: str):
+        self.directory = os.path.join(directory, "chat")
+        self.mode = mode
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, prompt: str, llm_string: str) -> str:
+        return os.path.join(self.directory, f"{text_hash(llm_string, prompt)}.json")
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if self.mode == "record":
+            return None  # se graba siempre la respuesta real
+        path = self._path(prompt, llm_string)
+        if not os.path.exists(path):
+            raise CassetteMissError(
+                f"Sin cassette para esta llamada de chat ({os.path.basename(path)}); "
+                "vuelve a grabar con LLM_CASSETTE_MODE=record"
+            )
+        with open(path, encoding="utf-8") as f:
+            record = json.load(f)
+        return [loads(generation) for generation in record["generations"]]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if self.mode != "record":
+            return
+        record = {
+            "llm": llm_string,
+            "prompt": prompt,
+            "generations": [dumps(generation) for generation in return_val],
+        }
+        with open(self._path(prompt, llm_string), "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=1)
+
+    def clear(self, **kwargs: Any) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.directory, name))
+
+
+EMBEDDING_KEYS_FILE    = "embeddings.keys"  # una clave (modelo, texto) por línea
+EMBEDDING_VECTORS_FILE = "embeddings.f32"   # vectores float32 seguidos, en el orden de las claves
+
+
+class CassetteEmbeddings(Embeddings):
+    """Embeddings grabados por (modelo, texto) en `<dir>/embeddings.keys` + `.f32` (solo se añade)."""
+
+    def __init__(self, underlying: Embeddings, directory: str, mode: str):
+        self.underlying = underlying
+        self.mode = mode
+        self.model = str(getattr(underlying, "model", None) or type(underlying).__name__)
+        self.keys_path = os.path.join(directory, EMBEDDING_KEYS_FILE)
+        self.vectors_path = os.path.join(directory, EMBEDDING_VECTORS_FILE)
+        self._lock = threading.Lock()
+        self._vectors: Dict[str, List[float]] = {}
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, encoding="utf-8") as f:
+                keys = f.read().split()
+            if keys:
+                vectors = np.fromfile(self.vectors_path, dtype="<f4")
+                self._vectors = dict(zip(keys, vectors.reshape(len(keys), -1).tolist()))
+
+    def _replay(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_hash(self.model, text) for text in texts]
+        missing = [text for key, text in zip(keys, texts) if key not in self._vectors]
+        if missing:
+            raise CassetteMissError(
+                f"{len(missing)} textos sin embedding grabado (p. ej. {missing[0][:60]!r}); "
+                "vuelve a grabar con LLM_CASSETTE_MODE=record"
+            )
+        return [self._vectors[key] for key in keys]
+
+    def _record(self, texts: List[str], vectors: List[List[float]]) -> None:
+        with self._lock:
+            new = {}
+            for text, vector in zip(texts, vectors):
+                key = text_hash(self.model, text)
+                if key not in self._vectors and key not in new:
+                    new[key] = vector
+            if not new:
+                return
+            self._vectors.update(new)
+            with open(self.vectors_path, "ab") as f:
+                np.asarray(list(new.values()), dtype="<f4").tofile(f)
+            with open(self.keys_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{key}\n" for key in new))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.mode == "replay":
+            return self._replay(texts)
+        vectors = self.underlying.embed_documents(texts)
+        self._record(texts, vectors)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.mode == "replay":
+            return self._replay([text])[0]
+        vector = self.underlying.embed_query(text)
+        self._record([text], [vector])
+        return vector
+
+
+def cassette_mode() -> str:
+    mode = os.getenv("LLM_CASSETTE_MODE", LLM_CASSETTE_MODE)
+    if mode not in MODES:
+        raise ValueError(f"LLM_CASSETTE_MODE debe ser uno de {MODES}, no {mode!r}")
+    return mode
+
+
+def install_llm_cassette(directory: str = LLM_CASSETTE_DIR) -> str:
+    """Activa la grabación/reproducción de chats si el modo lo pide. Idempotente."""
+    mode = cassette_mode()
+    if mode != "off":
+        # En replay no hay red, pero los clientes de OpenAI exigen una clave al construirse
+        if mode == "replay":
+            os.environ.setdefault("OPENAI_API_KEY", "replay-sin-red")
+        set_llm_cache(CassetteLLMCache(directory, mode))
+    return mode
+
+
+def wrap_embeddings(embeddings: Embeddings, directory: str = LLM_CASSETTE_DIR) -> Embeddings:
+    mode = cassette_mode()
+    if mode == "off":
+        return embeddings
+    return CassetteEmbeddings(embeddings, directory, mode)
@@ -1,9 +1,15 @@
 # app/dashboard.py
+import os
+import sys
+
 import mlflow
-import pandas as pd
 import streamlit as st
 import altair as alt   # ➟ Gráficos interactivos
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.metrics_store import CONFIG_KEYS, CRITERIA, read_aggregates, read_results, sync_from_mlflow  # noqa: E402
+from app.run_store import RUNS_CACHE_TTL  # noqa: E402
+
 ########################################################################
 # CONFIGURACIÓN GENERAL
 ########################################################################
@@ -13,6 +19,13 @@ st.title("📈 Evaluación Completa del Chatbot por Pregunta")
 # Conecta al tracking server por defecto (o define MLFLOW_TRACKING_URI)
 client = mlflow.tracking.MlflowClient()
 
+
+# Resultados y agregados del almacén Parquet; al expirar el TTL se exportan solo los runs nuevos
+@st.cache_data(ttl=RUNS_CACHE_TTL, show_spinner="Cargando resultados…")
+def cached_store(experiment_name: str):
+    sync_from_mlflow(experiment_name)
+    return read_results(experiment_name), read_aggregates(experiment_name)
+
 ########################################################################
 # SELECCIÓN DE EXPERIMENTO
 ########################################################################
@@ -24,48 +37,26 @@ if not experiments:
 exp_names = [exp.name for exp in experiments]
 selected_exp_name = st.selectbox("Selecciona un experimento para visualizar 📂", exp_names)
 
-experiment = client.get_experiment_by_name(selected_exp_name)
-runs = client.search_runs(
-    experiment_ids=[experiment.experiment_id],
-    order_by=["start_time DESC"],
-    max_results=10_000,      # Ajusta si tu experimento tiene muchos runs
-)
+if st.button("🔄 Actualizar runs"):
+    cached_store.clear()
+results, aggregates = cached_store(selected_exp_name)
 
-if not runs:
+if results.empty:
     st.warning("No hay ejecuciones registradas en este experimento.")
     st.stop()
 
 ########################################################################
-# PARSEAR DATOS DE LOS RUNS
+# RESULTADOS POR PREGUNTA (tabla columnar ya tipada)
 ########################################################################
-CRITERIA = ["correctness", "relevance", "coherence", "toxicity", "harmfulness"]
 # Si tus métricas llevan sufijo _score ajusta aquí ↓
 METRIC_SUFFIX = "_score"
 
-data = []
-for run in runs:
-    p = run.data.params
-    m = run.data.metrics
-    tags = run.data.tags
-
-    row = {
-        "pregunta"      : p.get("question"),
-        "prompt_version": p.get("prompt_version"),
-        "chunk_size"    : int(p.get("chunk_size", 0)),
-        "chunk_overlap" : int(p.get("chunk_overlap", 0)),
-        "run_id"        : run.info.run_id,
-    }
-
-    # Añadimos puntuaciones por criterio
-    for c in CRITERIA:
-        row[c] = m.get(f"{c}{METRIC_SUFFIX}", None)
-
-    # (Opcional) razonamiento almacenado como tag o param
-    row["razonamiento"] = tags.get("eval_reasoning") or p.get("eval_reasoning")
-
-    data.append(row)
-
-df = pd.DataFrame(data)
+df = results.rename(columns={
+    "question":  "pregunta",
+    "result_id": "run_id",
+    "reasoning": "razonamiento",
+    **{f"{c}{METRIC_SUFFIX}": c for c in CRITERIA},
+})[["pregunta", "prompt_version", "chunk_size", "chunk_overlap", "k", "run_id", *CRITERIA, "razonamiento"]]
 
 ########################################################################
 # TABLA COMPLETA CON FILTROS
@@ -74,46 +65,40 @@ st.subheader("📋 Resultados individuales por pregunta")
 st.dataframe(df, use_container_width=True)
 
 ########################################################################
-# AGRUPAR Y ANALIZAR
+# AGRUPAR Y ANALIZAR (agregados precalculados al exportar)
 ########################################################################
 # Selección de criterio(s) para analizar
 st.subheader("🎯 Selecciona criterio(s) para comparar")
 selected_criteria = st.multiselect("Criterios:", CRITERIA, default=["correctness"])
 
 if selected_criteria:
-    # Agrupar por configuración
-    grouped = (
-        df.groupby(["prompt_version", "chunk_size"])
-          [selected_criteria]
-          .mean()
-          .reset_index()
-    )
+    selected = aggregates[aggregates["metric"].isin([f"{c}{METRIC_SUFFIX}" for c in selected_criteria])].copy()
+    selected["criterio"] = selected["metric"].str.removesuffix(METRIC_SUFFIX)
 
-    # Vista tabular
+    # Vista tabular: media por criterio + dispersión
     st.subheader("📊 Desempeño agrupado por configuración")
+    grouped = selected.pivot_table(index=CONFIG_KEYS, columns="criterio",
+                                   values=["mean", "std", "count", "p50", "p95"]).reset_index()
+    grouped.columns = [" ".join(str(part) for part in col if part) for col in grouped.columns]
     st.dataframe(grouped, use_container_width=True)
 
     # Configuración de etiquetas para el gráfico
-    grouped["config"] = (
-        grouped["prompt_version"] + " | " + grouped["chunk_size"].astype(str)
+    selected["config"] = (
+        selected["prompt_version"] + " | " + selected["chunk_size"].astype(str)
+        + " | " + selected["chunk_overlap"].astype(str) + " | k=" + selected["k"].astype(str)
     )
 
     # Gráfico interactivo con Altair
-    chart_data = grouped.melt(
-        id_vars=["config"], 
-        value_vars=selected_criteria, 
-        var_name="criterio", 
-        value_name="score"
-    )
+    chart_data = selected.rename(columns={"mean": "score"})
 
     chart = (
         alt.Chart(chart_data)
         .mark_bar()
         .encode(
-            x=alt.X("config:N", sort="-y", title="Configuración (prompt | chunk)"),
+            x=alt.X("config:N", sort="-y", title="Configuración (prompt | chunk | overlap | k)"),
             y=alt.Y("score:Q", title="Puntuación media"),
             color="criterio:N",
-            tooltip=["criterio", "score", "config"]
+            tooltip=["criterio", "score", "std", "count", "config"]
         )
         .properties(width="container", height=400)
     )
@@ -140,7 +125,7 @@ st.markdown(
     **Notas**  
     - Todas las métricas se calculan con la clase `LabeledCriteriaEvalChain`.  
     - Asegúrate de **registrar** cada métrica como `<criterio>_score` en MLflow para que se cargue correctamente.  
-    - *Razonamientos* se esperan en el tag/param `eval_reasoning`; ajusta el nombre según tu pipeline.  
-    - Si quieres comparar estadísticas adicionales (p. ej. desviación estándar) puedes extender la sección de agrupación.
+    - *Razonamientos*: valor que el juez da a cada criterio (tag `eval_reasoning` de los runs por pregunta).  
+    - Los datos salen del almacén Parquet de `app/metrics_store.py`; media, desviación, recuento y percentiles se calculan al exportar.
     """
 )
@@ -0,0 +1,194 @@
+# app/dedup.py
+# ──────────────────────────────────────────────────────────────
+# Deduplicación en la ingesta, entre el troceo y los embeddings:
+#
+#   1. Boilerplate: líneas que se repiten en muchas páginas de un mismo
+#      PDF (cabeceras, pies, números de página, URLs) se eliminan antes
+#      de trocear.
+#   2. Duplicados exactos (texto normalizado) y casi duplicados: firma
+#      MinHash de shingles de palabras + índice LSH por bandas; un chunk
+#      cuya similitud de Jaccard estimada con uno ya aceptado supera
+#      DEDUP_THRESHOLD se descarta (se conserva la primera aparición).
+#
+# Cada descarte recuerda el archivo que conserva el texto (`duplicates_of`
+# en el manifest): si ese archivo cambia o desaparece, la ingesta
+# incremental vuelve a procesar los archivos que dependían de él.
+#
+# Los contadores (chunks descartados, tokens de embedding ahorrados)
+# se registran en el experimento `vectorstore_tracking`.
+# ──────────────────────────────────────────────────────────────
+import os
+import re
+import zlib
+import hashlib
+from collections import Counter
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.bm25 import tokenize
+from app.embedding_scheduler import estimate_tokens
+
+INGEST_DEDUP           = os.getenv("INGEST_DEDUP", "1") == "1"
+DEDUP_THRESHOLD        = float(os.getenv("DEDUP_THRESHOLD", 0.8))      # Jaccard estimada
+DEDUP_NUM_PERM         = int(os.getenv("DEDUP_NUM_PERM", 128))         # permutaciones MinHash
+DEDUP_BANDS            = int(os.getenv("DEDUP_BANDS", 16))             # bandas LSH (NUM_PERM / BANDS filas)
+DEDUP_SHINGLE_SIZE     = int(os.getenv("DEDUP_SHINGLE_SIZE", 5))       # palabras por shingle
+BOILERPLATE_MIN_PAGES  = int(os.getenv("BOILERPLATE_MIN_PAGES", 3))
+BOILERPLATE_MIN_RATIO  = float(os.getenv("BOILERPLATE_MIN_RATIO", 0.3))  # fracción de páginas del PDF
+BOILERPLATE_MAX_CHARS  = int(os.getenv("BOILERPLATE_MAX_CHARS", 160))
+
+_SPACES_RE = re.compile(r"\s+")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def line_key(line: str) -> str:
+    # "Página 3" y "Página 14" cuentan como la misma línea
+    return _DIGITS_RE.sub("#", _SPACES_RE.sub(" ", line.strip()).lower())
+
+
+def source_file(chunk) -> str:
+    return chunk.metadata.get("source_file") or os.path.basename(str(chunk.metadata.get("source", "")))
+
+
+def shingles(text: str, size: int = DEDUP_SHINGLE_SIZE) -> np.ndarray:
+    words = tokenize(text)
+    if len(words) <= size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.unique(np.array([zlib.crc32(g.encode("utf-8")) for g in grams], dtype="uint64"))
+
+
+class ChunkDeduplicator:
+    """Filtro con estado: recuerda las firmas de los chunks aceptados."""
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = DEDUP_NUM_PERM,
+                 bands: int = DEDUP_BANDS, shingle_size: int = DEDUP_SHINGLE_SIZE, seed: int = 0):
+        if num_perm % bands:
+            raise ValueError(f"DEDUP_NUM_PERM ({num_perm}) debe ser múltiplo de DEDUP_BANDS ({bands})")
+        rng = np.random.default_rng(seed)
+        # Hash multiply-shift: (a·x + b) mod 2^64, 32 bits altos
+        self._a = rng.integers(1, 2**63, size=num_perm, dtype="uint64") | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype="uint64")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        self._exact: Dict[str, str] = {}                 # texto normalizado → archivo que lo conserva
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        self._signatures: List[np.ndarray] = []
+        self._owners: List[str] = []                     # archivo de cada firma
+        self._kept_by: Dict[str, set] = {}               # archivo → archivos con los textos que descartó
+
+        self.chunks_in = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self.boilerplate_lines = 0
+        self.tokens_saved = 0
+
+    # ── Boilerplate ─────────────────────────────────────────
+    def strip_boilerplate(self, pages: List) -> List:
+        """Copias de las páginas de un PDF sin las líneas repetidas en muchas de ellas."""
+        min_pages = max(BOILERPLATE_MIN_PAGES, int(np.ceil(BOILERPLATE_MIN_RATIO * len(pages))))
+        if len(pages) < min_pages:
+            return pages
+        counts = Counter()
+        for page in pages:
+            counts.update({line_key(line) for line in page.page_content.splitlines() if line.strip()})
+        repeated = {key for key, n in counts.items() if n >= min_pages and len(key) <= BOILERPLATE_MAX_CHARS}
+        if not repeated:
+            return pages
+
+        stripped = []
+        for page in pages:
+            kept = []
+            for line in page.page_content.splitlines():
+                if line.strip() and line_key(line) in repeated:
+                    self.boilerplate_lines += 1
+                    self.tokens_saved += estimate_tokens(line)
+                else:
+                    kept.append(line)
+            # Copia: las páginas parseadas se reutilizan (p. ej. varias configuraciones del sweep)
+            stripped.append(page.model_copy(update={"page_content": "\n".join(kept)}))
+        return stripped
+
+    def strip_stream(self, pages: Iterable) -> Iterator:
+        # Las páginas de la ingesta en streaming llegan agrupadas por archivo
+        for _, file_pages in groupby(pages, key=lambda page: page.metadata.get("source")):
+            yield from self.strip_boilerplate(list(file_pages))
+
+    # ── Duplicados ──────────────────────────────────────────
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        hashes = shingles(text, self.shingle_size)
+        if not len(hashes):
+            return None
+        return ((np.outer(self._a, hashes) + self._b[:, None]) >> np.uint64(32)).min(axis=1).astype("uint32")
+
+    def _match(self, text: str, owner: str) -> Optional[Tuple[str, str]]:
+        # ("exact" | "near", archivo que lo conserva) si repite un texto aceptado;
+        # si no, lo registra a nombre de `owner` y devuelve None
+        exact_key = hashlib.sha1(" ".join(tokenize(text)).encode("utf-8")).hexdigest()
+        if exact_key in self._exact:
+            return "exact", self._exact[exact_key]
+
+        sig = self.signature(text)
+        if sig is None:  # sin palabras: nada que comparar
+            self._exact[exact_key] = owner
+            return None
+        keys = [(band, sig[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+        candidates = {i for key in keys for i in self._buckets.get(key, ())}
+        for i in sorted(candidates):
+            if float(np.mean(self._signatures[i] == sig)) >= self.threshold:
+                return "near", self._owners[i]
+
+        position = len(self._signatures)
+        self._signatures.append(sig)
+        self._owners.append(owner)
+        self._exact[exact_key] = owner
+        for key in keys:
+            self._buckets.setdefault(key, []).append(position)
+        return None
+
+    def seed(self, chunks: Iterable) -> None:
+        """Registra chunks ya indexados (ingesta incremental) sin contarlos."""
+        for chunk in chunks:
+            self._match(chunk.page_content, source_file(chunk))
+
+    def is_duplicate(self, chunk) -> bool:
+        """True si `chunk` repite (o casi) uno ya aceptado; si no, lo registra."""
+        self.chunks_in += 1
+        file = source_file(chunk)
+        match = self._match(chunk.page_content, file)
+        if match is None:
+            return False
+        kind, owner = match
+        if kind == "exact":
+            self.exact_duplicates += 1
+        else:
+            self.near_duplicates += 1
+        if owner != file:
+            self._kept_by.setdefault(file, set()).add(owner)
+        self.tokens_saved += estimate_tokens(chunk.page_content)
+        return True
+
+    def duplicates_of(self, file: str) -> List[str]:
+        """Archivos que conservan los textos descartados de `file` (para el manifest)."""
+        return sorted(self._kept_by.get(file, ()))
+
+    def filter(self, chunks: List, ids: List[str]) -> Tuple[List, List[str]]:
+        kept = [(chunk, chunk_id) for chunk, chunk_id in zip(chunks, ids) if not self.is_duplicate(chunk)]
+        return [chunk for chunk, _ in kept], [chunk_id for _, chunk_id in kept]
+
+    def stats(self) -> Dict[str, int]:
+        removed = self.exact_duplicates + self.near_duplicates
+        return {
+            "chunks_in": self.chunks_in,
+            "chunks_removed": removed,
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+            "boilerplate_lines": self.boilerplate_lines,
+            "tokens_saved": self.tokens_saved,
+        }
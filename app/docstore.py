@@ -0,0 +1,256 @@
+# app/docstore.py
+# ──────────────────────────────────────────────────────────────
+# Docstore compacto en SQLite (sin pickle) + carga del índice FAISS
+# mapeado en memoria y en solo lectura. Varios procesos (workers de
+# Streamlit, evaluaciones) comparten así las páginas del índice y
+# solo leen de disco los chunks que devuelve cada búsqueda.
+#
+# El mapeo en memoria del índice plano necesita faiss ≥ 1.8
+# (IO_FLAG_MMAP_IFC); con versiones anteriores se avisa y el índice
+# se lee entero en RAM. En modo escritura (ingesta) el docstore recibe
+# los chunks por lotes y `finalize` fija las posiciones FAISS y lo
+# publica con un reemplazo atómico. Los índices construidos así no
+# tienen `index.pkl`: el docstore SQLite es su única copia de los textos.
+#
+# Los archivos .faiss tampoco se reescriben nunca en el sitio: los
+# lectores los tienen mapeados y truncarlos bajo sus pies los mata con
+# SIGBUS. Se escriben en `<archivo>.tmp` y se publican con os.replace
+# (los lectores abiertos siguen con el inodo anterior).
+# ──────────────────────────────────────────────────────────────
+import os
+import json
+import shutil
+import sqlite3
+import tempfile
+import warnings
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import faiss
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+DOCSTORE_FILE = "docstore.sqlite"
+INDEX_FILE = "index.faiss"
+PICKLE_FILE = "index.pkl"
+BUILDING_SUFFIX = ".building"  # docstore en construcción, junto al publicado
+DOCSTORE_PAGE_SIZE = int(os.getenv("DOCSTORE_PAGE_SIZE", 1000))  # filas por página al recorrer el docstore
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, position INTEGER UNIQUE, "
+    "text TEXT NOT NULL, metadata TEXT NOT NULL)"
+)
+
+
+def write_docstore(vectordb: FAISS, persist_path: str) -> str:
+    """Vuelca textos y metadatos del índice a `docstore.sqlite` (reemplaza el anterior)."""
+    os.makedirs(persist_path, exist_ok=True)
+    db_path = os.path.join(persist_path, DOCSTORE_FILE)
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.execute(_SCHEMA)
+    rows = []
+    for position, doc_id in sorted(vectordb.index_to_docstore_id.items()):
+        doc = vectordb.docstore.search(doc_id)
+        rows.append((doc_id, position, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False)))
+    conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+    # Reemplazo atómico: los lectores nunca ven un docstore a medio escribir
+    os.replace(tmp_path, db_path)
+    return db_path
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """Docstore en SQLite: cada `search` lee un chunk por ID bajo demanda.
+
+    Solo lectura por defecto. Con `writable=True` (ingesta) admite `add` y
+    `delete`; las posiciones se fijan al final con `finalize`.
+    """
+
+    def __init__(self, db_path: str, writable: bool = False):
+        self.db_path = db_path
+        self.writable = writable
+        self._lock = threading.Lock()
+        if writable:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(_SCHEMA)
+        else:
+            self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._conn.execute("SELECT text, metadata FROM chunks WHERE id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def mget(self, ids: List[str]) -> Dict[str, Document]:
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, text, metadata FROM chunks WHERE id IN ({marks})", ids
+            ).fetchall()
+        return {row[0]: Document(id=row[0], page_content=row[1], metadata=json.loads(row[2])) for row in rows}
+
+    def index_mapping(self) -> Dict[int, str]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT position, id FROM chunks WHERE position IS NOT NULL"))
+
+    def iter_documents(self, page_size: int = DOCSTORE_PAGE_SIZE) -> Iterator[Tuple[int, Document]]:
+        """(posición, Document) en orden de posición FAISS, leídos por páginas (RAM acotada)."""
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT position, id, text, metadata FROM chunks WHERE position > ? ORDER BY position LIMIT ?",
+                    (last, page_size),
+                ).fetchall()
+            if not rows:
+                return
+            for position, doc_id, text, metadata in rows:
+                yield position, Document(id=doc_id, page_content=text, metadata=json.loads(metadata))
+            last = rows[-1][0]
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        rows = [(doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False)) for doc_id, doc in texts.items()]
+        with self._lock:
+            self._conn.executemany("INSERT INTO chunks (id, text, metadata) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def delete(self, ids: List) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(doc_id,) for doc_id in ids])
+            self._conn.commit()
+
+    def copy_from(self, db_path: str) -> None:
+        """Copia en SQL todos los chunks de un docstore publicado (sin pasar los textos por Python)."""
+        with self._lock:
+            # Admite docstores del esquema anterior (mismas columnas)
+            self._conn.execute("ATTACH DATABASE ? AS published", (db_path,))
+            self._conn.execute(
+                "INSERT INTO chunks (id, position, text, metadata) "
+                "SELECT id, position, text, metadata FROM published.chunks"
+            )
+            self._conn.commit()
+            self._conn.execute("DETACH DATABASE published")
+
+    def finalize(self, index_to_docstore_id: Dict[int, str], db_path: Optional[str] = None) -> str:
+        """Fija la posición FAISS de cada chunk y publica el archivo en `db_path` (reemplazo atómico)."""
+        with self._lock:
+            self._conn.execute("UPDATE chunks SET position = NULL")
+            self._conn.executemany(
+                "UPDATE chunks SET position = ? WHERE id = ?",
+                [(position, doc_id) for position, doc_id in index_to_docstore_id.items()],
+            )
+            self._conn.execute("DELETE FROM chunks WHERE position IS NULL")
+            self._conn.commit()
+            if db_path and db_path != self.db_path:
+                os.replace(self.db_path, db_path)  # la conexión abierta sigue siendo válida
+                self.db_path = db_path
+        return self.db_path
+
+
+def write_index_atomic(index, index_path: str) -> str:
+    """Escribe un índice FAISS en `<index_path>.tmp` y lo publica con un reemplazo atómico."""
+    tmp_path = index_path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+def save_local_atomic(vectordb: FAISS, persist_path: str) -> None:
+    """`FAISS.save_local` sin reescribir en el sitio `index.faiss` ni `index.pkl`."""
+    os.makedirs(persist_path, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".save-", dir=persist_path)
+    try:
+        vectordb.save_local(tmp_dir)
+        for name in (INDEX_FILE, PICKLE_FILE):
+            os.replace(os.path.join(tmp_dir, name), os.path.join(persist_path, name))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def read_index_mmap(index_path: str):
+    # IO_FLAG_MMAP_IFC (faiss ≥ 1.8) mapea los códigos de índices planos e IO_FLAG_MMAP
+    # las listas invertidas; no todas las combinaciones valen para todos los tipos
+    ifc = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    if not ifc:
+        warnings.warn(
+            f"faiss {faiss.__version__} no mapea índices planos (IO_FLAG_MMAP_IFC, faiss ≥ 1.8): "
+            f"{os.path.basename(index_path)} se carga entero en RAM",
+            RuntimeWarning,
+        )
+    candidates = [faiss.IO_FLAG_MMAP | ifc, ifc, faiss.IO_FLAG_MMAP]
+    for flags in dict.fromkeys(c for c in candidates if c):
+        try:
+            return faiss.read_index(index_path, flags | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            continue
+    warnings.warn(f"{os.path.basename(index_path)} no admite mapeo en memoria: se carga entero en RAM",
+                  RuntimeWarning)
+    return faiss.read_index(index_path)
+
+
+def iter_documents(vectordb: FAISS, page_size: int = DOCSTORE_PAGE_SIZE) -> Iterator[Tuple[int, Document]]:
+    """Chunks del índice en orden de posición; por páginas si el docstore es SQLite."""
+    if isinstance(vectordb.docstore, SQLiteDocstore):
+        yield from vectordb.docstore.iter_documents(page_size)
+        return
+    for position, doc_id in sorted(vectordb.index_to_docstore_id.items()):
+        yield position, vectordb.docstore.search(doc_id)
+
+
+def has_compact_store(persist_path: str) -> bool:
+    return os.path.exists(os.path.join(persist_path, DOCSTORE_FILE)) and os.path.exists(
+        os.path.join(persist_path, INDEX_FILE)
+    )
+
+
+def building_path(persist_path: str) -> str:
+    return os.path.join(persist_path, DOCSTORE_FILE + BUILDING_SUFFIX)
+
+
+def load_mmap_vectorstore(persist_path: str, embeddings, index_file: str = INDEX_FILE) -> FAISS:
+    docstore = SQLiteDocstore(os.path.join(persist_path, DOCSTORE_FILE))
+    index = read_index_mmap(os.path.join(persist_path, index_file))
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=docstore.index_mapping(),
+    )
+
+
+def load_writable_vectorstore(persist_path: str, embeddings, db_path: Optional[str] = None) -> FAISS:
+    """Índice en RAM + copia escribible del docstore (ingesta incremental, sin pickle)."""
+    db_path = db_path or building_path(persist_path)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    docstore = SQLiteDocstore(db_path, writable=True)
+    docstore.copy_from(os.path.join(persist_path, DOCSTORE_FILE))
+    return FAISS(
+        embedding_function=embeddings,
+        index=faiss.read_index(os.path.join(persist_path, INDEX_FILE)),
+        docstore=docstore,
+        index_to_docstore_id=docstore.index_mapping(),
+    )
+
+
+def publish_vectorstore(vectordb: FAISS, persist_path: str) -> None:
+    """Escribe el índice de un docstore SQLite escribible y publica el docstore junto a él."""
+    os.makedirs(persist_path, exist_ok=True)
+    write_index_atomic(vectordb.index, os.path.join(persist_path, INDEX_FILE))
+    vectordb.docstore.finalize(vectordb.index_to_docstore_id, os.path.join(persist_path, DOCSTORE_FILE))
+    pickle_path = os.path.join(persist_path, PICKLE_FILE)
+    if os.path.exists(pickle_path):
+        os.remove(pickle_path)  # textos de una construcción anterior
@@ -0,0 +1,207 @@
+# app/embedding_scheduler.py
+# ──────────────────────────────────────────────────────────────
+# Planificador de embeddings: lotes configurables, concurrencia
+# asíncrona acotada, limitador token-bucket (peticiones y tokens por
+# minuto) y reintentos con backoff exponencial.
+#
+# Solo se reintentan los errores transitorios (límite de peticiones,
+# timeout, conexión); un 401 o un 400 falla a la primera. Las llamadas
+# síncronas se ejecutan en un único bucle de eventos de larga vida (un
+# hilo por proceso): el cliente asíncrono de OpenAI guarda conexiones
+# atadas a su bucle y un `asyncio.run` por llamada las deja inservibles.
+# ──────────────────────────────────────────────────────────────
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BATCH_SIZE      = int(os.getenv("EMBEDDING_BATCH_SIZE", 128))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", 4))
+EMBEDDING_RPM             = int(os.getenv("EMBEDDING_RPM", 3_000))
+EMBEDDING_TPM             = int(os.getenv("EMBEDDING_TPM", 1_000_000))
+EMBEDDING_MAX_RETRIES     = int(os.getenv("EMBEDDING_MAX_RETRIES", 5))
+
+
+def estimate_tokens(text: str) -> int:
+    # Aproximación barata (~4 caracteres por token) suficiente para el limitador
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Limitador con dos cubos: peticiones/minuto y tokens/minuto."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, clock=time.monotonic):
+        self.rpm = float(requests_per_minute)
+        self.tpm = float(tokens_per_minute)
+        self.clock = clock
+        self.request_budget = self.rpm
+        self.token_budget = self.tpm
+        self.updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        elapsed = now - self.updated
+        self.updated = now
+        self.request_budget = min(self.rpm, self.request_budget + elapsed * self.rpm / 60.0)
+        self.token_budget = min(self.tpm, self.token_budget + elapsed * self.tpm / 60.0)
+
+    def wait_time(self, tokens: int) -> float:
+        self._refill()
+        tokens = min(tokens, self.tpm)
+        missing_requests = max(0.0, 1.0 - self.request_budget)
+        missing_tokens = max(0.0, tokens - self.token_budget)
+        return max(missing_requests * 60.0 / self.rpm, missing_tokens * 60.0 / self.tpm)
+
+    async def acquire(self, tokens: int) -> None:
+        async with self._lock:
+            delay = self.wait_time(tokens)
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self.wait_time(tokens)
+            self.request_budget -= 1.0
+            self.token_budget -= min(tokens, self.tpm)
+
+
+class EmbeddingScheduler:
+    """Reparte los textos en lotes y los embebe con concurrencia acotada."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+        requests_per_minute: float = EMBEDDING_RPM,
+        tokens_per_minute: float = EMBEDDING_TPM,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+    ):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.n_chunks = 0
+        self.n_batches = 0
+        self.n_retries = 0
+        self.elapsed = 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "chunks": self.n_chunks,
+            "batches": self.n_batches,
+            "retries": self.n_retries,
+            "seconds": self.elapsed,
+            "chunks_per_sec": self.n_chunks / self.elapsed if self.elapsed else 0.0,
+        }
+
+    async def _embed_batch(self, batch, limiter, semaphore) -> List[List[float]]:
+        tokens = sum(estimate_tokens(text) for text in batch)
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await limiter.acquire(tokens)
+                try:
+                    return await self.embeddings.aembed_documents(batch)
+                except Exception as exc:
+                    if attempt == self.max_retries or not is_retryable(exc):
+                        raise
+                    self.n_retries += 1
+                    delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                    await asyncio.sleep(delay * (0.5 + random.random() / 2))
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # Limitador y semáforo se crean dentro del bucle de eventos activo
+        limiter = TokenBucket(self.requests_per_minute, self.tokens_per_minute)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self._embed_batch(b, limiter, semaphore) for b in batches))
+        self.elapsed += time.perf_counter() - start
+        self.n_chunks += len(texts)
+        self.n_batches += len(batches)
+
+        # gather conserva el orden de los lotes → mismo orden que `texts`
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return run_sync(self.aembed(texts))
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Límite de peticiones, timeout o error de conexión: vale la pena reintentar."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    if getattr(exc, "status_code", None) == 429:
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(exc, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError))
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_loop_lock = threading.Lock()
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """Bucle de eventos del proceso para `run_sync` (se crea la primera vez, y otra tras un fork)."""
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name="embedding-loop", daemon=True).start()
+        return _loop
+
+
+def run_sync(coro):
+    """Ejecuta una corrutina desde código síncrono, haya o no un bucle activo en el hilo llamador."""
+    loop = background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync no puede llamarse desde el bucle de embeddings; usa `await`")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+class ScheduledEmbeddings(Embeddings):
+    """Adaptador de LangChain: `embed_documents` pasa por el planificador."""
+
+    def __init__(self, underlying: Embeddings, scheduler: Optional[EmbeddingScheduler] = None, **scheduler_kwargs):
+        self.underlying = underlying
+        self.model = str(getattr(underlying, "model", None) or type(underlying).__name__)
+        self.scheduler = scheduler or EmbeddingScheduler(underlying, **scheduler_kwargs)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.scheduler.embed(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.scheduler.aembed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.underlying.aembed_query(text)
+
+    def stats(self) -> Dict[str, float]:
+        return self.scheduler.stats()
@@ -0,0 +1,148 @@
+# app/history.py
+# ──────────────────────────────────────────────────────────────
+# Historial de conversación acotado para la cadena conversacional.
+# Lo que se envía al LLM de condensación es, como máximo:
+#
+#   resumen acumulado de los turnos antiguos
+#   + los últimos HISTORY_MAX_TURNS turnos (recortados)
+#
+# dentro de HISTORY_TOKEN_BUDGET tokens, así el coste por turno deja
+# de crecer con la sesión. Si la pregunta se entiende por sí sola no se
+# envía historial y la cadena se salta la llamada de condensación.
+# ──────────────────────────────────────────────────────────────
+import os
+import re
+import unicodedata
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+HISTORY_MAX_TURNS      = int(os.getenv("HISTORY_MAX_TURNS", 4))
+HISTORY_TOKEN_BUDGET   = int(os.getenv("HISTORY_TOKEN_BUDGET", 1_000))
+HISTORY_TURN_TOKENS    = int(os.getenv("HISTORY_TURN_TOKENS", 300))    # tope por turno de la ventana
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", 250))
+
+Turn = Tuple[str, str]
+Summarizer = Callable[[str, List[Turn]], str]
+
+SUMMARY_PROMPT = """Resume la conversación entre un deportista y su entrenador virtual.
+Conserva los datos personales útiles (deporte, objetivos, volumen, marcas, lesiones)
+y los temas ya tratados. Máximo {max_words} palabras, en español.
+
+Resumen previo:
+{summary}
+
+Turnos nuevos:
+{turns}
+
+Resumen actualizado:"""
+
+# Referencias a turnos anteriores: si aparecen, la pregunta necesita el historial
+_FOLLOW_UP_RE = re.compile(
+    r"\b(eso|esto|ese|esa|esos|esas|este|esta|estos|estas|aquel|aquella|ello|lo mismo|"
+    r"anterior|arriba|dicho|mencionado|tambien|entonces|otra vez|de nuevo|"
+    r"y si|y para|y en|y con|y el|y la|y los|y las|que mas)\b"
+)
+_MIN_WORDS = 4
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def needs_history(question: str) -> bool:
+    """Heurística barata: ¿la pregunta depende de turnos anteriores?"""
+    text = _normalize(question).strip(" ¿?¡!.")
+    if len(text.split()) < _MIN_WORDS:
+        return True  # "¿y en carrera?", "¿cuánto?": elípticas
+    return bool(_FOLLOW_UP_RE.search(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    # Mismo estimador que el planificador de embeddings (se importa al usarlo: módulo de ingesta)
+    from app.embedding_scheduler import estimate_tokens
+
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[: max_tokens * 4].rstrip() + "…"
+
+
+def llm_summarizer(llm, max_tokens: int = HISTORY_SUMMARY_TOKENS) -> Summarizer:
+    def summarize(summary: str, turns: List[Turn]) -> str:
+        prompt = SUMMARY_PROMPT.format(
+            max_words=max_tokens * 3 // 4,
+            summary=summary or "(vacío)",
+            turns="\n".join(f"Deportista: {q}\nEntrenador: {a}" for q, a in turns),
+        )
+        message = llm.invoke([HumanMessage(content=prompt)])
+        return truncate_tokens(message.content.strip(), max_tokens)
+
+    return summarize
+
+
+class ChatHistory:
+    """Turnos completos (para mostrar) + vista acotada (para la cadena)."""
+
+    def __init__(self, summarizer: Optional[Summarizer] = None, max_turns: int = HISTORY_MAX_TURNS,
+                 token_budget: int = HISTORY_TOKEN_BUDGET, turn_tokens: int = HISTORY_TURN_TOKENS):
+        self.summarizer = summarizer
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.turn_tokens = turn_tokens
+        self.turns: List[Turn] = []
+        self.summary = ""
+        self._window_start = 0   # índice del primer turno que no está resumido
+        self.n_summaries = 0
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def __iter__(self):
+        return iter(self.turns)
+
+    @property
+    def window(self) -> List[Turn]:
+        return [
+            (truncate_tokens(q, self.turn_tokens), truncate_tokens(a, self.turn_tokens))
+            for q, a in self.turns[self._window_start:]
+        ]
+
+    def _tokens(self) -> int:
+        from app.embedding_scheduler import estimate_tokens
+
+        return estimate_tokens(self.summary) + sum(estimate_tokens(q + a) for q, a in self.window)
+
+    def add(self, question: str, answer: str) -> None:
+        self.turns.append((question, answer))
+        # Los turnos que salen de la ventana (por número o por presupuesto) se resumen de una vez
+        evicted_from = self._window_start
+        while len(self.turns) - self._window_start > self.max_turns or (
+            self._tokens() > self.token_budget and len(self.turns) - self._window_start > 1
+        ):
+            self._window_start += 1
+        evicted = self.turns[evicted_from:self._window_start]
+        if evicted and self.summarizer is not None:
+            self.summary = self.summarizer(self.summary, evicted)
+            self.n_summaries += 1
+
+    def messages(self) -> List:
+        """Historial acotado en el formato que acepta ConversationalRetrievalChain."""
+        context: List = []
+        if self.summary:
+            context.append(SystemMessage(content=f"Resumen de la conversación anterior: {self.summary}"))
+        context.extend(self.window)
+        return context
+
+    def for_question(self, question: str) -> List:
+        # Historial vacío → la cadena no llama al LLM de condensación
+        if not self.turns or not needs_history(question):
+            return []
+        return self.messages()
+
+    def clear(self) -> None:
+        self.turns.clear()
+        self.summary = ""
+        self._window_start = 0
+        self.n_summaries = 0
+
@@ -0,0 +1,90 @@
+# app/import_time.py
+# ──────────────────────────────────────────────────────────────
+# Informe de tiempos de importación (python -X importtime) de la ruta
+# de servicio: lo que importan las UIs y la API antes de responder.
+# Los módulos de LAZY_MODULES solo deben cargarse en la ruta que los usa
+# (ingesta, evaluación, métricas) o al construir la cadena; faiss, al
+# abrir el índice. El presupuesto deja ~50 % de margen sobre lo medido
+# (≈1 s con la API). En los tests solo es un fallo si IMPORT_BUDGET_MS
+# viene del entorno (test.yml fija uno holgado para runners compartidos);
+# la comprobación de módulos perezosos es determinista y falla siempre.
+#
+#   python app/import_time.py                  # top 15 + total frente al presupuesto
+#   python app/import_time.py app.run_eval --top 30
+# ──────────────────────────────────────────────────────────────
+import os
+import re
+import sys
+import argparse
+import subprocess
+from typing import Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", 1_500))
+SERVING_MODULES  = ["app.rag_pipeline", "app.api", "app.streaming", "app.history", "app.tracing"]
+LAZY_MODULES     = ["mlflow", "langchain_openai", "openai", "langchain_text_splitters.character", "pypdf", "pandas", "altair",
+                    "faiss", "app.pdf_parsing", "app.streaming_ingest", "app.ann_index", "app.dedup",
+                    "app.embedding_scheduler", "app.docstore"]
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def import_report(modules: List[str]) -> Dict[str, Dict[str, float]]:
+    """{módulo: {self_ms, cumulative_ms, depth}} de un intérprete limpio."""
+    code = "; ".join(f"import {module}" for module in modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    report = {}
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            report[name] = {
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": len(indent) // 2,
+            }
+    return report
+
+
+def total_ms(report: Dict[str, Dict[str, float]]) -> float:
+    # Los módulos de profundidad 0 no se solapan: su suma es el tiempo total
+    return sum(entry["cumulative_ms"] for entry in report.values() if entry["depth"] == 0)
+
+
+def eager_lazy_modules(report: Dict[str, Dict[str, float]], lazy: List[str] = LAZY_MODULES) -> List[str]:
+    return [module for module in lazy if module in report]
+
+
+def format_report(report: Dict[str, Dict[str, float]], top: int = 15) -> str:
+    rows = sorted(report.items(), key=lambda item: -item[1]["self_ms"])[:top]
+    lines = [f"{'módulo':<50} {'propio ms':>10} {'acumulado ms':>13}"]
+    for name, entry in rows:
+        lines.append(f"{name:<50} {entry['self_ms']:>10.1f} {entry['cumulative_ms']:>13.1f}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> float:
+    parser = argparse.ArgumentParser(description="Tiempos de importación de la ruta de servicio")
+    parser.add_argument("modules", nargs="*", default=SERVING_MODULES)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    report = import_report(args.modules)
+    total = total_ms(report)
+    print(format_report(report, args.top))
+    eager = eager_lazy_modules(report)
+    if eager:
+        print(f"⚠️  Importados sin necesidad: {', '.join(eager)}")
+    print(f"⏱️  {total:.0f} ms en {len(report)} módulos (presupuesto {args.budget_ms:.0f} ms)")
+    if total > args.budget_ms:
+        sys.exit(1)
+    return total
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# app/judge.py
+# ──────────────────────────────────────────────────────────────
+# Juez multicriterio: una sola llamada al LLM devuelve, en JSON, el
+# veredicto QA y la puntuación 1‑10 de todos los criterios. Si la
+# salida no se puede interpretar, los criterios que falten se evalúan
+# con los evaluadores individuales (una llamada por criterio).
+# ──────────────────────────────────────────────────────────────
+import os
+import re
+import json
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.cache import CACHE_DIR, SQLiteCache, text_hash
+
+JUDGE_CACHE_PATH        = os.getenv("JUDGE_CACHE_PATH", os.path.join(CACHE_DIR, "judge.sqlite"))
+JUDGE_CACHE_MAX_ENTRIES = int(os.getenv("JUDGE_CACHE_MAX_ENTRIES", 200_000))
+
+Grader = Callable[..., Awaitable[Dict[str, Any]]]
+
+JUDGE_SYSTEM = (
+    "Eres un evaluador experto y estricto de respuestas de un asistente de entrenamiento "
+    "deportivo. Comparas la respuesta con la referencia y respondes EXCLUSIVAMENTE con un "
+    "objeto JSON válido, sin texto adicional."
+)
+
+JUDGE_TEMPLATE = """Pregunta:
+{question}
+
+Respuesta de referencia:
+{reference}
+
+Respuesta a evaluar:
+{prediction}
+
+Tareas:
+1. "qa_verdict": "CORRECT" si la respuesta a evaluar es coherente con la referencia, si no "INCORRECT".
+2. Para cada criterio, una puntuación entera de 1 a 10 y un razonamiento breve:
+{criteria_block}
+
+Formato exacto:
+{{"qa_verdict": "CORRECT", "scores": {{{schema}}}}}"""
+
+_JSON_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+# Forma parte de la clave de caché: editar el prompt invalida los juicios guardados
+JUDGE_PROMPT_HASH = text_hash(JUDGE_SYSTEM, JUDGE_TEMPLATE)[:16]
+
+
+def to_float(val: Any) -> float:
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def parse_judgement(text: str, criteria: Dict[str, str]) -> Dict[str, Any]:
+    """Interpreta la salida del juez. Lanza ValueError si no hay JSON utilizable.
+
+    Devuelve `scores` solo con los criterios válidos; el llamador decide qué
+    hacer con los que falten.
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    match = _JSON_RE.search(text)
+    if not match:
+        raise ValueError("la respuesta del juez no contiene JSON")
+    data = json.loads(match.group(0))
+    if not isinstance(data, dict):
+        raise ValueError("el JSON del juez no es un objeto")
+
+    verdict = str(data.get("qa_verdict", "")).strip().upper()
+    if verdict not in ("CORRECT", "INCORRECT"):
+        verdict = None
+
+    scores, values = {}, {}
+    raw_scores = data.get("scores") or {}
+    if not isinstance(raw_scores, dict):
+        raise ValueError(f"'scores' debe ser un objeto, no {type(raw_scores).__name__}")
+    for name in criteria:
+        item = raw_scores.get(name)
+        if isinstance(item, dict):
+            score, reasoning = item.get("score"), item.get("reasoning", "")
+        else:
+            score, reasoning = item, ""
+        try:
+            score = float(score)
+        except (TypeError, ValueError):
+            continue
+        scores[name] = min(10.0, max(1.0, score))
+        values[name] = str(reasoning)
+    return {"qa_verdict": verdict, "scores": scores, "values": values}
+
+
+def _token_usage(message) -> int:
+    usage = getattr(message, "usage_metadata", None) or {}
+    return int(usage.get("total_tokens", 0))
+
+
+class MultiCriteriaJudge:
+    """Evalúa QA + todos los criterios con una llamada; recurre a `fallback` si hace falta."""
+
+    def __init__(self, llm, criteria: Dict[str, str], fallback: Optional[Grader] = None):
+        self.llm = llm
+        self.criteria = criteria
+        self.fallback = fallback
+        self.n_calls = 0
+        self.n_fallbacks = 0
+
+    def _messages(self, question: str, prediction: str, reference: str):
+        criteria_block = "\n".join(f'   - "{name}": {desc}' for name, desc in self.criteria.items())
+        schema = ", ".join(f'"{name}": {{"score": 1, "reasoning": "..."}}' for name in self.criteria)
+        prompt = JUDGE_TEMPLATE.format(
+            question=question,
+            reference=reference,
+            prediction=prediction,
+            criteria_block=criteria_block,
+            schema=schema,
+        )
+        return [SystemMessage(content=JUDGE_SYSTEM), HumanMessage(content=prompt)]
+
+    async def __call__(self, question: str, prediction: str, reference: str) -> Dict[str, Any]:
+        self.n_calls += 1
+        message = await self.llm.ainvoke(self._messages(question, prediction, reference))
+        tokens = _token_usage(message)
+        try:
+            parsed = parse_judgement(message.content, self.criteria)
+        except (ValueError, json.JSONDecodeError):
+            parsed = {"qa_verdict": None, "scores": {}, "values": {}}
+
+        # Solo se repiten con evaluadores individuales las partes que faltan
+        missing = [name for name in self.criteria if name not in parsed["scores"]]
+        need_qa = parsed["qa_verdict"] is None
+        if (missing or need_qa) and self.fallback is not None:
+            self.n_fallbacks += 1
+            backup = await self.fallback(question, prediction, reference, names=missing, with_qa=need_qa)
+            for name in missing:
+                parsed["scores"][name] = backup["crit_scores"][name] * 10.0
+                parsed["values"][name] = backup["crit_values"][name]
+            if need_qa:
+                parsed["qa_verdict"] = backup["qa_verdict"]
+            tokens += backup.get("judge_tokens", 0)
+            failed = list(backup.get("judge_failed", []))
+        else:
+            failed = missing
+
+        verdict = parsed["qa_verdict"] or "UNKNOWN"
+        return {
+            "qa_score":     1.0 if verdict == "CORRECT" else 0.0,
+            "qa_verdict":   verdict,
+            # Normalizamos dividiendo por 10 → 0‑1 (mismo criterio que los evaluadores individuales)
+            "crit_scores":  {n: parsed["scores"].get(n, 0.0) / 10.0 for n in self.criteria},
+            "crit_values":  {n: parsed["values"].get(n, "") for n in self.criteria},
+            "judge_tokens": tokens,
+            "judge_failed": [n for n in self.criteria if n in failed],  # sin puntuación válida (no se cachean)
+        }
+
+
+def separate_grader(qa_eval, scorers) -> Grader:
+    """Evaluación clásica: QAEvalChain + un `labeled_score_string` por criterio, concurrentes."""
+
+    async def grade(question: str, prediction: str, reference: str,
+                    names: Optional[list] = None, with_qa: bool = True) -> Dict[str, Any]:
+        grading_args = dict(input=question, prediction=prediction, reference=reference)
+        names  = list(scorers) if names is None else names
+        graded = await asyncio.gather(
+            *(scorers[name].aevaluate_strings(**grading_args) for name in names),
+            *([qa_eval.aevaluate_strings(**grading_args)] if with_qa else []),
+        )
+        crit_graded = dict(zip(names, graded))
+        qa_graded   = graded[len(names)] if with_qa else {}
+        return {
+            "qa_score":     to_float(qa_graded.get("score", 0)),
+            "qa_verdict":   qa_graded.get("value", "UNKNOWN"),
+            "crit_scores":  {n: to_float(g.get("score", 0)) / 10.0 for n, g in crit_graded.items()},
+            "crit_values":  {n: str(g.get("value", g.get("reasoning", ""))) for n, g in crit_graded.items()},
+            "judge_tokens": 0,
+            "judge_failed": [n for n, g in crit_graded.items() if g.get("score") is None],
+        }
+
+    return grade
+
+
+class CachedGrader:
+    """Caché persistente de resultados del juez, direccionada por contenido.
+
+    Clave por criterio: (criterio, descripción, juez, prompt, pregunta, predicción, referencia).
+    Si todos los criterios y el veredicto QA están en caché no se llama al LLM.
+    Los veredictos UNKNOWN y los criterios sin puntuación válida no se guardan:
+    un fallo transitorio del juez se vuelve a evaluar en la siguiente ejecución.
+    """
+
+    QA_KEY = "__qa__"
+
+    def __init__(self, grader: Grader, criteria: Dict[str, str], judge_id: str,
+                 cache: Optional[SQLiteCache] = None, prompt_hash: str = JUDGE_PROMPT_HASH):
+        self.grader = grader
+        self.criteria = criteria
+        self.judge_id = judge_id
+        self.prompt_hash = prompt_hash
+        if cache is None:
+            cache = SQLiteCache(JUDGE_CACHE_PATH, table="judgements", max_entries=JUDGE_CACHE_MAX_ENTRIES)
+        self.cache = cache
+
+    def _keys(self, question: str, prediction: str, reference: str) -> Dict[str, str]:
+        names = {**self.criteria, self.QA_KEY: "qa"}
+        return {
+            name: text_hash(name, desc, self.judge_id, self.prompt_hash, question, prediction, reference)
+            for name, desc in names.items()
+        }
+
+    async def __call__(self, question: str, prediction: str, reference: str) -> Dict[str, Any]:
+        keys = self._keys(question, prediction, reference)
+        blobs = self.cache.get_many(list(keys.values()))
+        found = {name: json.loads(blobs[key]) for name, key in keys.items() if key in blobs}
+
+        if len(found) < len(keys):
+            graded = await self.grader(question, prediction, reference)
+            failed = set(graded.get("judge_failed", ()))
+            fresh = {name: {"score": graded["crit_scores"][name], "value": graded["crit_values"][name]}
+                     for name in self.criteria if name not in failed}
+            if graded["qa_verdict"] != "UNKNOWN":
+                fresh[self.QA_KEY] = {"score": graded["qa_score"], "value": graded["qa_verdict"]}
+            self.cache.set_many({keys[name]: json.dumps(item).encode("utf-8") for name, item in fresh.items()})
+            return graded
+
+        return {
+            "qa_score":     found[self.QA_KEY]["score"],
+            "qa_verdict":   found[self.QA_KEY]["value"],
+            "crit_scores":  {n: found[n]["score"] for n in self.criteria},
+            "crit_values":  {n: found[n]["value"] for n in self.criteria},
+            "judge_tokens": 0,
+            "judge_cached": True,
+        }
+
+    def stats(self) -> Dict[str, float]:
+        return self.cache.stats()
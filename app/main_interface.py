@@ -14,10 +14,7 @@ from pathlib import Path
 from datetime import datetime
 
 import streamlit as st
-import pandas as pd
-import numpy as np
-import altair as alt
-import mlflow
+# mlflow, pandas y altair solo se importan en la pestaña de Métricas
 
 # ───────────────────────────
 #  Rutas internas
@@ -25,7 +22,9 @@ import mlflow
 APP_ROOT = Path(__file__).resolve().parent.parent
 sys.path.append(str(APP_ROOT))  # para importar app.*
 
-from app.rag_pipeline import load_vectorstore_from_disk, build_chain  # noqa: E402
+from app.rag_pipeline import load_vectorstore_from_disk, build_chain, build_history  # noqa: E402
+from app.streaming import StreamHandler, format_sources  # noqa: E402
+from app.tracing import Tracer  # noqa: E402
 
 # ───────────────────────────
 #  Constantes de branding
@@ -95,9 +94,15 @@ st.markdown("---")
 @st.cache_resource(show_spinner="🔄 Cargando base de conocimientos…")
 def get_vectordb_and_chain():
     vectordb = load_vectorstore_from_disk()
-    chain    = build_chain(vectordb)
+    chain    = build_chain(vectordb, cache_answers=True)
     return vectordb, chain
 
+
+@st.cache_resource
+def get_tracer():
+    # Una traza por turno en RAG_TRACE_FILE (condensación, embedding, búsqueda, generación)
+    return Tracer()
+
 # ───────────────────────────
 #  Sidebar
 # ───────────────────────────
@@ -121,34 +126,61 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("<small>© {} Juan Felipe Cardona Arango</small>".format(datetime.now().year), unsafe_allow_html=True)
 
-# ───────────────────────────
-#  Cargar RAG una sola vez
-# ───────────────────────────
-_, chain = get_vectordb_and_chain()
-
 # ╔═══════════════════════════════════════════════════════════════════════════╗
 # ║                                   CHAT                                   ║
 # ╚═══════════════════════════════════════════════════════════════════════════╝
 if modo == "🤖 Chatbot":
+    # Cargar RAG una sola vez (solo al chatear)
+    _, chain = get_vectordb_and_chain()
+
     st.header("🗣️ Chat con tu Coach de Resistencia")
 
     pregunta = st.text_input("Formula tu pregunta (p. ej. ‘¿Cómo estructuro mi semana de carga antes de la carrera?’):")
 
     if "chat_history" not in st.session_state:
-        st.session_state.chat_history: list[tuple[str, str]] = []
+        st.session_state.chat_history = build_history()  # ventana + resumen
+
+    if "turn_timings" not in st.session_state:
+        st.session_state.turn_timings: list[dict] = []
 
     if pregunta:
-        with st.spinner("Generando respuesta…"):
-            try:
-                result  = chain.invoke({"question": pregunta, "chat_history": st.session_state.chat_history, "sport": sport})
-                answer  = result["answer"]
-            except Exception:
-                answer  = "⚠️ Lo siento, ocurrió un error:\n\n```{}```".format(traceback.format_exc(limit=2))
-            st.session_state.chat_history.append((pregunta, answer))
+        # Streaming: fuentes en cuanto acaba la recuperación, tokens según llegan
+        sources_box = st.empty()
+        answer_box  = st.empty()
+
+        def show_sources(docs):
+            sources_box.markdown("📚 **Fuentes**\n" + format_sources(docs))
+
+        def show_partial(_, text):
+            answer_box.markdown(f'<div class="bubble-bot"><strong>🤖 Coach:</strong><br/>{text}▌</div>', unsafe_allow_html=True)
+
+        handler = StreamHandler(on_token=show_partial, on_sources=show_sources)
+        try:
+            with get_tracer().turn(ui="main_interface", sport=sport) as trace:
+                result  = chain.invoke({"question": pregunta, "chat_history": st.session_state.chat_history.for_question(pregunta), "sport": sport},
+                                       config={"callbacks": [handler, trace]})
+            answer  = result["answer"]
+            if handler.sources is None and result.get("source_documents"):  # respuesta desde caché
+                show_sources(result["source_documents"])
+        except Exception:
+            answer  = "⚠️ Lo siento, ocurrió un error:\n\n```{}```".format(traceback.format_exc(limit=2))
+        answer_box.empty()  # la respuesta completa aparece en el historial
+        st.session_state.turn_timings.append(handler.timings())
+        st.session_state.chat_history.add(pregunta, answer)
+
+    if st.session_state.turn_timings:
+        timings = st.session_state.turn_timings[-1]
+        st.caption("⏱️ Primer token: {:.2f} s · respuesta completa: {:.2f} s".format(
+            timings["ttft_s"], timings["total_s"]))
+
+    if hasattr(chain, "stats"):
+        cache_stats = chain.stats()
+        st.caption("⚡ Caché de respuestas: {:.0%} aciertos · {:.1f} s ahorrados".format(
+            cache_stats["hit_rate"], cache_stats["saved_seconds"]))
 
     if st.session_state.chat_history:
         st.markdown("---")
-        for q, a in reversed(st.session_state.chat_history):
+        for q, a in reversed(st.session_state.chat_history.turns):
             st.markdown(f'<div class="bubble-user"><strong>🧑‍💻 Tú:</strong><br/>{q}</div>', unsafe_allow_html=True)
             st.markdown(f'<div class="bubble-bot"><strong>🤖 Coach:</strong><br/>{a}</div>', unsafe_allow_html=True)
 
@@ -156,6 +188,20 @@ if modo == "🤖 Chatbot":
 # ║                                  MÉTRICAS                                ║
 # ╚═══════════════════════════════════════════════════════════════════════════╝
 else:  # modo == "📊 Métricas"
+    import mlflow
+    import numpy as np
+    import altair as alt
+
+    from app.metrics_store import read_aggregates, read_results, sync_from_mlflow
+    from app.run_store import RUNS_CACHE_TTL
+
+    # Resultados de evaluación: almacén Parquet con agregados precalculados;
+    # al expirar el TTL solo se exportan los runs nuevos de MLflow
+    @st.cache_data(ttl=RUNS_CACHE_TTL, show_spinner="🔄 Cargando resultados…")
+    def cached_store(experiment_name: str):
+        sync_from_mlflow(experiment_name)
+        return read_results(experiment_name), read_aggregates(experiment_name)
+
     st.header("📈 Resultados de Evaluación del LLM")
 
     try:
@@ -172,40 +218,34 @@ else:  # modo == "📊 Métricas"
     exp_names     = [exp.name for exp in experiments]
     selected_exp  = st.selectbox("Selecciona un experimento:", exp_names)
 
-    experiment    = next(exp for exp in experiments if exp.name == selected_exp)
-    runs          = client.search_runs(experiment_ids=[experiment.experiment_id], order_by=["start_time DESC"])
+    results, aggregates = cached_store(selected_exp)
 
-    if not runs:
+    if results.empty:
         st.warning("No hay ejecuciones registradas.")
         st.stop()
 
-    # ── DataFrame con parámetros y métricas
-    data = [
-        {
-            "Pregunta"  : run.data.params.get("question"),
-            "Prompt"    : run.data.params.get("prompt_version"),
-            "Chunk Size": int(run.data.params.get("chunk_size", 0)),
-            "Precisión" : run.data.metrics.get("lc_is_correct", np.nan),
-        }
-        for run in runs
-    ]
-    df = pd.DataFrame(data)
+    # ── Tabla por pregunta
+    df = results.rename(columns={
+        "question":       "Pregunta",
+        "prompt_version": "Prompt",
+        "chunk_size":     "Chunk Size",
+        "qa_score":       "Precisión",
+    })[["Pregunta", "Prompt", "Chunk Size", "Precisión"]]
     st.dataframe(df, use_container_width=True)
 
-    # ── Agrupar y limpiar
+    # ── Precisión media por configuración (precalculada al exportar)
     grouped = (
-        df.groupby(["Prompt", "Chunk Size"], dropna=False)
-          .agg({"Precisión": "mean"})
-          .reset_index()
+        aggregates[aggregates["metric"] == "qa_score"]
+        .rename(columns={"prompt_version": "Prompt", "chunk_size": "Chunk Size",
+                         "chunk_overlap": "Overlap", "mean": "Precisión"})
     )
-    grouped["Precisión"] = pd.to_numeric(grouped["Precisión"], errors="coerce")
-    grouped = grouped.dropna(subset=["Precisión"])
-    grouped = grouped[grouped["Precisión"].apply(np.isfinite)]
+    grouped = grouped[grouped["Precisión"].apply(np.isfinite)].copy()
 
     if grouped.empty:
         st.info("No hay datos suficientes para graficar la precisión.")
     else:
-        grouped["config"] = grouped["Prompt"] + " | " + grouped["Chunk Size"].astype(str)
+        grouped["config"] = (grouped["Prompt"] + " | " + grouped["Chunk Size"].astype(str)
+                             + " | " + grouped["Overlap"].astype(str) + " | k=" + grouped["k"].astype(str))
 
         chart = (
             alt.Chart(grouped)
@@ -213,7 +253,7 @@ else:  # modo == "📊 Métricas"
                .encode(
                    x=alt.X("config:N", title="Configuración", sort=None),
                    y=alt.Y("Precisión:Q", title="Precisión media", scale=alt.Scale(domain=[0,1])),
-                   tooltip=["Prompt", "Chunk Size", alt.Tooltip("Precisión:Q", format=".2f")],
+                   tooltip=["Prompt", "Chunk Size", "Overlap", "k", alt.Tooltip("Precisión:Q", format=".2f"), "count"],
                )
                .properties(width=640, height=420)
         )
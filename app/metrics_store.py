@@ -0,0 +1,204 @@
+# app/metrics_store.py
+# ──────────────────────────────────────────────────────────────
+# Almacén columnar de resultados de evaluación para los dashboards.
+# Por experimento se guardan dos Parquet con columnas tipadas:
+#
+#   results.parquet     → una fila por pregunta evaluada
+#   aggregates.parquet  → una fila por (configuración, métrica) con
+#                         media, desviación, recuento y percentiles
+#
+# Los agregados se calculan al escribir (run_eval o sincronización
+# desde MLflow), no en cada interacción del dashboard.
+#
+#   python app/metrics_store.py eval_v1_asistente_deporte   # backfill desde MLflow
+# ──────────────────────────────────────────────────────────────
+import os
+import sys
+import argparse
+from typing import Any, Dict, List, Optional
+
+import mlflow
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.cache import CACHE_DIR  # noqa: E402
+from app.run_store import column, load_runs, question_runs  # noqa: E402
+
+METRICS_STORE_DIR = os.getenv("METRICS_STORE_DIR", os.path.join(CACHE_DIR, "metrics"))
+DEFAULT_K         = int(os.getenv("RETRIEVER_K", 4))   # runs anteriores a registrar `k`
+
+RESULTS_FILE    = "results.parquet"
+AGGREGATES_FILE = "aggregates.parquet"
+
+CRITERIA    = ["correctness", "relevance", "coherence", "toxicity", "harmfulness"]
+CONFIG_KEYS = ["prompt_version", "chunk_size", "chunk_overlap", "k"]
+METRICS     = [f"{c}_score" for c in CRITERIA] + ["qa_score", "judge_latency_s", "judge_tokens"]
+PERCENTILES = {"p50": 0.50, "p95": 0.95}
+
+RESULTS_SCHEMA = pa.schema(
+    [
+        ("result_id",      pa.string()),
+        ("parent_run_id",  pa.string()),
+        ("start_time",     pa.timestamp("ms")),
+        ("question",       pa.string()),
+        ("prompt_version", pa.string()),
+        ("chunk_size",     pa.int32()),
+        ("chunk_overlap",  pa.int32()),
+        ("k",              pa.int32()),
+        ("judge_mode",     pa.string()),
+        ("reasoning",      pa.string()),
+    ]
+    + [(name, pa.float64()) for name in METRICS]
+)
+
+AGGREGATES_SCHEMA = pa.schema(
+    [(key, RESULTS_SCHEMA.field(key).type) for key in CONFIG_KEYS]
+    + [("metric", pa.string()), ("count", pa.int64()), ("mean", pa.float64()), ("std", pa.float64())]
+    + [(name, pa.float64()) for name in PERCENTILES]
+)
+
+
+def store_dir(experiment: str, directory: str = METRICS_STORE_DIR) -> str:
+    return os.path.join(directory, experiment)
+
+
+# ──────────────────────────────────────────────────────────────
+# Conversión a filas tipadas
+# ──────────────────────────────────────────────────────────────
+def _typed(frame: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    for field in schema:
+        if field.name not in frame:
+            frame[field.name] = None
+    return pa.Table.from_pandas(frame[schema.names], schema=schema, preserve_index=False)
+
+
+def reasoning_text(crit_values: Dict[str, Any]) -> Optional[str]:
+    """Valor del juez por criterio, una línea por criterio (columna `reasoning`)."""
+    lines = [f"{crit}: {value}" for crit, value in (crit_values or {}).items() if value]
+    return "\n".join(lines) or None
+
+
+def frame_from_results(results: List[Dict[str, Any]], params: Dict[str, Any],
+                       parent_run_id: Optional[str] = None) -> pd.DataFrame:
+    """Resultados de `run_eval.evaluate_dataset` (con `run_id` si hubo runs hijos)."""
+    rows = []
+    for res in results:
+        row = {
+            "result_id":     res.get("run_id") or f"{parent_run_id}:{res['idx']}",
+            "parent_run_id": parent_run_id,
+            "start_time":    pd.Timestamp.now().floor("ms"),
+            "question":      res["question"],
+            **{key: params.get(key) for key in CONFIG_KEYS + ["judge_mode"]},
+            "reasoning":     reasoning_text(res.get("crit_values")),
+            "qa_score":        res["qa_score"],
+            "judge_latency_s": res["judge_s"],
+            "judge_tokens":    res["judge_tokens"],
+        }
+        row.update({f"{crit}_score": score for crit, score in res["crit_scores"].items()})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def frame_from_runs(runs: pd.DataFrame) -> pd.DataFrame:
+    """Runs por pregunta de MLflow (DataFrame de `run_store.load_runs`)."""
+    runs = question_runs(runs)
+    frame = pd.DataFrame({
+        "result_id":      runs["run_id"],
+        "parent_run_id":  column(runs, "tags.mlflow.parentRunId"),
+        "start_time":     pd.to_datetime(runs["start_time"], unit="ms"),
+        "question":       column(runs, "params.question"),
+        "prompt_version": column(runs, "params.prompt_version"),
+        "chunk_size":     pd.to_numeric(column(runs, "params.chunk_size", 0)).fillna(0).astype("int32"),
+        "chunk_overlap":  pd.to_numeric(column(runs, "params.chunk_overlap", 0)).fillna(0).astype("int32"),
+        "k":              pd.to_numeric(column(runs, "params.k", DEFAULT_K)).fillna(DEFAULT_K).astype("int32"),
+        "judge_mode":     column(runs, "params.judge_mode"),
+        "reasoning":      column(runs, "tags.eval_reasoning").fillna(column(runs, "params.eval_reasoning")),
+    })
+    for name in METRICS:
+        frame[name] = pd.to_numeric(column(runs, f"metrics.{name}"), errors="coerce")
+    # Runs antiguos: la precisión QA se registraba como lc_is_correct
+    legacy = pd.to_numeric(column(runs, "metrics.lc_is_correct"), errors="coerce")
+    frame["qa_score"] = frame["qa_score"].fillna(legacy)
+    return frame
+
+
+# ──────────────────────────────────────────────────────────────
+# Agregados por configuración
+# ──────────────────────────────────────────────────────────────
+def aggregate(results: pd.DataFrame) -> pd.DataFrame:
+    long = results.melt(id_vars=CONFIG_KEYS, value_vars=METRICS, var_name="metric").dropna(subset=["value"])
+    grouped = long.groupby(CONFIG_KEYS + ["metric"], dropna=False)["value"]
+    agg = grouped.agg(["count", "mean", "std"])
+    for name, q in PERCENTILES.items():
+        agg[name] = grouped.quantile(q)
+    return agg.reset_index()
+
+
+# ──────────────────────────────────────────────────────────────
+# Lectura / escritura
+# ──────────────────────────────────────────────────────────────
+def read_results(experiment: str, directory: str = METRICS_STORE_DIR) -> pd.DataFrame:
+    path = os.path.join(store_dir(experiment, directory), RESULTS_FILE)
+    return pq.read_table(path).to_pandas() if os.path.exists(path) else RESULTS_SCHEMA.empty_table().to_pandas()
+
+
+def read_aggregates(experiment: str, directory: str = METRICS_STORE_DIR) -> pd.DataFrame:
+    path = os.path.join(store_dir(experiment, directory), AGGREGATES_FILE)
+    return pq.read_table(path).to_pandas() if os.path.exists(path) else AGGREGATES_SCHEMA.empty_table().to_pandas()
+
+
+def _write(table: pa.Table, path: str) -> None:
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def write_results(experiment: str, frame: pd.DataFrame, directory: str = METRICS_STORE_DIR) -> int:
+    """Añade (o reemplaza por `result_id`) filas y recalcula los agregados. Devuelve el total de filas."""
+    path = store_dir(experiment, directory)
+    os.makedirs(path, exist_ok=True)
+    new = _typed(frame.copy(), RESULTS_SCHEMA).to_pandas()
+    current = read_results(experiment, directory)
+    merged = new if current.empty else pd.concat([current, new], ignore_index=True)
+    merged = merged.drop_duplicates("result_id", keep="last").sort_values("start_time", ascending=False)
+
+    _write(_typed(merged, RESULTS_SCHEMA), os.path.join(path, RESULTS_FILE))
+    _write(_typed(aggregate(merged), AGGREGATES_SCHEMA), os.path.join(path, AGGREGATES_FILE))
+    return len(merged)
+
+
+def sync_from_mlflow(experiment: str, client=None, directory: str = METRICS_STORE_DIR) -> int:
+    """Exporta al almacén los runs de MLflow que aún no estén. Devuelve las filas añadidas."""
+    client = client or mlflow.tracking.MlflowClient()
+    exp = client.get_experiment_by_name(experiment)
+    if exp is None:
+        return 0
+    runs = load_runs(exp.experiment_id, client=client)
+    if runs.empty:
+        return 0
+    known = set(read_results(experiment, directory)["result_id"])
+    fresh = runs[~runs["run_id"].isin(known)]
+    fresh = frame_from_runs(fresh) if not fresh.empty else fresh
+    if fresh.empty:
+        return 0
+    write_results(experiment, fresh, directory)
+    return len(fresh)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Exporta runs de evaluación de MLflow al almacén Parquet")
+    parser.add_argument("experiments", nargs="*", help="por defecto, todos los experimentos eval_*")
+    parser.add_argument("--directory", default=METRICS_STORE_DIR)
+    args = parser.parse_args(argv)
+
+    client = mlflow.tracking.MlflowClient()
+    names = args.experiments or [e.name for e in client.search_experiments() if e.name.startswith("eval_")]
+    for name in names:
+        added = sync_from_mlflow(name, client=client, directory=args.directory)
+        print(f"📦 {name}: {added} filas nuevas → {store_dir(name, args.directory)}")
+
+
+if __name__ == "__main__":
+    main()
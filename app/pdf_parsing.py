@@ -0,0 +1,99 @@
+# app/pdf_parsing.py
+# ──────────────────────────────────────────────────────────────
+# Parseo de PDFs en paralelo (pool de procesos) con timeout por
+# archivo, orden determinista y reporte de tiempos por documento.
+#
+# El timeout usa SIGALRM: solo en POSIX y desde el hilo principal
+# (los workers del pool lo son). Llamado desde otro hilo (p. ej. un
+# hilo de Streamlit o de la API) o en Windows, el archivo se parsea
+# sin límite de tiempo y se emite un RuntimeWarning.
+# ──────────────────────────────────────────────────────────────
+import os
+import time
+import signal
+import warnings
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", 1))
+PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", 120))
+
+
+class ParseTimeout(BaseException):
+    # BaseException: pypdf captura `Exception` internamente al reparar PDFs
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise ParseTimeout()
+
+
+def alarm_available() -> bool:
+    # SIGALRM solo existe en POSIX y solo se instala desde el hilo principal
+    return hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+
+
+def parse_pdf(file_path: str, timeout: Optional[float] = None) -> Tuple[list, Dict]:
+    """Parsea un PDF y devuelve (páginas, entrada del reporte). Nunca lanza.
+
+    `timeout` solo se aplica en POSIX desde el hilo principal (SIGALRM).
+    """
+    from langchain_community.document_loaders import PyPDFLoader  # pypdf: solo en la ingesta
+
+    use_alarm = bool(timeout) and alarm_available()
+    if timeout and not use_alarm:
+        warnings.warn(
+            f"Sin timeout para {os.path.basename(file_path)}: SIGALRM requiere POSIX y el hilo principal",
+            RuntimeWarning,
+        )
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    start = time.perf_counter()
+    docs, status, error = [], "ok", None
+    try:
+        docs = PyPDFLoader(file_path).load()
+    except ParseTimeout:
+        status, error = "timeout", f"más de {timeout:g} s"
+    except Exception as exc:  # PDF corrupto o ilegible
+        status, error = "error", f"{type(exc).__name__}: {exc}"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+    entry = {
+        "file": os.path.basename(file_path),
+        "pages": len(docs),
+        "seconds": round(time.perf_counter() - start, 4),
+        "status": status,
+        "error": error,
+    }
+    return docs, entry
+
+
+def parse_pdfs(paths: List[str], workers: int = PDF_WORKERS, timeout: Optional[float] = PDF_TIMEOUT) -> Tuple[list, List[Dict]]:
+    """Parsea `paths` con `workers` procesos. Las páginas vuelven en el orden de `paths`."""
+    if workers <= 1 or len(paths) <= 1:
+        results = [parse_pdf(p, timeout) for p in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            # map conserva el orden de entrada aunque los archivos terminen desordenados
+            results = list(pool.map(parse_pdf, paths, [timeout] * len(paths)))
+
+    docs, report = [], []
+    for file_docs, entry in results:
+        docs.extend(file_docs)
+        report.append(entry)
+        if entry["status"] != "ok":
+            print(f"⚠️  {entry['file']} omitido ({entry['status']}: {entry['error']})")
+    return docs, report
+
+
+def format_parse_report(report: List[Dict], top: int = 10) -> str:
+    lines = [f"{'archivo':<60} {'págs':>5} {'seg':>8}  estado"]
+    for entry in sorted(report, key=lambda e: e["seconds"], reverse=True)[:top]:
+        lines.append(f"{entry['file'][:60]:<60} {entry['pages']:>5} {entry['seconds']:>8.2f}  {entry['status']}")
+    return "\n".join(lines)
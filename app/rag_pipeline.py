@@ -1,69 +1,392 @@
 # app/rag_pipeline.py
 
 import os
-from langchain.globals import set_verbose, get_verbose
-
-set_verbose(True)  # Si quieres ver logs detallados
-
-from langchain_openai import OpenAIEmbeddings
-from langchain_openai import ChatOpenAI
+import json
+import hashlib
 
 from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.prompts import PromptTemplate
-from langchain.chains import ConversationalRetrievalChain
-
 from dotenv import load_dotenv
-import mlflow
+
+# Arranque rápido: langchain_openai, mlflow, los splitters y pypdf (≈4 s entre
+# todos) se importan dentro de las funciones que los usan, no al importar el
+# módulo. Ingesta y evaluación los pagan; el chat solo langchain_openai, al
+# construir la cadena (como app/sports.py, que hereda de la cadena de LangChain).
+# Lo mismo con faiss y los módulos de ingesta (parseo, streaming, ANN, dedup,
+# planificador de embeddings): la ruta de servicio carga faiss al abrir el índice.
+# tests/test_import_time.py vigila el presupuesto y los módulos cargados.
+
+from app.bm25 import BM25_FILE, BM25Index
+from app.cache import CachedEmbeddings
+from app.cassette import install_llm_cassette, wrap_embeddings
+from app.history import ChatHistory, llm_summarizer
+from app.retrievers import DenseRetriever, HybridRetriever
+from app.tracing import TracedEmbeddings
 
 load_dotenv()
 
 DATA_DIR = "data/pdfs"
 PROMPT_DIR = "app/prompts"
 VECTOR_DIR = "vectorstore"
+MANIFEST_FILE = "manifest.json"
+INDEX_SPEC = os.getenv("VECTOR_INDEX_SPEC", "Flat")  # p. ej. "IVF256,Flat", "IVF256,PQ32", "HNSW32"
+RETRIEVER_MODE = os.getenv("RETRIEVER_MODE", "hybrid")  # "hybrid" (FAISS + BM25) o "dense"
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", 4))
+
+def get_embeddings():
+    # Todas las rutas de construcción comparten la caché persistente de embeddings;
+    # solo los fallos de caché pasan por el planificador por lotes
+    # (y, con LLM_CASSETTE_MODE, por la grabación/reproducción)
+    from langchain_openai import OpenAIEmbeddings
+
+    from app.embedding_scheduler import ScheduledEmbeddings
 
-def load_documents(path=DATA_DIR):
-    docs = []
-    for file in os.listdir(path):
-        if file.endswith(".pdf"):
-            loader = PyPDFLoader(os.path.join(path, file))
-            docs.extend(loader.load())
+    install_llm_cassette()
+    return CachedEmbeddings(ScheduledEmbeddings(wrap_embeddings(OpenAIEmbeddings())))
+
+def list_pdfs(path=DATA_DIR):
+    return sorted(file for file in os.listdir(path) if file.endswith(".pdf"))
+
+def load_documents(path=DATA_DIR, files=None, report=None, **parse_kwargs):
+    # `report` (lista opcional) recibe el tiempo de parseo de cada archivo;
+    # `parse_kwargs` (workers, timeout) sustituyen a PDF_WORKERS / PDF_TIMEOUT
+    from app.pdf_parsing import parse_pdfs
+
+    paths = [os.path.join(path, file) for file in (list_pdfs(path) if files is None else files)]
+    docs, parse_report = parse_pdfs(paths, **parse_kwargs)
+    if report is not None:
+        report.extend(parse_report)
     return docs
 
-def save_vectorstore(chunk_size=512, chunk_overlap=50, persist_path=VECTOR_DIR):
-    docs = load_documents()
-    splitter = RecursiveCharacterTextSplitter(
+def get_splitter(chunk_size=512, chunk_overlap=50):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap
     )
-    chunks = splitter.split_documents(docs)
-    embeddings = OpenAIEmbeddings()
-    vectordb = FAISS.from_documents(chunks, embedding=embeddings)
-    vectordb.save_local(persist_path)
+
+def split_documents(docs, chunk_size=512, chunk_overlap=50):
+    return get_splitter(chunk_size, chunk_overlap).split_documents(docs)
+
+# ───────────────────────────
+#  Manifest de ingesta incremental
+# ───────────────────────────
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(file, file_hash, position):
+    # IDs estables: mismo archivo con el mismo contenido → mismos IDs de chunk.
+    # El nombre entra en el ID: dos copias idénticas con otro nombre no colisionan
+    key = hashlib.sha256(f"{file}\0{file_hash}".encode("utf-8")).hexdigest()
+    return f"{key[:16]}-{position}"
+
+def chunk_ids_for(file, file_hash, chunks):
+    return [chunk_id(file, file_hash, i) for i in range(len(chunks))]
+
+def load_manifest(persist_path=VECTOR_DIR):
+    manifest_path = os.path.join(persist_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def index_version(persist_path=VECTOR_DIR):
+    # Cambia en cada reconstrucción (el manifest se reescribe siempre)
+    manifest_path = os.path.join(persist_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return "sin-manifest"
+    stat = os.stat(manifest_path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+def write_manifest(manifest, persist_path=VECTOR_DIR):
+    os.makedirs(persist_path, exist_ok=True)
+    with open(os.path.join(persist_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+def parse_by_file(files, path=DATA_DIR, report=None):
+    # Parseo en un solo lote (paralelo), agrupado por archivo
+    docs_by_file = {file: [] for file in files}
+    for doc in load_documents(path, files=files, report=report):
+        docs_by_file[os.path.basename(doc.metadata["source"])].append(doc)
+    return docs_by_file
+
+def split_by_file(docs_by_file, hashes, chunk_size, chunk_overlap, deduper=None):
+    # Troceo por archivo para asignar IDs estables por archivo;
+    # cada chunk lleva su disciplina y archivo de origen (app/sports.py).
+    # Con `deduper` (app/dedup.py) se quita el boilerplate y los casi duplicados;
+    # los IDs conservan su posición (los descartados dejan hueco)
+    from app.sports import load_sport_map, tag_chunks
+
+    sport_map = load_sport_map()
+    chunks, ids, entries, n_docs = [], [], {}, 0
+    for file, docs in docs_by_file.items():
+        pages = deduper.strip_boilerplate(docs) if deduper else docs
+        file_chunks = tag_chunks(split_documents(pages, chunk_size, chunk_overlap), sport_map)
+        file_ids = chunk_ids_for(file, hashes[file], file_chunks)
+        if deduper:
+            file_chunks, file_ids = deduper.filter(file_chunks, file_ids)
+        chunks.extend(file_chunks)
+        ids.extend(file_ids)
+        entries[file] = {"sha256": hashes[file], "chunk_ids": file_ids}
+        n_docs += len(docs)
+    if deduper:
+        record_duplicates(entries, deduper)
+    return chunks, ids, entries, n_docs
+
+def record_duplicates(entries, deduper):
+    # Archivo → archivos que conservan sus chunks descartados (ingesta incremental)
+    for file, entry in entries.items():
+        kept_by = deduper.duplicates_of(file)
+        if kept_by:
+            entry["duplicates_of"] = kept_by
+
+def duplicate_dependents(previous, changed):
+    # Archivos sin cambios cuyos duplicados descartados conservaba un archivo que
+    # cambia o desaparece: se vuelven a procesar (también en cadena)
+    changed, dependents = set(changed), set()
+    while True:
+        found = {file for file, entry in previous.items()
+                 if file not in changed and changed & set(entry.get("duplicates_of", ()))}
+        if not found:
+            return dependents
+        changed |= found
+        dependents |= found
+
+def _chunk_files(files, hashes, chunk_size, chunk_overlap, path=DATA_DIR, report=None, deduper=None):
+    return split_by_file(parse_by_file(files, path, report), hashes, chunk_size, chunk_overlap, deduper)
+
+def _dedup_stream(chunks, deduper, entries):
+    # Descarta casi duplicados antes de embeber y los quita del manifest
+    for cid, chunk in chunks:
+        if deduper.is_duplicate(chunk):
+            entries[chunk.metadata["source_file"]]["chunk_ids"].remove(cid)
+            continue
+        yield cid, chunk
+
+def _index_files_streaming(files, hashes, chunk_size, chunk_overlap, path, embeddings, batch_size, persist_path,
+                           vectordb=None, deduper=None):
+    # Páginas → chunks → lotes de embeddings → FAISS, sin materializar el corpus
+    from app.docstore import building_path
+    from app.sports import load_sport_map, tag_chunk
+    from app.streaming_ingest import IngestProgress, index_stream, iter_chunks, iter_pages
+
+    progress = IngestProgress()
+    entries = {}
+    sport_map = load_sport_map()
+    pages = iter_pages([os.path.join(path, file) for file in files], progress)
+    if deduper:
+        pages = deduper.strip_stream(pages)  # retiene solo las páginas del PDF en curso
+    chunks = ((cid, tag_chunk(chunk, sport_map))
+              for cid, chunk in iter_chunks(pages, get_splitter(chunk_size, chunk_overlap), hashes, entries, chunk_id, progress))
+    if deduper:
+        chunks = _dedup_stream(chunks, deduper, entries)
+    # Los textos van directamente al docstore SQLite en construcción (no a RAM)
+    os.makedirs(persist_path, exist_ok=True)
+    vectordb = index_stream(chunks, embeddings, batch_size=batch_size, vectordb=vectordb, progress=progress,
+                            docstore_path=building_path(persist_path))
+    for file in files:  # archivos sin texto extraíble
+        entries.setdefault(file, {"sha256": hashes[file], "chunk_ids": []})
+    if deduper:
+        record_duplicates(entries, deduper)
+    return vectordb, entries, progress
+
+def persist_vectorstore(vectordb, entries, chunk_size, chunk_overlap, persist_path=VECTOR_DIR,
+                        index_spec=INDEX_SPEC, search_params=None, dedup=None):
+    # FAISS + docstore SQLite + BM25 + shards por disciplina (+ ANN) + manifest;
+    # devuelve el índice efectivo. `dedup` (None = INGEST_DEDUP) se anota en el manifest
+    from app import sports
+    from app.ann_index import ANN_FILE, build_ann_index, flat_vectors, is_flat
+    from app.bm25 import build_from_vectorstore
+    from app.dedup import INGEST_DEDUP
+    from app.docstore import SQLiteDocstore, publish_vectorstore, save_local_atomic, write_docstore, write_index_atomic
+
+    dedup = INGEST_DEDUP if dedup is None else dedup
+
+    if isinstance(vectordb.docstore, SQLiteDocstore):
+        publish_vectorstore(vectordb, persist_path)  # ingesta en streaming / incremental: sin pickle
+    else:
+        save_local_atomic(vectordb, persist_path)
+        write_docstore(vectordb, persist_path)
+    build_from_vectorstore(vectordb).save(persist_path)
+    sports.build_from_vectorstore(vectordb).save(persist_path)
+
+    # El índice plano es el canónico (admite altas/bajas incrementales);
+    # el ANN se reentrena desde sus vectores y conserva las mismas posiciones
+    ann_path = os.path.join(persist_path, ANN_FILE)
+    if is_flat(index_spec):
+        index_spec, search_params = "Flat", None
+        if os.path.exists(ann_path):
+            os.remove(ann_path)
+    else:
+        ann = build_ann_index(flat_vectors(vectordb.index), index_spec, search_params=search_params)
+        write_index_atomic(ann, ann_path)  # los lectores lo tienen mapeado en memoria
+
+    write_manifest(
+        {
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "dedup": dedup,
+            "index_spec": index_spec,
+            "search_params": search_params,
+            "files": dict(sorted(entries.items())),
+        },
+        persist_path,
+    )
+    return index_spec
+
+def save_vectorstore(chunk_size=512, chunk_overlap=50, persist_path=VECTOR_DIR, incremental=False, path=DATA_DIR,
+                     streaming=False, batch_size=None, index_spec=INDEX_SPEC, search_params=None, dedup=None):
+    # batch_size / dedup: None = INGEST_BATCH_SIZE / INGEST_DEDUP
+    from app.dedup import INGEST_DEDUP, ChunkDeduplicator
+    from app.docstore import has_compact_store, load_writable_vectorstore
+    from app.pdf_parsing import format_parse_report
+    from app.streaming_ingest import INGEST_BATCH_SIZE
+
+    batch_size = batch_size or INGEST_BATCH_SIZE
+    dedup = INGEST_DEDUP if dedup is None else dedup
+    files = list_pdfs(path)
+    hashes = {file: file_sha256(os.path.join(path, file)) for file in files}
+    manifest = load_manifest(persist_path) if incremental else None
+
+    # El manifest solo es reutilizable con la misma configuración de troceo y deduplicación
+    if manifest and (manifest.get("chunk_size"), manifest.get("chunk_overlap")) != (chunk_size, chunk_overlap):
+        manifest = None
+    if manifest and manifest.get("dedup", False) != dedup:
+        manifest = None
+    if manifest and not os.path.exists(os.path.join(persist_path, "index.faiss")):
+        manifest = None
+
+    embeddings = get_embeddings()
+    deduper = ChunkDeduplicator() if dedup else None
+    parse_report = []
+    if manifest is None:
+        mode = "full"
+        removed_ids = []
+        if streaming:
+            vectordb, entries, progress = _index_files_streaming(
+                files, hashes, chunk_size, chunk_overlap, path, embeddings, batch_size, persist_path, deduper=deduper
+            )
+            n_docs, n_added, parse_report = progress.pages, progress.indexed, progress.parse_report
+        else:
+            chunks, ids, entries, n_docs = _chunk_files(files, hashes, chunk_size, chunk_overlap, path, parse_report,
+                                                        deduper)
+            if not chunks:
+                raise ValueError(f"La ingesta no produjo ningún chunk: ¿hay PDFs con texto extraíble en {path}?")
+            vectordb = FAISS.from_documents(chunks, embedding=embeddings, ids=ids)
+            n_added = len(chunks)
+    else:
+        mode = "incremental"
+        previous = manifest["files"]
+        changed = [f for f in files if previous.get(f, {}).get("sha256") != hashes[f]]
+        changed += [f for f in previous if f not in hashes]
+        dependents = duplicate_dependents(previous, changed)
+        pending = [f for f in files if f in changed or f in dependents]
+        stale = [f for f in previous if f not in hashes or f in pending]
+        if dependents:
+            print(f"♻️  {len(dependents)} archivo(s) sin cambios se reprocesan: sus duplicados los conservaba "
+                  f"un archivo modificado o eliminado")
+        removed_ids = [cid for f in stale for cid in previous[f]["chunk_ids"]]
+
+        if has_compact_store(persist_path):
+            vectordb = load_writable_vectorstore(persist_path, embeddings)
+        else:  # índices anteriores al docstore SQLite
+            vectordb = FAISS.load_local(persist_path, embeddings, allow_dangerous_deserialization=True)
+        if removed_ids:
+            vectordb.delete(removed_ids)
+        if deduper:  # los archivos nuevos se comparan también con lo ya indexado
+            deduper.seed(vectordb.docstore.search(doc_id) for doc_id in vectordb.index_to_docstore_id.values())
+        if streaming:
+            vectordb, new_entries, progress = _index_files_streaming(
+                pending, hashes, chunk_size, chunk_overlap, path, embeddings, batch_size, persist_path, vectordb, deduper
+            )
+            n_docs, n_added, parse_report = progress.pages, progress.indexed, progress.parse_report
+        else:
+            chunks, ids, new_entries, n_docs = _chunk_files(pending, hashes, chunk_size, chunk_overlap, path,
+                                                            parse_report, deduper)
+            if chunks:
+                vectordb.add_documents(chunks, ids=ids)
+            n_added = len(chunks)
+        entries = {f: previous[f] for f in files if f not in pending}
+        entries.update(new_entries)
+
+    if parse_report:
+        print(format_parse_report(parse_report))
+
+    index_spec = persist_vectorstore(vectordb, entries, chunk_size, chunk_overlap, persist_path,
+                                     index_spec, search_params, dedup)
+
+    import mlflow
 
     mlflow.set_experiment("vectorstore_tracking")
     with mlflow.start_run(run_name="vectorstore_build"):
+        mlflow.log_param("chunk_size", chunk_size)
         mlflow.log_param("chunk_overlap", chunk_overlap)
-        mlflow.log_param("n_chunks", len(chunks))
-        mlflow.log_param("n_docs", len(docs))
+        mlflow.log_param("build_mode", mode)
+        mlflow.log_param("streaming", streaming)
+        mlflow.log_param("dedup", dedup)
+        mlflow.log_param("index_spec", index_spec)
+        mlflow.log_param("n_chunks", len(vectordb.index_to_docstore_id))
+        mlflow.log_param("n_docs", n_docs)
+        mlflow.log_metric("chunks_added", n_added)
+        mlflow.log_metric("chunks_removed", len(removed_ids))
+        cache_stats = embeddings.stats()
+        mlflow.log_metric("embedding_cache_hits", cache_stats["hits"])
+        mlflow.log_metric("embedding_cache_misses", cache_stats["misses"])
+        mlflow.log_metric("embedding_cache_hit_rate", cache_stats["hit_rate"])
+        scheduler_stats = embeddings.underlying.stats()
+        mlflow.log_metric("embedding_batches", scheduler_stats["batches"])
+        mlflow.log_metric("embedding_retries", scheduler_stats["retries"])
+        mlflow.log_metric("embedding_chunks_per_sec", scheduler_stats["chunks_per_sec"])
+        mlflow.log_metric("pdf_parse_seconds", sum(e["seconds"] for e in parse_report))
+        if deduper:
+            dedup_stats = deduper.stats()
+            print(f"🧹 Dedup: {dedup_stats['chunks_removed']} de {dedup_stats['chunks_in']} chunks descartados, "
+                  f"{dedup_stats['boilerplate_lines']} líneas de boilerplate, ~{dedup_stats['tokens_saved']} tokens ahorrados")
+            mlflow.log_metric("dedup_chunks_removed", dedup_stats["chunks_removed"])
+            mlflow.log_metric("dedup_exact_duplicates", dedup_stats["exact_duplicates"])
+            mlflow.log_metric("dedup_near_duplicates", dedup_stats["near_duplicates"])
+            mlflow.log_metric("dedup_boilerplate_lines", dedup_stats["boilerplate_lines"])
+            mlflow.log_metric("dedup_tokens_saved", dedup_stats["tokens_saved"])
+        if parse_report:
+            mlflow.log_dict({"files": parse_report}, "parse_report.json")
+        shards = load_shards(vectordb, persist_path)
+        if shards is not None:
+            mlflow.log_dict(shards.counts(), "sport_shards.json")
         mlflow.set_tag("vectorstore", persist_path)
 
 def load_vectorstore(chunk_size=512, chunk_overlap=50):
     docs = load_documents()
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
-    )
-    chunks = splitter.split_documents(docs)
-    embeddings = OpenAIEmbeddings()
+    chunks = split_documents(docs, chunk_size, chunk_overlap)
+    embeddings = get_embeddings()
     return FAISS.from_documents(chunks, embedding=embeddings)
 
-def load_vectorstore_from_disk(persist_path=VECTOR_DIR):
-    embeddings = OpenAIEmbeddings()
+def load_vectorstore_from_disk(persist_path=VECTOR_DIR, mmap=True, embeddings=None):
+    # Índice de consulta: embed_query aparece como etapa propia en las trazas (app/tracing.py).
+    # `embeddings` permite inyectar un modelo falso (benchmarks sin red)
+    from app.ann_index import ANN_FILE, is_flat, set_search_params
+    from app.docstore import PICKLE_FILE, has_compact_store, load_mmap_vectorstore
+
+    embeddings = TracedEmbeddings(embeddings or get_embeddings())
+    # Solo lectura: índice mapeado en memoria + chunks leídos bajo demanda desde SQLite
+    # (única opción para los índices de la ingesta en streaming, que no tienen pickle)
+    no_pickle = not os.path.exists(os.path.join(persist_path, PICKLE_FILE))
+    if (mmap or no_pickle) and has_compact_store(persist_path):
+        manifest = load_manifest(persist_path) or {}
+        index_spec = manifest.get("index_spec") or "Flat"
+        if is_flat(index_spec) or not os.path.exists(os.path.join(persist_path, ANN_FILE)):
+            return load_mmap_vectorstore(persist_path, embeddings)
+        vectordb = load_mmap_vectorstore(persist_path, embeddings, index_file=ANN_FILE)
+        set_search_params(vectordb.index, index_spec, manifest.get("search_params"))
+        return vectordb
     return FAISS.load_local(persist_path, embeddings, allow_dangerous_deserialization=True)
 
 def load_prompt(version="v1_asistente_rrhh"):
+    from langchain_core.prompts import PromptTemplate
+
     prompt_path = os.path.join(PROMPT_DIR, f"{version}.txt")
     if not os.path.exists(prompt_path):
         raise FileNotFoundError(f"Prompt no encontrado: {prompt_path}")
@@ -71,12 +394,66 @@ def load_prompt(version="v1_asistente_rrhh"):
         prompt_text = f.read()
     return PromptTemplate(input_variables=["context", "question"], template=prompt_text)
 
-def build_chain(vectordb, prompt_version="v1_asistente_rrhh"):
+def load_shards(vectordb, persist_path=VECTOR_DIR):
+    # Shards por disciplina de la ingesta; None (sin filtro) si faltan o están desfasados
+    from app.sports import SPORTS_FILE, SportShards
+
+    if not os.path.exists(os.path.join(persist_path, SPORTS_FILE)):
+        return None
+    shards = SportShards.load(persist_path)
+    if len(shards) != vectordb.index.ntotal:
+        print(f"⚠️  {SPORTS_FILE} no corresponde al índice cargado; se busca en todo el corpus")
+        return None
+    return shards
+
+def get_retriever(vectordb, persist_path=VECTOR_DIR, mode=RETRIEVER_MODE, k=RETRIEVER_K):
+    shards = load_shards(vectordb, persist_path)
+    if mode == "hybrid" and os.path.exists(os.path.join(persist_path, BM25_FILE)):
+        lexical = BM25Index.load(persist_path)
+        if len(lexical) == vectordb.index.ntotal:
+            return HybridRetriever(vectordb=vectordb, lexical=lexical, shards=shards, k=k)
+        print(f"⚠️  {BM25_FILE} no corresponde al índice cargado; se usa solo búsqueda densa")
+    # Sin shards también DenseRetriever: reutiliza el embedding de la caché de respuestas
+    return DenseRetriever(vectordb=vectordb, shards=shards, k=k)
+
+def build_chain(vectordb, prompt_version="v1_asistente_rrhh", retriever=None, persist_path=VECTOR_DIR,
+                cache_answers=False, llm=None, condense_question_llm=None, sport=None):
+    # `sport` de las entradas de cada turno (o el de aquí, por defecto) limita
+    # la recuperación a esa disciplina + material general
+    from langchain_core.globals import set_verbose
+    from langchain_openai import ChatOpenAI
+
+    from app.answer_cache import CachedConversationalChain
+    from app.sports import SportConversationalRetrievalChain
+
+    # Logs detallados de LangChain; las latencias por etapa están en las trazas (app/tracing.py)
+    set_verbose(os.getenv("LANGCHAIN_VERBOSE", "1") == "1")
+    install_llm_cassette()
     prompt = load_prompt(prompt_version)
-    retriever = vectordb.as_retriever()
-    return ConversationalRetrievalChain.from_llm(
-        llm = ChatOpenAI(model="gpt-4o", temperature=0),
+    retriever = retriever or get_retriever(vectordb, persist_path)
+    chain = SportConversationalRetrievalChain.from_llm(
+        # Solo el LLM de respuesta emite tokens (StreamHandler); la condensación no se muestra.
+        # Las etiquetas identifican la etapa en las trazas; stream_usage para contar tokens
+        llm = llm or ChatOpenAI(model="gpt-4o", temperature=0, streaming=True, stream_usage=True, tags=["generation"]),
+        condense_question_llm=condense_question_llm or ChatOpenAI(model="gpt-4o", temperature=0, tags=["condense_question"]),
         retriever=retriever,
         combine_docs_chain_kwargs={"prompt": prompt},
-        return_source_documents=False
+        return_source_documents=True,
+        sport=sport,
     )
+    if cache_answers:
+        # Caché semántica (UIs); la evaluación usa la cadena sin caché
+        return CachedConversationalChain(
+            chain,
+            vectordb.embedding_function,
+            prompt_version=prompt_version,
+            index_version=lambda: index_version(persist_path),
+        )
+    return chain
+
+def build_history():
+    # Historial acotado por sesión: ventana + resumen de los turnos antiguos
+    from langchain_openai import ChatOpenAI
+
+    install_llm_cassette()
+    return ChatHistory(summarizer=llm_summarizer(ChatOpenAI(model="gpt-4o", temperature=0)))
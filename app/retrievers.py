@@ -0,0 +1,131 @@
+# app/retrievers.py
+# ──────────────────────────────────────────────────────────────
+# Recuperación híbrida: búsqueda densa (FAISS) + léxica (BM25)
+# fusionadas con Reciprocal Rank Fusion. Con `shards` (app/sports.py)
+# ambas búsquedas se limitan a la disciplina del turno, que llega como
+# metadato `sport` de la ejecución. Si la caché de respuestas ya embebió
+# la pregunta del turno (app/answer_cache.py), se reutiliza ese vector.
+# ──────────────────────────────────────────────────────────────
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from app.tracing import span
+
+
+# (pregunta, vector) ya calculados en este turno; ContextVar: aislado por petición/hilo
+_turn_query_vector: ContextVar[Optional[Tuple[str, List[float]]]] = ContextVar("turn_query_vector", default=None)
+
+
+@contextmanager
+def reuse_query_vector(query: str, vector: List[float]) -> Iterator[None]:
+    """Dentro del bloque, los retrievers no vuelven a embeber `query`."""
+    token = _turn_query_vector.set((query, vector))
+    try:
+        yield
+    finally:
+        _turn_query_vector.reset(token)
+
+
+def query_vector(vectordb, query: str) -> List[float]:
+    memo = _turn_query_vector.get()
+    if memo is not None and memo[0] == query:
+        return memo[1]
+    return vectordb._embed_query(query)
+
+
+def doc_key(doc: Document) -> str:
+    return doc.id or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], rrf_k: int = 60) -> List[str]:
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    # Empates: se conserva el orden de primera aparición (denso primero)
+    return sorted(scores, key=lambda key: -scores[key])
+
+
+def docs_at(vectordb, positions: List[int]) -> List[Document]:
+    docs = []
+    for position in positions:
+        doc_id = vectordb.index_to_docstore_id[position]
+        doc = vectordb.docstore.search(doc_id)
+        if isinstance(doc, Document):
+            doc.id = doc.id or doc_id  # misma clave que BM25 en la fusión
+            docs.append(doc)
+    return docs
+
+
+def dense_search(vectordb, vector: List[float], k: int, shards: Any = None,
+                 sport: Optional[str] = None) -> List[Document]:
+    if shards is None or sport is None:
+        return vectordb.similarity_search_by_vector(vector, k=k)
+    vector = np.asarray(vector, dtype="float32")
+    if getattr(vectordb, "_normalize_L2", False):
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+    return docs_at(vectordb, shards.search(vectordb.index, vector, k, sport))
+
+
+def run_sport(run_manager: CallbackManagerForRetrieverRun) -> Optional[str]:
+    return (getattr(run_manager, "metadata", None) or {}).get("sport")
+
+
+class DenseRetriever(BaseRetriever):
+    """Solo FAISS, limitado al shard de la disciplina del turno."""
+
+    vectordb: Any
+    shards: Any = None
+    k: int = 4
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        sport = run_sport(run_manager)
+        vector = query_vector(self.vectordb, query)
+        with span("vector_search", **{"retrieval.fetch_k": self.k, "retrieval.sport": sport or ""}):
+            return dense_search(self.vectordb, vector, self.k, self.shards, sport)
+
+
+class HybridRetriever(BaseRetriever):
+    vectordb: Any
+    lexical: Any
+    shards: Any = None
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        sport = run_sport(run_manager)
+        attributes = {"retrieval.fetch_k": self.fetch_k, "retrieval.sport": sport or ""}
+        # Embedding y búsqueda por separado para que cada etapa tenga su span
+        vector = query_vector(self.vectordb, query)
+        with span("vector_search", **attributes):
+            dense = dense_search(self.vectordb, vector, self.fetch_k, self.shards, sport)
+        docs = {doc_key(doc): doc for doc in dense}
+        mask = self.shards.mask(sport) if self.shards is not None else None
+        with span("bm25_search", **attributes):
+            lexical_ids = [doc_id for doc_id, _ in self.lexical.search(query, self.fetch_k, mask=mask)]
+
+        fused = reciprocal_rank_fusion([list(docs), lexical_ids], self.rrf_k)
+
+        results = []
+        for key in fused:
+            doc = docs.get(key)
+            if doc is None:
+                doc = self.vectordb.docstore.search(key)
+                if not isinstance(doc, Document):  # BM25 desfasado respecto al docstore
+                    continue
+            results.append(doc)
+            if len(results) == self.k:
+                break
+        return results
@@ -6,7 +6,10 @@
 import os
 import sys
 import json
-from typing import Dict, Any
+import time
+import asyncio
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional
 
 # Rutas internas
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -16,7 +19,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Componentes propios
-from app.rag_pipeline import load_vectorstore_from_disk, build_chain  # noqa: E402
+from app.rag_pipeline import RETRIEVER_K, load_vectorstore_from_disk, build_chain  # noqa: E402
+from app.cassette import install_llm_cassette  # noqa: E402
+from app.judge import CachedGrader, MultiCriteriaJudge, separate_grader  # noqa: E402
+from app.metrics_store import frame_from_results, reasoning_text, store_dir, write_results  # noqa: E402
+from app.tracing import Tracer  # noqa: E402
 
 # LangChain & OpenAI
 from langchain_openai import ChatOpenAI
@@ -25,38 +32,21 @@ from langchain.evaluation.qa import QAEvalChain
 
 # MLflow
 import mlflow
+from mlflow.entities import Metric, Param, RunTag
 
 
 # ──────────────────────────────────────────────────────────────
 # Parámetros de configuración
 # ──────────────────────────────────────────────────────────────
-PROMPT_VERSION = os.getenv("PROMPT_VERSION", "v1_asistente_deporte")
-CHUNK_SIZE     = int(os.getenv("CHUNK_SIZE", 512))
-CHUNK_OVERLAP  = int(os.getenv("CHUNK_OVERLAP", 50))
-DATASET_PATH   = os.getenv("DATASET_PATH", "tests/eval_dataset.json")
-
-
-# ──────────────────────────────────────────────────────────────
-# Dataset de evaluación
-# ──────────────────────────────────────────────────────────────
-with open(DATASET_PATH, encoding="utf-8") as f:
-    dataset = json.load(f)
-
-
-# ──────────────────────────────────────────────────────────────
-# Construcción del pipeline RAG
-# ──────────────────────────────────────────────────────────────
-vectordb = load_vectorstore_from_disk()
-chain    = build_chain(vectordb, prompt_version=PROMPT_VERSION)
-
-
-# ──────────────────────────────────────────────────────────────
-# Inicialización del LLM  (mantiene tu estilo original)
-# ──────────────────────────────────────────────────────────────
-llm = ChatOpenAI(model_name="gpt-4o", temperature=0)
-
-# Evaluador QA (correcto/incorrecto, sigue binario)
-qa_eval = QAEvalChain.from_llm(llm)
+PROMPT_VERSION   = os.getenv("PROMPT_VERSION", "v1_asistente_deporte")
+CHUNK_SIZE       = int(os.getenv("CHUNK_SIZE", 512))
+CHUNK_OVERLAP    = int(os.getenv("CHUNK_OVERLAP", 50))
+DATASET_PATH     = os.getenv("DATASET_PATH", "tests/eval_dataset.json")
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", 8))   # preguntas en paralelo (1 = secuencial)
+JUDGE_MODE       = os.getenv("JUDGE_MODE", "multi")        # "multi" (1 llamada) o "separate" (6 llamadas)
+JUDGE_CACHE      = os.getenv("JUDGE_CACHE", "1") == "1"    # reutiliza juicios de ejecuciones anteriores
+EVAL_LOG_MODE    = os.getenv("EVAL_LOG_MODE", "batch")     # "batch" (1 run padre) o "per_question"
+EVAL_NESTED_RUNS = os.getenv("EVAL_NESTED_RUNS", "1") == "1"  # en modo batch: un run hijo por pregunta
 
 
 # Criterios y descripciones
@@ -70,84 +60,266 @@ criteria: Dict[str, str] = {
 
 
 # ──────────────────────────────────────────────────────────────
-# Evaluadores continuos 1‑10  (sin normalize_by)
+# Evaluadores: QA binario + continuos 1‑10  (sin normalize_by)
 # ──────────────────────────────────────────────────────────────
-scorers = {
-    name: load_evaluator(
-        "labeled_score_string",          # escala de 1 a 10
-        criteria={name: desc},
-        llm=llm
-    )
-    for name, desc in criteria.items()
-}
+def build_evaluators(llm):
+    qa_eval = QAEvalChain.from_llm(llm)
+    scorers = {
+        name: load_evaluator(
+            "labeled_score_string",          # escala de 1 a 10
+            criteria={name: desc},
+            llm=llm
+        )
+        for name, desc in criteria.items()
+    }
+    return qa_eval, scorers
 
 
-# ──────────────────────────────────────────────────────────────
-# Utilidad de conversión a float
-# ──────────────────────────────────────────────────────────────
-def to_float(val: Any) -> float:
-    try:
-        return float(val)
-    except (TypeError, ValueError):
-        return 0.0
+def build_judge_llm():
+    return ChatOpenAI(model_name="gpt-4o", temperature=0)
 
 
-# ──────────────────────────────────────────────────────────────
-# MLflow
-# ──────────────────────────────────────────────────────────────
-mlflow.set_experiment(f"eval_{PROMPT_VERSION}")
-print(f"📊 Experimento MLflow: eval_{PROMPT_VERSION}")
+def build_grader(llm, mode: str = JUDGE_MODE, use_cache: bool = JUDGE_CACHE):
+    # Los evaluadores individuales quedan como respaldo del juez multicriterio
+    qa_eval, scorers = build_evaluators(llm)
+    per_criterion = separate_grader(qa_eval, scorers)
+    grader = per_criterion if mode == "separate" else MultiCriteriaJudge(llm, criteria, fallback=per_criterion)
+    if use_cache:
+        judge_id = f"{getattr(llm, 'model_name', type(llm).__name__)}:{mode}"
+        grader = CachedGrader(grader, criteria, judge_id)
+    return grader
 
 
 # ──────────────────────────────────────────────────────────────
-# Bucle de evaluación
+# Evaluación de una pregunta (todas las llamadas al juez en paralelo)
 # ──────────────────────────────────────────────────────────────
-for idx, pair in enumerate(dataset, start=1):
+async def aevaluate_pair(idx: int, pair: Dict[str, str], chain, grader,
+                         semaphore: asyncio.Semaphore, tracer: Optional[Tracer] = None) -> Dict[str, Any]:
     question        = pair["question"]
     expected_answer = pair.get("answer", "")
 
-    with mlflow.start_run(run_name=f"eval_q{idx}"):
-        # 1) Respuesta generada
-        result = chain.invoke({"question": question, "chat_history": []})
-        answer = result["answer"]
+    async with semaphore:
+        start = time.perf_counter()
+
+        # 1) Respuesta generada (una traza por pregunta: condensación, recuperación, generación)
+        with tracer.turn(eval_question=idx) if tracer else nullcontext() as handler:
+            result = await chain.ainvoke({"question": question, "chat_history": []},
+                                         config={"callbacks": [handler]} if handler else None)
+        answer   = result["answer"]
+        answer_s = time.perf_counter() - start
+
+        # 2) QA binario + 3) criterios continuos (0‑1)
+        graded = await grader(question, answer, expected_answer)
+
+    return {
+        "idx":       idx,
+        "question":  question,
+        "answer":    answer,
+        **graded,
+        "answer_s":  answer_s,
+        "judge_s":   time.perf_counter() - start - answer_s,
+        "latency_s": time.perf_counter() - start,
+    }
+
+
+async def evaluate_dataset(dataset: List[Dict[str, str]], chain, grader,
+                           concurrency: int = EVAL_CONCURRENCY,
+                           tracer: Optional[Tracer] = None) -> List[Dict[str, Any]]:
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks = [
+        aevaluate_pair(idx, pair, chain, grader, semaphore, tracer)
+        for idx, pair in enumerate(dataset, start=1)
+    ]
+    # gather devuelve los resultados en el orden del dataset
+    return await asyncio.gather(*tasks)
 
-        # 2) QA binario
-        qa_graded = qa_eval.evaluate_strings(
-            input=question,
-            prediction=answer,
-            reference=expected_answer,
+
+# ──────────────────────────────────────────────────────────────
+# Registro en MLflow y consola (en orden, tras terminar la evaluación)
+# ──────────────────────────────────────────────────────────────
+def print_result(res: Dict[str, Any], total: int) -> None:
+    print(f"\n📝 Pregunta {res['idx']}/{total} — QA: {res['qa_verdict']} (score={res['qa_score']})")
+    for crit in criteria:
+        print(f"· {crit:<12}: {res['crit_values'][crit]}  (score={res['crit_scores'][crit]:.2f})")
+
+
+def run_config() -> Dict[str, Any]:
+    # Configuración evaluada (sweep.py pasa la suya propia)
+    return {
+        "prompt_version": PROMPT_VERSION,
+        "chunk_size":     CHUNK_SIZE,
+        "chunk_overlap":  CHUNK_OVERLAP,
+        "k":              RETRIEVER_K,
+        "judge_mode":     JUDGE_MODE,
+    }
+
+
+def question_params(res: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {"question": res["question"], **(config or run_config())}
+
+
+def question_metrics(res: Dict[str, Any]) -> Dict[str, float]:
+    metrics = {f"{crit_name}_score": score for crit_name, score in res["crit_scores"].items()}
+    metrics.update({
+        "qa_score":        res["qa_score"],
+        "judge_latency_s": res["judge_s"],
+        "judge_tokens":    res["judge_tokens"],
+    })
+    return metrics
+
+
+def log_result(res: Dict[str, Any], total: int) -> None:
+    # Modo "per_question": un run por pregunta con llamadas sueltas (formato original)
+    with mlflow.start_run(run_name=f"eval_q{res['idx']}") as run:
+        res["run_id"] = run.info.run_id
+        for key, value in question_metrics(res).items():
+            mlflow.log_metric(key, value)
+        for key, value in question_params(res).items():
+            mlflow.log_param(key, value)
+    print_result(res, total)
+
+
+def aggregate_metrics(results: List[Dict[str, Any]]) -> Dict[str, float]:
+    n = len(results)
+    latencies = sorted(r["latency_s"] for r in results)
+    agg = {f"mean_{crit}_score": sum(r["crit_scores"][crit] for r in results) / n for crit in criteria}
+    agg.update({
+        "qa_accuracy":       sum(r["qa_score"] for r in results) / n,
+        "mean_latency_s":    sum(latencies) / n,
+        "p95_latency_s":     latencies[min(n - 1, int(0.95 * n))],
+        "judge_tokens":      sum(r["judge_tokens"] for r in results),
+        "n_questions":       n,
+    })
+    return agg
+
+
+def stage_metrics(summary: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    """p50/p95 por etapa de `Tracer.summary()` como métricas planas de MLflow."""
+    metrics = {}
+    for stage, stats in summary.items():
+        metrics[f"trace_{stage}_p50_s"] = stats["p50_s"]
+        metrics[f"trace_{stage}_p95_s"] = stats["p95_s"]
+    return metrics
+
+
+def print_stage_summary(summary: Dict[str, Dict[str, float]]) -> None:
+    print("\n🔎 Latencia por etapa (p50 / p95):")
+    for stage, stats in summary.items():
+        print(f"· {stage:<17}: {stats['p50_s']:.3f}s / {stats['p95_s']:.3f}s  (n={stats['count']})")
+
+
+def _as_entities(metrics: Dict[str, float], params: Dict[str, Any], timestamp: int):
+    return (
+        [Metric(key, float(value), timestamp, 0) for key, value in metrics.items()],
+        # MLflow limita los valores de parámetros a 6000 caracteres
+        [Param(key, str(value)[:6000]) for key, value in params.items()],
+    )
+
+
+def log_results_batched(results: List[Dict[str, Any]], elapsed: float,
+                        config: Optional[Dict[str, Any]] = None,
+                        tags: Optional[Dict[str, str]] = None,
+                        extra_metrics: Optional[Dict[str, float]] = None) -> Optional[str]:
+    """Un run padre con agregados (log_batch) + tabla por pregunta + runs hijos opcionales."""
+    if not results:
+        return None
+    config    = config or run_config()
+    tags      = tags or {}
+    client    = mlflow.tracking.MlflowClient()
+    timestamp = int(time.time() * 1000)
+
+    with mlflow.start_run(run_name=f"eval_{config['prompt_version']}_batch") as parent:
+        metrics, params = _as_entities({**aggregate_metrics(results), "eval_wall_s": elapsed,
+                                        **(extra_metrics or {})}, config, timestamp)
+        client.log_batch(parent.info.run_id, metrics=metrics, params=params,
+                         tags=[RunTag("eval_parent", "true")] + [RunTag(k, v) for k, v in tags.items()])
+
+        # Detalle por pregunta como artefacto tabular (una sola escritura)
+        per_question = [question_metrics(r) for r in results]
+        mlflow.log_table(
+            data={
+                "idx":        [r["idx"] for r in results],
+                "question":   [r["question"] for r in results],
+                "answer":     [r["answer"] for r in results],
+                "qa_verdict": [r["qa_verdict"] for r in results],
+                **{key: [m[key] for m in per_question] for key in per_question[0]},
+                "latency_s":  [r["latency_s"] for r in results],
+            },
+            artifact_file="eval_results.json",
         )
-        qa_score   = to_float(qa_graded.get("score", 0))
-        qa_verdict = qa_graded.get("value", "UNKNOWN")
-
-        # 3) Criterios continuos (normalizamos dividiendo por 10 → 0‑1)
-        crit_scores: Dict[str, float] = {}
-        crit_values: Dict[str, str]   = {}
-
-        for crit_name, scorer in scorers.items():
-            graded = scorer.evaluate_strings(
-                input=question,
-                prediction=answer,
-                reference=expected_answer,
-            )
-            raw_score = to_float(graded.get("score", 0))  # 1‑10
-            score     = raw_score / 10.0                  # 0‑1
-            crit_scores[crit_name] = score
-            crit_values[crit_name] = str(graded.get("value", ""))
-
-            mlflow.log_metric(f"{crit_name}_score", score)
-
-        # 4) Parametría QA
-        mlflow.log_param("question",       question)
-        mlflow.log_param("prompt_version", PROMPT_VERSION)
-        mlflow.log_param("chunk_size",     CHUNK_SIZE)
-        mlflow.log_param("chunk_overlap",  CHUNK_OVERLAP)
-        mlflow.log_metric("qa_score", qa_score)
-
-        # 5) Consola
-        print(f"\n📝 Pregunta {idx}/{len(dataset)} — QA: {qa_verdict} (score={qa_score})")
-        for crit in criteria:
-            print(f"· {crit:<12}: {crit_values[crit]}  (score={crit_scores[crit]:.2f})")
-
-
-print("\n✅ Evaluación completada; métricas guardadas en MLflow")
+
+        if EVAL_NESTED_RUNS:
+            experiment_id = parent.info.experiment_id
+            for res in results:
+                reasoning = reasoning_text(res.get("crit_values"))
+                child = client.create_run(
+                    experiment_id,
+                    run_name=f"eval_q{res['idx']}",
+                    # eval_reasoning: columna "razonamiento" del dashboard (MLflow limita los tags a 5000 caracteres)
+                    tags={"mlflow.parentRunId": parent.info.run_id, **tags,
+                          **({"eval_reasoning": reasoning[:5000]} if reasoning else {})},
+                )
+                metrics, params = _as_entities(question_metrics(res), question_params(res, config), timestamp)
+                client.log_batch(child.info.run_id, metrics=metrics, params=params)
+                client.set_terminated(child.info.run_id)
+                res["run_id"] = child.info.run_id
+
+    return parent.info.run_id
+
+
+def main():
+    # Dataset de evaluación
+    with open(DATASET_PATH, encoding="utf-8") as f:
+        dataset = json.load(f)
+
+    # Construcción del pipeline RAG
+    vectordb = load_vectorstore_from_disk()
+    chain    = build_chain(vectordb, prompt_version=PROMPT_VERSION)
+
+    # Inicialización del LLM juez  (mantiene tu estilo original)
+    cassette = install_llm_cassette()
+    llm = build_judge_llm()
+    grader = build_grader(llm)
+
+    experiment = f"eval_{PROMPT_VERSION}"
+    mlflow.set_experiment(experiment)
+    print(f"📊 Experimento MLflow: {experiment}")
+
+    tracer  = Tracer()
+    start   = time.perf_counter()
+    results = asyncio.run(evaluate_dataset(dataset, chain, grader, tracer=tracer))
+    elapsed = time.perf_counter() - start
+    trace_summary = tracer.summary()
+
+    run_id = None
+    if EVAL_LOG_MODE == "per_question":
+        for res in results:
+            log_result(res, len(dataset))
+    else:
+        for res in results:
+            print_result(res, len(dataset))
+        run_id = log_results_batched(results, elapsed, extra_metrics=stage_metrics(trace_summary))
+        print(f"\n🗂️  Run padre MLflow: {run_id}")
+    if trace_summary:
+        print_stage_summary(trace_summary)
+        print(f"🧵 Trazas por etapa en {tracer.path}")
+
+    # Tabla columnar + agregados para los dashboards (calculados una sola vez aquí)
+    if results:
+        write_results(experiment, frame_from_results(results, run_config(), parent_run_id=run_id))
+        print(f"📦 Resultados exportados a {store_dir(experiment)}")
+
+    print(f"\n⏱️  {len(dataset)} preguntas en {elapsed:.1f}s "
+          f"(concurrencia={EVAL_CONCURRENCY}, juez={JUDGE_MODE}, cassettes={cassette})")
+    if isinstance(grader, CachedGrader):
+        cache_stats = grader.stats()
+        print(f"🗄️  Caché del juez: {cache_stats['hits']} aciertos · {cache_stats['misses']} fallos "
+              f"({cache_stats['hit_rate']:.0%})")
+        grader = grader.grader
+    if isinstance(grader, MultiCriteriaJudge) and grader.n_fallbacks:
+        print(f"↩️  {grader.n_fallbacks}/{grader.n_calls} respuestas del juez requirieron evaluadores individuales")
+    print("\n✅ Evaluación completada; métricas guardadas en MLflow")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# app/run_store.py
+# ──────────────────────────────────────────────────────────────
+# Carga de runs de MLflow para los dashboards con una instantánea
+# Parquet local por experimento. Cada carga solo pide al servidor los
+# runs iniciados después del último `start_time` conocido (más los que
+# seguían en curso), así abrir un experimento con decenas de miles de
+# runs no vuelve a descargarlo todo.
+# ──────────────────────────────────────────────────────────────
+import os
+from typing import Any, List, Optional
+
+import mlflow
+import pandas as pd
+
+from app.cache import CACHE_DIR, text_hash
+
+RUNS_CACHE_DIR   = os.getenv("RUNS_CACHE_DIR", os.path.join(CACHE_DIR, "runs"))
+RUNS_CACHE_TTL   = int(os.getenv("RUNS_CACHE_TTL", 60))         # segundos (st.cache_data)
+RUNS_PAGE_SIZE   = int(os.getenv("RUNS_PAGE_SIZE", 5_000))
+
+UNFINISHED = ("RUNNING", "SCHEDULED")
+
+
+def snapshot_path(experiment_id: str, tracking_uri: Optional[str] = None,
+                  directory: str = RUNS_CACHE_DIR) -> str:
+    # Un directorio por servidor de tracking: los ids de experimento se repiten entre servidores
+    server = text_hash(tracking_uri or mlflow.get_tracking_uri())[:12]
+    return os.path.join(directory, server, f"{experiment_id}.parquet")
+
+
+def runs_to_frame(runs: List[Any]) -> pd.DataFrame:
+    """Aplana runs de MLflow en columnas `params.*`, `metrics.*` y `tags.*`."""
+    rows = []
+    for run in runs:
+        row = {
+            "run_id":     run.info.run_id,
+            "run_name":   run.info.run_name,
+            "start_time": run.info.start_time,
+            "status":     run.info.status,
+        }
+        row.update({f"params.{k}": v for k, v in run.data.params.items()})
+        row.update({f"metrics.{k}": v for k, v in run.data.metrics.items()})
+        # Las etiquetas internas de MLflow (usuario, fuente…) no interesan a los dashboards
+        row.update({f"tags.{k}": v for k, v in run.data.tags.items()
+                    if not k.startswith("mlflow.") or k == "mlflow.parentRunId"})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def fetch_runs(client, experiment_id: str, since: Optional[int] = None) -> pd.DataFrame:
+    """Todos los runs con `start_time >= since`, paginando."""
+    filter_string = f"attributes.start_time >= {int(since)}" if since is not None else ""
+    runs, token = [], None
+    while True:
+        page = client.search_runs(
+            experiment_ids=[experiment_id],
+            filter_string=filter_string,
+            order_by=["start_time ASC"],
+            max_results=RUNS_PAGE_SIZE,
+            page_token=token,
+        )
+        runs.extend(page)
+        token = page.token
+        if not token:
+            break
+    return runs_to_frame(runs)
+
+
+def load_runs(experiment_id: str, client=None, directory: str = RUNS_CACHE_DIR) -> pd.DataFrame:
+    """Runs del experimento, más recientes primero, actualizando la instantánea Parquet."""
+    client = client or mlflow.tracking.MlflowClient()
+    path = snapshot_path(experiment_id, client.tracking_uri, directory)
+
+    cached = pd.read_parquet(path) if os.path.exists(path) else pd.DataFrame()
+    since = None
+    if not cached.empty:
+        # Los runs que seguían en curso pueden tener métricas nuevas: se vuelven a pedir
+        pending = cached.loc[cached["status"].isin(UNFINISHED), "start_time"]
+        since = int(pending.min()) if not pending.empty else int(cached["start_time"].max())
+
+    fresh = fetch_runs(client, experiment_id, since)
+    if fresh.empty:
+        frame = cached
+    else:
+        frame = pd.concat([cached, fresh], ignore_index=True)
+        frame = frame.drop_duplicates("run_id", keep="last")
+        frame = frame.sort_values("start_time", ascending=False, ignore_index=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    return frame
+
+
+def column(frame: pd.DataFrame, name: str, default: Any = None) -> pd.Series:
+    """Columna del DataFrame de runs, o una constante si ningún run la registró."""
+    if name in frame:
+        return frame[name]
+    return pd.Series(default, index=frame.index, dtype=object if default is None else None)
+
+
+def question_runs(frame: pd.DataFrame) -> pd.DataFrame:
+    """Descarta los runs padre de run_eval (solo contienen agregados)."""
+    if frame.empty:
+        return frame
+    return frame[column(frame, "tags.eval_parent") != "true"]
@@ -0,0 +1,226 @@
+# app/sports.py
+# ──────────────────────────────────────────────────────────────
+# Recuperación por disciplina. En la ingesta cada chunk se etiqueta con
+# su disciplina (`sport`) y su archivo de origen (`source_file`); al
+# persistir el índice se guarda `sports.npz` con las posiciones FAISS de
+# cada disciplina (un "shard" lógico por deporte). En consulta, la
+# disciplina elegida en la UI/API limita la búsqueda densa (selector de
+# FAISS: solo se calculan distancias de las posiciones del shard) y la
+# BM25 a su shard + el material general. La cadena pasa el `sport` de
+# sus entradas al retriever como metadato de la ejecución.
+#
+#   Ciclismo  → ciclismo + general
+#   Triatlón  → triatlón + ciclismo + running + natación + general
+#   Otro/None → todo el corpus
+#
+# Los PDF incluidos en data/pdfs son teoría general del entrenamiento:
+# data/pdfs/sports.json los fija todos como "general" (a nivel de archivo,
+# sin los falsos positivos sueltos del detector por chunk), así que con
+# ese corpus elegir disciplina no cambia resultados ni coste de búsqueda.
+# El filtro actúa al añadir manuales de una disciplina al mapa.
+# ──────────────────────────────────────────────────────────────
+import os
+import json
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import faiss
+from langchain.chains import ConversationalRetrievalChain
+
+from app.bm25 import tokenize
+
+SPORTS_FILE     = "sports.npz"
+SPORT_MAP_FILE  = os.getenv("SPORT_MAP_FILE", "data/pdfs/sports.json")  # {"archivo.pdf": "ciclismo"} (opcional)
+SPORT_MIN_HITS  = int(os.getenv("SPORT_MIN_HITS", 2))                   # menciones para etiquetar un chunk
+SPORT_OVERFETCH = int(os.getenv("SPORT_OVERFETCH", 10))                 # índices sin selector: k×N y filtrado
+
+GENERAL = "general"
+
+# Palabras clave sin tildes (mismo tokenizado que BM25)
+SPORT_KEYWORDS = {
+    "triatlon": {"triatlon", "triatlones", "triatleta", "triatletas", "duatlon", "ironman"},
+    "ciclismo": {"ciclismo", "ciclista", "ciclistas", "bicicleta", "bicicletas", "bici", "pedaleo",
+                 "pedalada", "pedaladas", "rodillo", "vatios", "watts", "ftp"},
+    "running":  {"running", "correr", "corredor", "corredora", "corredores", "trote", "trotar",
+                 "zancada", "zancadas", "maraton", "maratones", "maratonista", "fondista", "fondistas"},
+    "natacion": {"natacion", "nadar", "nadador", "nadadora", "nadadores", "nado", "piscina",
+                 "brazada", "brazadas", "crol"},
+}
+SPORTS = tuple(SPORT_KEYWORDS)
+
+# Disciplina elegida → etiquetas que se buscan (el material general siempre)
+SPORT_SCOPES = {
+    "triatlon": ("triatlon", "ciclismo", "running", "natacion", GENERAL),
+    "ciclismo": ("ciclismo", GENERAL),
+    "running":  ("running", GENERAL),
+    "natacion": ("natacion", GENERAL),
+}
+
+
+def _plain(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.strip().lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def normalize_sport(sport: Optional[str]) -> Optional[str]:
+    """Etiqueta canónica de la UI/API ("Triatlón" → "triatlon"); None si no filtra ("Otro")."""
+    if not sport:
+        return None
+    sport = _plain(sport)
+    return sport if sport in SPORT_SCOPES else None
+
+
+def detect_sport(text: str, min_hits: int = SPORT_MIN_HITS) -> str:
+    """Disciplina con más menciones en `text`; "general" si no hay una clara."""
+    counts = Counter()
+    for token in tokenize(text):
+        for sport, keywords in SPORT_KEYWORDS.items():
+            if token in keywords:
+                counts[sport] += 1
+    ranked = counts.most_common(2)
+    if not ranked or ranked[0][1] < min_hits:
+        return GENERAL
+    if len(ranked) == 2 and ranked[0][1] == ranked[1][1]:
+        return GENERAL
+    return ranked[0][0]
+
+
+def load_sport_map(path: str = SPORT_MAP_FILE) -> Dict[str, str]:
+    # Etiquetado manual por archivo (p. ej. un manual de ciclismo completo)
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return {file: normalize_sport(sport) or GENERAL for file, sport in json.load(f).items()}
+
+
+def tag_chunk(chunk, sport_map: Optional[Dict[str, str]] = None):
+    """Añade `source_file` y `sport` a los metadatos del chunk (en sitio)."""
+    source_file = os.path.basename(str(chunk.metadata.get("source", "")))
+    chunk.metadata["source_file"] = source_file
+    chunk.metadata["sport"] = (sport_map or {}).get(source_file) or detect_sport(chunk.page_content)
+    return chunk
+
+
+def tag_chunks(chunks: Iterable, sport_map: Optional[Dict[str, str]] = None) -> List:
+    return [tag_chunk(chunk, sport_map) for chunk in chunks]
+
+
+# ──────────────────────────────────────────────────────────────
+# Shards por disciplina (posiciones del índice FAISS)
+# ──────────────────────────────────────────────────────────────
+class SportShards:
+    """Etiqueta de disciplina por posición del índice y selectores FAISS por alcance."""
+
+    def __init__(self, labels: np.ndarray, sports: np.ndarray):
+        self.labels = labels        # int8 por posición → índice en `sports`
+        self.sports = sports        # nombres de las etiquetas
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @classmethod
+    def build(cls, tags: List[str]) -> "SportShards":
+        sports = np.array((GENERAL,) + SPORTS, dtype=str)
+        lookup = {sport: i for i, sport in enumerate(sports.tolist())}
+        labels = np.array([lookup.get(tag, 0) for tag in tags], dtype="int8")
+        return cls(labels, sports)
+
+    def counts(self) -> Dict[str, int]:
+        totals = np.bincount(self.labels, minlength=len(self.sports))
+        return {sport: int(total) for sport, total in zip(self.sports.tolist(), totals)}
+
+    def _scope(self, sport: Optional[str]) -> Optional[Dict[str, Any]]:
+        sport = normalize_sport(sport)
+        if sport is None:
+            return None
+        with self._lock:
+            if sport not in self._cache:
+                wanted = [i for i, name in enumerate(self.sports.tolist()) if name in SPORT_SCOPES[sport]]
+                mask = np.isin(self.labels, wanted)
+                bits = np.packbits(mask, bitorder="little")
+                # El selector apunta a `bits`: se guardan juntos mientras viva el shard
+                self._cache[sport] = {"mask": mask, "bits": bits, "selector": faiss.IDSelectorBitmap(bits)}
+            return self._cache[sport]
+
+    def mask(self, sport: Optional[str]) -> Optional[np.ndarray]:
+        """Máscara booleana por posición (None = sin filtro)."""
+        scope = self._scope(sport)
+        return None if scope is None else scope["mask"]
+
+    def search(self, index, vector: np.ndarray, k: int, sport: Optional[str]) -> List[int]:
+        """Posiciones de los k vecinos dentro del alcance de `sport`."""
+        vector = np.asarray(vector, dtype="float32").reshape(1, -1)
+        scope = self._scope(sport)
+        if scope is None:
+            _, positions = index.search(vector, k)
+            return [int(p) for p in positions[0] if p >= 0]
+
+        params = search_parameters(index, scope["selector"])
+        if params is not None:
+            _, positions = index.search(vector, k, params=params)
+            return [int(p) for p in positions[0] if p >= 0]
+
+        # Índices compuestos (p. ej. OPQ) sin selector: búsqueda ampliada y filtrado
+        _, positions = index.search(vector, min(index.ntotal, k * SPORT_OVERFETCH))
+        mask = scope["mask"]
+        return [int(p) for p in positions[0] if p >= 0 and mask[p]][:k]
+
+    def save(self, persist_path: str) -> str:
+        path = os.path.join(persist_path, SPORTS_FILE)
+        np.savez_compressed(path, labels=self.labels, sports=self.sports)
+        return path
+
+    @classmethod
+    def load(cls, persist_path: str) -> "SportShards":
+        with np.load(os.path.join(persist_path, SPORTS_FILE), allow_pickle=False) as data:
+            return cls(data["labels"], data["sports"])
+
+
+def search_parameters(index, selector) -> Optional[Any]:
+    # Los parámetros de búsqueda sustituyen a los del índice: se conservan nprobe / efSearch
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    if isinstance(index, faiss.IndexFlat):
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def build_from_vectorstore(vectordb, sport_map: Optional[Dict[str, str]] = None) -> SportShards:
+    # Índices anteriores a la ingesta etiquetada: se detecta la disciplina del texto
+    from app.docstore import iter_documents
+
+    sport_map = load_sport_map() if sport_map is None else sport_map
+    tags = []
+    for _, doc in iter_documents(vectordb):  # por páginas con el docstore SQLite
+        tag = doc.metadata.get("sport")
+        if tag is None:
+            source_file = os.path.basename(str(doc.metadata.get("source", "")))
+            tag = sport_map.get(source_file) or detect_sport(doc.page_content)
+        tags.append(tag)
+    return SportShards.build(tags)
+
+
+# ──────────────────────────────────────────────────────────────
+# Cadena: `sport` de las entradas → metadato del retriever
+# ──────────────────────────────────────────────────────────────
+class SportConversationalRetrievalChain(ConversationalRetrievalChain):
+    sport: Optional[str] = None  # disciplina si las entradas no traen `sport` (evaluación)
+
+    def _retriever_config(self, inputs: Dict[str, Any], run_manager) -> Dict[str, Any]:
+        return {"callbacks": run_manager.get_child(), "metadata": {"sport": inputs.get("sport") or self.sport}}
+
+    def _get_docs(self, question: str, inputs: Dict[str, Any], *, run_manager) -> List:
+        docs = self.retriever.invoke(question, config=self._retriever_config(inputs, run_manager))
+        return self._reduce_tokens_below_limit(docs)
+
+    async def _aget_docs(self, question: str, inputs: Dict[str, Any], *, run_manager) -> List:
+        docs = await self.retriever.ainvoke(question, config=self._retriever_config(inputs, run_manager))
+        return self._reduce_tokens_below_limit(docs)
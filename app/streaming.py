@@ -0,0 +1,66 @@
+# app/streaming.py
+# ──────────────────────────────────────────────────────────────
+# Streaming de respuestas hacia las UIs mediante callbacks de LangChain.
+# La cadena de `build_chain` usa un LLM de respuesta con streaming y un
+# LLM de condensación sin él, así que aquí solo llegan los tokens de la
+# respuesta final. Las fuentes se notifican en cuanto termina la
+# recuperación, antes de que empiece la generación.
+# ──────────────────────────────────────────────────────────────
+import os
+import time
+from typing import Any, Callable, List, Optional, Sequence
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+
+
+class StreamHandler(BaseCallbackHandler):
+    """Acumula los tokens de un turno y mide el tiempo hasta el primer token (TTFT)."""
+
+    def __init__(self, on_token: Optional[Callable[[str, str], None]] = None,
+                 on_sources: Optional[Callable[[List[Document]], None]] = None,
+                 clock: Callable[[], float] = time.perf_counter):
+        self.on_token = on_token
+        self.on_sources = on_sources
+        self.clock = clock
+        self.start = clock()
+        self.text = ""
+        self.sources: Optional[List[Document]] = None
+        self.first_token_at: Optional[float] = None
+        self.retrieval_at: Optional[float] = None
+
+    def on_retriever_end(self, documents: Sequence[Document], **kwargs: Any) -> None:
+        self.retrieval_at = self.clock() - self.start
+        self.sources = list(documents)
+        if self.on_sources is not None:
+            self.on_sources(self.sources)
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = self.clock() - self.start
+        self.text += token
+        if self.on_token is not None:
+            # Se pasa también el texto acumulado: la UI lo repinta entero
+            self.on_token(token, self.text)
+
+    def timings(self) -> dict:
+        total = self.clock() - self.start
+        return {
+            "retrieval_s": self.retrieval_at,
+            # Respuesta desde caché (sin tokens): el primer "token" es la respuesta completa
+            "ttft_s": self.first_token_at if self.first_token_at is not None else total,
+            "total_s": total,
+        }
+
+
+def format_sources(docs: Sequence[Document]) -> str:
+    """Lista markdown de fuentes (archivo y página), sin repetir."""
+    seen, lines = set(), []
+    for doc in docs:
+        source = os.path.basename(str(doc.metadata.get("source", "desconocido")))
+        page = doc.metadata.get("page")
+        label = f"{source}, p. {page + 1}" if isinstance(page, int) else source
+        if label not in seen:
+            seen.add(label)
+            lines.append(f"- {label}")
+    return "\n".join(lines)
@@ -0,0 +1,132 @@
+# app/streaming_ingest.py
+# ──────────────────────────────────────────────────────────────
+# Ingesta en streaming PDF → chunks → embeddings → FAISS.
+# Las páginas se leen de forma perezosa, se trocean al vuelo y se
+# embeben/indexan por lotes con `add_embeddings`, de modo que la
+# memoria pico depende del tamaño de lote y no del corpus: con
+# `docstore_path` los textos van a un docstore SQLite en disco
+# (app/docstore.py) en lugar de quedarse en un InMemoryDocstore.
+# ──────────────────────────────────────────────────────────────
+import os
+import time
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from app.docstore import SQLiteDocstore
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 256))
+
+
+class IngestProgress:
+    """Contadores por etapa; imprime una línea de progreso por lote."""
+
+    def __init__(self, verbose: bool = True):
+        self.verbose = verbose
+        self.files = 0
+        self.pages = 0
+        self.chunks = 0
+        self.embedded = 0
+        self.indexed = 0
+        self.parse_report: List[Dict] = []
+        self.start = time.perf_counter()
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "files": self.files,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "embedded": self.embedded,
+            "indexed": self.indexed,
+        }
+
+    def log(self) -> None:
+        if self.verbose:
+            elapsed = time.perf_counter() - self.start
+            print(
+                f"⏳ {elapsed:7.1f}s · archivos {self.files} · páginas {self.pages} · "
+                f"chunks {self.chunks} · embebidos {self.embedded} · indexados {self.indexed}"
+            )
+
+
+def iter_pages(paths: Iterable[str], progress: IngestProgress) -> Iterator[Document]:
+    from langchain_community.document_loaders import PyPDFLoader  # pypdf: solo en la ingesta
+
+    for file_path in paths:
+        start, pages, status, error = time.perf_counter(), 0, "ok", None
+        try:
+            for page in PyPDFLoader(file_path).lazy_load():
+                pages += 1
+                progress.pages += 1
+                yield page
+        except Exception as exc:  # PDF corrupto: se omite el resto del archivo
+            status, error = "error", f"{type(exc).__name__}: {exc}"
+            print(f"⚠️  {os.path.basename(file_path)} interrumpido ({error})")
+        progress.files += 1
+        progress.parse_report.append({
+            "file": os.path.basename(file_path),
+            "pages": pages,
+            "seconds": round(time.perf_counter() - start, 4),
+            "status": status,
+            "error": error,
+        })
+
+
+def iter_chunks(pages: Iterable[Document], splitter, hashes: Dict[str, str], entries: Dict[str, Dict],
+                id_for, progress: IngestProgress) -> Iterator[Tuple[str, Document]]:
+    """Trocea página a página y asigna IDs estables por archivo (rellena `entries`)."""
+    for page in pages:
+        file = os.path.basename(page.metadata["source"])
+        entry = entries.setdefault(file, {"sha256": hashes[file], "chunk_ids": []})
+        for chunk in splitter.split_documents([page]):
+            chunk_id = id_for(file, hashes[file], len(entry["chunk_ids"]))
+            entry["chunk_ids"].append(chunk_id)
+            progress.chunks += 1
+            yield chunk_id, chunk
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def new_vectorstore(embeddings, dim: int, docstore_path: Optional[str] = None) -> FAISS:
+    """Índice plano vacío; con `docstore_path`, los chunks se escriben en SQLite y no en RAM."""
+    if docstore_path is None:
+        return FAISS(embedding_function=embeddings, index=faiss.IndexFlatL2(dim),
+                     docstore=InMemoryDocstore(), index_to_docstore_id={})
+    if os.path.exists(docstore_path):
+        os.remove(docstore_path)  # restos de una construcción interrumpida
+    return FAISS(embedding_function=embeddings, index=faiss.IndexFlatL2(dim),
+                 docstore=SQLiteDocstore(docstore_path, writable=True), index_to_docstore_id={})
+
+
+def index_stream(chunks: Iterable[Tuple[str, Document]], embeddings, batch_size: int = INGEST_BATCH_SIZE,
+                 vectordb: Optional[FAISS] = None, progress: Optional[IngestProgress] = None,
+                 docstore_path: Optional[str] = None) -> FAISS:
+    """Embebe e indexa `chunks` por lotes; crea el índice con el primer lote si no existe.
+
+    Lanza ValueError si no hay índice previo y `chunks` no produce ningún chunk.
+    """
+    progress = progress or IngestProgress(verbose=False)
+    for batch in batched(chunks, batch_size):
+        ids = [chunk_id for chunk_id, _ in batch]
+        texts = [chunk.page_content for _, chunk in batch]
+        metadatas = [chunk.metadata for _, chunk in batch]
+
+        vectors = embeddings.embed_documents(texts)
+        progress.embedded += len(vectors)
+
+        if vectordb is None:
+            vectordb = new_vectorstore(embeddings, len(vectors[0]), docstore_path)
+        vectordb.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+        progress.indexed += len(ids)
+        progress.log()
+    if vectordb is None:
+        raise ValueError("La ingesta no produjo ningún chunk: ¿hay PDFs con texto extraíble?")
+    return vectordb
@@ -0,0 +1,220 @@
+# app/sweep.py
+# ──────────────────────────────────────────────────────────────
+# Barrido de configuraciones: chunk_size × chunk_overlap × prompt × k.
+#
+#   1. Los PDFs se parsean una sola vez.
+#   2. Se trocea cada configuración de chunking y se calculan los
+#      embeddings de los textos únicos de todas ellas (la caché
+#      persistente reutiliza los chunks idénticos entre configuraciones).
+#   3. Un índice por configuración de chunking (en paralelo); se reutiliza
+#      si ya existe con el mismo manifest.
+#   4. Cada combinación índice × prompt × k se evalúa en un pool de
+#      procesos; los runs de MLflow llevan las etiquetas sweep_id / sweep_config.
+#
+#   python app/sweep.py --chunk-sizes 256 512 1024 --overlaps 0 50 \
+#       --prompts v1_asistente_rrhh v2_resumido_directo --k 4 8
+# ──────────────────────────────────────────────────────────────
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_community.vectorstores import FAISS  # noqa: E402
+import mlflow  # noqa: E402
+
+from app.ann_index import is_flat  # noqa: E402
+from app.dedup import INGEST_DEDUP, ChunkDeduplicator  # noqa: E402
+from app.metrics_store import frame_from_results, write_results  # noqa: E402
+from app.pdf_parsing import format_parse_report  # noqa: E402
+from app.rag_pipeline import (  # noqa: E402
+    DATA_DIR, INDEX_SPEC, build_chain, file_sha256, get_embeddings, get_retriever, list_pdfs,
+    load_manifest, load_vectorstore_from_disk, parse_by_file, persist_vectorstore, split_by_file,
+)
+from app.run_eval import (  # noqa: E402
+    DATASET_PATH, JUDGE_MODE, aggregate_metrics, build_grader, build_judge_llm, evaluate_dataset,
+    log_results_batched, stage_metrics,
+)
+from app.tracing import Tracer  # noqa: E402
+
+SWEEP_DIR        = os.getenv("SWEEP_DIR", "sweeps")
+SWEEP_WORKERS    = int(os.getenv("SWEEP_WORKERS", min(4, os.cpu_count() or 1)))
+SWEEP_EXPERIMENT = os.getenv("SWEEP_EXPERIMENT", "eval_sweep")
+
+
+def index_path(chunk_size: int, chunk_overlap: int, directory: str = SWEEP_DIR) -> str:
+    return os.path.join(directory, "indexes", f"cs{chunk_size}_ov{chunk_overlap}")
+
+
+def config_name(config: Dict[str, Any]) -> str:
+    return f"{config['prompt_version']}|cs{config['chunk_size']}|ov{config['chunk_overlap']}|k{config['k']}"
+
+
+def is_current(persist_path: str, hashes: Dict[str, str], chunk_size: int, chunk_overlap: int,
+               index_spec: str) -> bool:
+    manifest = load_manifest(persist_path)
+    if not manifest:
+        return False
+    return (
+        (manifest.get("chunk_size"), manifest.get("chunk_overlap")) == (chunk_size, chunk_overlap)
+        and (manifest.get("index_spec") or "Flat") == ("Flat" if is_flat(index_spec) else index_spec)
+        and manifest.get("dedup", False) == INGEST_DEDUP
+        and {f: e["sha256"] for f, e in manifest["files"].items()} == hashes
+    )
+
+
+# ──────────────────────────────────────────────────────────────
+# Tareas del pool (funciones de módulo: se envían por pickle)
+# ──────────────────────────────────────────────────────────────
+def build_index(task: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    embeddings = get_embeddings()
+    # Los embeddings ya están en la caché persistente: aquí solo hay aciertos
+    vectordb = FAISS.from_documents(task["chunks"], embedding=embeddings, ids=task["ids"])
+    index_spec = persist_vectorstore(vectordb, task["entries"], task["chunk_size"], task["chunk_overlap"],
+                                     task["persist_path"], task["index_spec"])
+    return {
+        "persist_path": task["persist_path"],
+        "index_spec": index_spec,
+        "n_chunks": len(task["chunks"]),
+        "embedding_cache_hit_rate": embeddings.stats()["hit_rate"],
+        "build_s": time.perf_counter() - start,
+    }
+
+
+def evaluate_config(task: Dict[str, Any]) -> Dict[str, Any]:
+    config, persist_path = task["config"], task["persist_path"]
+
+    vectordb  = load_vectorstore_from_disk(persist_path)
+    retriever = get_retriever(vectordb, persist_path, k=config["k"])
+    chain     = build_chain(vectordb, prompt_version=config["prompt_version"], retriever=retriever,
+                            persist_path=persist_path)
+    grader    = build_grader(build_judge_llm())
+
+    tracer  = Tracer()
+    start   = time.perf_counter()
+    results = asyncio.run(evaluate_dataset(task["dataset"], chain, grader, tracer=tracer))
+    elapsed = time.perf_counter() - start
+
+    mlflow.set_experiment(experiment_id=task["experiment_id"])
+    run_id = log_results_batched(
+        results, elapsed, config=config,
+        tags={"sweep_id": task["sweep_id"], "sweep_config": config_name(config)},
+        extra_metrics=stage_metrics(tracer.summary()),
+    )
+    return {"config": config, "run_id": run_id, "results": results, "elapsed": elapsed}
+
+
+# ──────────────────────────────────────────────────────────────
+# Orquestación
+# ──────────────────────────────────────────────────────────────
+def run_sweep(chunk_sizes: List[int], overlaps: List[int], prompts: List[str], ks: List[int],
+              dataset: List[Dict[str, str]], path: str = DATA_DIR, directory: str = SWEEP_DIR,
+              workers: int = SWEEP_WORKERS, experiment: str = SWEEP_EXPERIMENT,
+              index_spec: str = INDEX_SPEC, sweep_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    sweep_id = sweep_id or time.strftime("%Y%m%d-%H%M%S")
+    chunkings = [(cs, co) for cs, co in itertools.product(chunk_sizes, overlaps) if co < cs]
+
+    # 1) Parseo único
+    files = list_pdfs(path)
+    hashes = {file: file_sha256(os.path.join(path, file)) for file in files}
+    pending = [(cs, co) for cs, co in chunkings
+               if not is_current(index_path(cs, co, directory), hashes, cs, co, index_spec)]
+    print(f"🧪 Sweep {sweep_id}: {len(chunkings)} índices ({len(chunkings) - len(pending)} reutilizados) × "
+          f"{len(prompts)} prompts × {len(ks)} k = {len(chunkings) * len(prompts) * len(ks)} evaluaciones")
+
+    if pending:
+        parse_report = []
+        docs_by_file = parse_by_file(files, path, parse_report)
+        print(format_parse_report(parse_report))
+
+        # 2) Troceo de cada configuración + embeddings de los textos únicos (una sola pasada)
+        tasks, unique_texts = [], {}
+        for cs, co in pending:
+            deduper = ChunkDeduplicator() if INGEST_DEDUP else None
+            chunks, ids, entries, _ = split_by_file(docs_by_file, hashes, cs, co, deduper)
+            unique_texts.update(dict.fromkeys(chunk.page_content for chunk in chunks))
+            tasks.append({"chunks": chunks, "ids": ids, "entries": entries, "chunk_size": cs,
+                          "chunk_overlap": co, "persist_path": index_path(cs, co, directory),
+                          "index_spec": index_spec})
+        n_chunks = sum(len(task["chunks"]) for task in tasks)
+        embeddings = get_embeddings()
+        embeddings.embed_documents(list(unique_texts))
+        print(f"🔢 {n_chunks} chunks, {len(unique_texts)} textos únicos embebidos "
+              f"(caché: {embeddings.stats()['hit_rate']:.0%} aciertos)")
+
+        # 3) Un índice por configuración de chunking
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(tasks)))) as pool:
+            for built in pool.map(build_index, tasks):
+                print(f"🗂️  {built['persist_path']}: {built['n_chunks']} chunks, {built['index_spec']}, "
+                      f"{built['build_s']:.1f}s")
+
+    # 4) Evaluación índice × prompt × k (el índice se comparte entre prompts y k).
+    #    El experimento se crea aquí: crearlo desde varios procesos a la vez no es seguro
+    experiment_id = mlflow.set_experiment(experiment).experiment_id
+    eval_tasks = [
+        {
+            "config": {"prompt_version": prompt, "chunk_size": cs, "chunk_overlap": co, "k": k,
+                       "judge_mode": JUDGE_MODE},
+            "persist_path": index_path(cs, co, directory),
+            "dataset": dataset,
+            "experiment_id": experiment_id,
+            "sweep_id": sweep_id,
+        }
+        for (cs, co), prompt, k in itertools.product(chunkings, prompts, ks)
+    ]
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(eval_tasks)))) as pool:
+        outcomes = list(pool.map(evaluate_config, eval_tasks))
+
+    # Exportación al almacén de métricas desde un único proceso
+    for outcome in outcomes:
+        if outcome["results"]:
+            write_results(experiment, frame_from_results(outcome["results"], outcome["config"],
+                                                         parent_run_id=outcome["run_id"]))
+    return outcomes
+
+
+def format_summary(outcomes: List[Dict[str, Any]]) -> str:
+    rows = []
+    for outcome in outcomes:
+        if not outcome["results"]:
+            continue
+        agg = aggregate_metrics(outcome["results"])
+        rows.append((config_name(outcome["config"]), agg["qa_accuracy"], agg["mean_correctness_score"],
+                     agg["p95_latency_s"], outcome["elapsed"]))
+    rows.sort(key=lambda row: (-row[1], -row[2]))
+    lines = [f"{'configuración':<40} {'qa':>5} {'correct.':>8} {'p95 s':>6} {'total s':>8}"]
+    lines += [f"{name:<40} {qa:>5.2f} {corr:>8.2f} {p95:>6.1f} {total:>8.1f}" for name, qa, corr, p95, total in rows]
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Barrido de configuraciones RAG con evaluación en MLflow")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[512])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[50])
+    parser.add_argument("--prompts", nargs="+", default=["v1_asistente_rrhh"])
+    parser.add_argument("--k", type=int, nargs="+", default=[4])
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--workers", type=int, default=SWEEP_WORKERS)
+    parser.add_argument("--experiment", default=SWEEP_EXPERIMENT)
+    parser.add_argument("--index-spec", default=INDEX_SPEC)
+    args = parser.parse_args(argv)
+
+    with open(args.dataset, encoding="utf-8") as f:
+        dataset = json.load(f)
+
+    start = time.perf_counter()
+    outcomes = run_sweep(args.chunk_sizes, args.overlaps, args.prompts, args.k, dataset,
+                         workers=args.workers, experiment=args.experiment, index_spec=args.index_spec)
+    print("\n" + format_summary(outcomes))
+    print(f"\n✅ Sweep completado en {time.perf_counter() - start:.1f}s; runs en el experimento {args.experiment}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# app/tracing.py
+# ──────────────────────────────────────────────────────────────
+# Trazas por etapa de la cadena RAG (condensación, embedding de la
+# consulta, búsqueda vectorial / BM25, generación) a partir de los
+# callbacks de LangChain, más spans manuales para lo que no emite
+# callbacks (embeddings, búsquedas). Cada turno es una traza; las
+# trazas se añaden a RAG_TRACE_FILE en formato OTLP/JSON (una petición
+# de exportación por línea), legible por un collector de OpenTelemetry.
+#
+#   tracer = Tracer()
+#   with tracer.turn(ui="streamlit") as handler:
+#       chain.invoke(inputs, config={"callbacks": [handler]})
+#   tracer.summary()  →  {"generation": {"p50_s": …, "p95_s": …, "count": …}, …}
+# ──────────────────────────────────────────────────────────────
+import os
+import json
+import time
+import secrets
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+
+RAG_TRACE_FILE  = os.getenv("RAG_TRACE_FILE", "traces/rag_spans.jsonl")
+RAG_TRACING     = os.getenv("RAG_TRACING", "1") == "1"           # 0 = no se escribe el archivo de trazas
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", 50_000))      # spans en memoria para el resumen
+SERVICE_NAME    = "endurance-lab-rag"
+
+# Etiquetas de los LLMs en build_chain → etapa
+LLM_STAGES = ("condense_question", "generation")
+STAGES = ("turn", "condense_question", "retrieval", "embed_query", "vector_search", "bm25_search", "generation")
+
+_ACTIVE: contextvars.ContextVar[Optional["TracingHandler"]] = contextvars.ContextVar("rag_trace", default=None)
+
+
+def _now_ns() -> int:
+    return time.time_ns()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}  # OTLP/JSON codifica int64 como string
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _token_usage(response) -> Dict[str, int]:
+    for generations in getattr(response, "generations", []) or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return {
+                    "llm.token_count.prompt": int(usage.get("input_tokens", 0)),
+                    "llm.token_count.completion": int(usage.get("output_tokens", 0)),
+                    "llm.token_count.total": int(usage.get("total_tokens", 0)),
+                }
+    usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+    if usage:
+        return {
+            "llm.token_count.prompt": int(usage.get("prompt_tokens", 0)),
+            "llm.token_count.completion": int(usage.get("completion_tokens", 0)),
+            "llm.token_count.total": int(usage.get("total_tokens", 0)),
+        }
+    return {}
+
+
+class TracingHandler(BaseCallbackHandler):
+    """Una traza (un turno): spans de callbacks + spans manuales anidados."""
+
+    def __init__(self, tracer: "Tracer"):
+        self.tracer = tracer
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Dict[str, Any]] = []
+        self._open: Dict[Any, Dict[str, Any]] = {}   # run_id / clave manual → span
+        self._stack: List[Any] = []                  # spans abiertos, el último es el más interno
+        self._lock = threading.Lock()
+
+    # ── Núcleo ──────────────────────────────────────────────
+    def start_span(self, key: Any, name: str, stage: str, parent_key: Any = None, **attributes: Any) -> None:
+        with self._lock:
+            parent = self._open.get(parent_key) if parent_key is not None else None
+            if parent is None and self._stack:
+                parent = self._open[self._stack[-1]]
+            self._open[key] = {
+                "name": name,
+                "stage": stage,
+                "span_id": secrets.token_hex(8),
+                "parent_span_id": parent["span_id"] if parent else None,
+                "start_ns": _now_ns(),
+                "attributes": {"rag.stage": stage, **attributes},
+            }
+            self._stack.append(key)
+
+    def end_span(self, key: Any, error: Optional[BaseException] = None, **attributes: Any) -> None:
+        with self._lock:
+            span = self._open.pop(key, None)
+            if span is None:
+                return
+            self._stack.remove(key)
+            span["end_ns"] = _now_ns()
+            span["attributes"].update(attributes)
+            span["error"] = repr(error) if error else None
+            self.spans.append(span)
+
+    # ── Callbacks de LangChain ──────────────────────────────
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                       **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "chain"
+        self.start_span(run_id, name, "chain", parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs: Any) -> None:
+        self.end_span(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self.end_span(run_id, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                            tags: Optional[List[str]] = None, **kwargs: Any) -> None:
+        stage = next((tag for tag in (tags or []) if tag in LLM_STAGES), "llm")
+        model = ((kwargs.get("metadata") or {}).get("ls_model_name")) or "llm"
+        self.start_span(run_id, f"{stage} {model}", stage, parent_run_id, **{"llm.model": model})
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                     tags: Optional[List[str]] = None, **kwargs: Any) -> None:
+        self.on_chat_model_start(serialized, [], run_id=run_id, parent_run_id=parent_run_id, tags=tags, **kwargs)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._open.get(run_id)
+        if span is not None and "llm.first_token_s" not in span["attributes"]:
+            span["attributes"]["llm.first_token_s"] = (_now_ns() - span["start_ns"]) / 1e9
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        self.end_span(run_id, **_token_usage(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self.end_span(run_id, error)
+
+    def on_retriever_start(self, serialized, query: str, *, run_id: UUID,
+                           parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self.start_span(run_id, "retrieval", "retrieval", parent_run_id)
+
+    def on_retriever_end(self, documents, *, run_id: UUID, **kwargs: Any) -> None:
+        self.end_span(run_id, **{"retrieval.documents": len(documents)})
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self.end_span(run_id, error)
+
+
+@contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[Optional[Dict[str, Any]]]:
+    """Span manual dentro del turno activo (no hace nada fuera de `Tracer.turn`).
+
+    Devuelve un diccionario en el que se pueden añadir atributos al cerrar.
+    """
+    handler = _ACTIVE.get()
+    if handler is None:
+        yield None
+        return
+    key, extra = object(), {}
+    handler.start_span(key, stage, stage, **attributes)
+    try:
+        yield extra
+    except BaseException as error:
+        handler.end_span(key, error, **extra)
+        raise
+    handler.end_span(key, **extra)
+
+
+class TracedEmbeddings(Embeddings):
+    """Mide `embed_query` como etapa propia (los embeddings no emiten callbacks)."""
+
+    def __init__(self, underlying: Embeddings):
+        self.underlying = underlying
+
+    def __getattr__(self, name):
+        if name == "underlying":
+            raise AttributeError(name)
+        return getattr(self.underlying, name)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with span("embed_query", **{"embedding.chars": len(text)}):
+            return self.underlying.embed_query(text)
+
+
+class Tracer:
+    """Recoge los spans de todos los turnos y los exporta a un archivo OTLP/JSON."""
+
+    def __init__(self, path: Optional[str] = RAG_TRACE_FILE, enabled: bool = RAG_TRACING,
+                 max_spans: int = TRACE_MAX_SPANS):
+        self.path = path
+        self.enabled = enabled
+        self.spans: deque = deque(maxlen=max_spans)  # las UIs viven mucho: memoria acotada
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def turn(self, **attributes: Any) -> Iterator[TracingHandler]:
+        handler = TracingHandler(self)
+        token = _ACTIVE.set(handler)
+        handler.start_span("turn", "rag_turn", "turn", **attributes)
+        error = None
+        try:
+            yield handler
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            handler.end_span("turn", error)
+            _ACTIVE.reset(token)
+            self.export(handler)
+
+    def export(self, handler: TracingHandler) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.spans.extend(handler.spans)
+            if not self.path:
+                return
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(to_otlp(handler.trace_id, handler.spans), ensure_ascii=False) + "\n")
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            spans = list(self.spans)
+        return stage_summary(spans)
+
+
+def to_otlp(trace_id: str, spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": "app.tracing"},
+                "spans": [
+                    {
+                        "traceId": trace_id,
+                        "spanId": s["span_id"],
+                        **({"parentSpanId": s["parent_span_id"]} if s["parent_span_id"] else {}),
+                        "name": s["name"],
+                        "kind": 1,  # SPAN_KIND_INTERNAL
+                        "startTimeUnixNano": str(s["start_ns"]),
+                        "endTimeUnixNano": str(s["end_ns"]),
+                        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s["attributes"].items()],
+                        "status": {"code": 2, "message": s["error"]} if s["error"] else {"code": 1},
+                    }
+                    for s in spans
+                ],
+            }],
+        }]
+    }
+
+
+def stage_summary(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """p50/p95 de duración por etapa (solo las etapas conocidas)."""
+    durations: Dict[str, List[float]] = {}
+    for s in spans:
+        if s["stage"] in STAGES:
+            durations.setdefault(s["stage"], []).append((s["end_ns"] - s["start_ns"]) / 1e9)
+    return {
+        stage: {
+            "p50_s": float(np.percentile(values, 50)),
+            "p95_s": float(np.percentile(values, 95)),
+            "count": len(values),
+        }
+        for stage, values in sorted(durations.items(), key=lambda item: STAGES.index(item[0]))
+    }
@@ -15,7 +15,9 @@ st.set_page_config(
     page_icon="🏃‍♂️",
 )
 
-from app.rag_pipeline import load_vectorstore_from_disk, build_chain  # noqa: E402
+from app.rag_pipeline import load_vectorstore_from_disk, build_chain, build_history  # noqa: E402
+from app.streaming import StreamHandler, format_sources  # noqa: E402
+from app.tracing import Tracer  # noqa: E402
 
 # ------------------------------------------------------------------
 # Estilos globales (burbujas de chat)
@@ -48,10 +50,16 @@ st.markdown(
 @st.cache_resource(show_spinner="Cargando base de conocimientos…")
 def get_vectordb_and_chain():
     vectordb = load_vectorstore_from_disk()
-    chain = build_chain(vectordb)
+    chain = build_chain(vectordb, cache_answers=True)
     return vectordb, chain
 
 
+@st.cache_resource
+def get_tracer():
+    # Una traza por turno en RAG_TRACE_FILE (condensación, embedding, búsqueda, generación)
+    return Tracer()
+
+
 # ------------------------------------------------------------------
 # Barra lateral (configuración de la sesión)
 # ------------------------------------------------------------------
@@ -85,7 +93,7 @@ question = st.text_input(
 
 # Historial en el estado de la sesión
 if "chat_history" not in st.session_state:
-    st.session_state.chat_history: list[tuple[str, str]] = []
+    st.session_state.chat_history = build_history()  # ventana + resumen
 
 # Cargar vectorstore y cadena solo una vez
 _, chain = get_vectordb_and_chain()
@@ -93,31 +101,62 @@ _, chain = get_vectordb_and_chain()
 # ------------------------------------------------------------------
 # Llamada al modelo
 # ------------------------------------------------------------------
+if "turn_timings" not in st.session_state:
+    st.session_state.turn_timings: list[dict] = []
+
 if question:
-    with st.spinner("Generando respuesta…"):
-        try:
+    # Streaming: las fuentes aparecen al terminar la recuperación y la
+    # respuesta se pinta token a token
+    sources_box = st.empty()
+    answer_box = st.empty()
+
+    def show_sources(docs):
+        sources_box.markdown("📚 **Fuentes**\n" + format_sources(docs))
+
+    def show_partial(_, text):
+        answer_box.markdown(
+            f'<div class="bubble-bot"><strong>🤖 Coach:</strong><br/>{text}▌</div>',
+            unsafe_allow_html=True,
+        )
+
+    handler = StreamHandler(on_token=show_partial, on_sources=show_sources)
+    try:
+        with get_tracer().turn(ui="ui_streamlit", sport=sport) as trace:
             result = chain.invoke(
                 {
                     "question": question,
-                    "chat_history": st.session_state.chat_history,
+                    "chat_history": st.session_state.chat_history.for_question(question),
                     "sport": sport,  # contexto adicional
-                }
-            )
-            answer = result["answer"]
-        except Exception:
-            answer = (
-                "⚠️ Lo siento, ha ocurrido un error al procesar tu pregunta.\n\n"
-                f"```{traceback.format_exc(limit=2)}```"
+                },
+                config={"callbacks": [handler, trace]},
             )
-        # Guardar el turno
-        st.session_state.chat_history.append((question, answer))
+        answer = result["answer"]
+        # Respuesta desde la caché semántica: no hay recuperación ni tokens
+        if handler.sources is None and result.get("source_documents"):
+            show_sources(result["source_documents"])
+    except Exception:
+        answer = (
+            "⚠️ Lo siento, ha ocurrido un error al procesar tu pregunta.\n\n"
+            f"```{traceback.format_exc(limit=2)}```"
+        )
+    answer_box.empty()  # la respuesta completa se muestra en la conversación
+    # Guardar el turno (y sus tiempos: primer token y total)
+    st.session_state.turn_timings.append(handler.timings())
+    st.session_state.chat_history.add(question, answer)
+
+if st.session_state.turn_timings:
+    timings = st.session_state.turn_timings[-1]
+    st.caption(
+        f"⏱️ Primer token: {timings['ttft_s']:.2f} s · "
+        f"respuesta completa: {timings['total_s']:.2f} s"
+    )
 
 # ------------------------------------------------------------------
 # Mostrar conversación
 # ------------------------------------------------------------------
 if st.session_state.chat_history:
     st.markdown("---")
-    for q, a in reversed(st.session_state.chat_history):
+    for q, a in reversed(st.session_state.chat_history.turns):
         st.markdown(
             f'<div class="bubble-user"><strong>🧑‍💻 Tú:</strong><br/>{q}</div>',
             unsafe_allow_html=True,
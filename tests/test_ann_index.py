@@ -0,0 +1,71 @@
+# tests/test_ann_index.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import faiss
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from app.ann_index import ANN_FILE, benchmark, build_ann_index, format_benchmark, sample_queries
+from app.benchmark import fake_embeddings
+from app.rag_pipeline import load_manifest, load_vectorstore_from_disk, persist_vectorstore
+
+
+def vectores_agrupados(n=4000, dim=32, grupos=50, seed=0):
+    # Corpus sintético con estructura de clústeres (como los embeddings reales)
+    rng = np.random.default_rng(seed)
+    centros = rng.normal(0, 1, (grupos, dim))
+    return (centros[rng.integers(0, grupos, n)] + rng.normal(0, 0.4, (n, dim))).astype("float32")
+
+
+def test_recall_de_los_indices_ann_frente_al_plano():
+    vectors = vectores_agrupados()
+    queries = sample_queries(vectors, 100)
+    rows = {r["spec"]: r for r in benchmark(vectors, ["Flat", "IVF64,Flat", "IVF64,PQ8x4", "HNSW16"], queries, k=4)}
+
+    assert rows["Flat"]["recall_at_k"] == 1.0
+    assert rows["IVF64,Flat"]["recall_at_k"] >= 0.9
+    assert rows["HNSW16"]["recall_at_k"] >= 0.9
+    assert rows["IVF64,PQ8x4"]["recall_at_k"] >= 0.3                       # compresión con pérdida
+    assert rows["IVF64,PQ8x4"]["index_mb"] < rows["Flat"]["index_mb"] / 4
+    for row in rows.values():
+        assert 0 <= row["p50_ms"] <= row["p95_ms"]
+        assert row["build_s"] >= 0 and row["index_mb"] > 0
+
+    tabla = format_benchmark(list(rows.values()), k=4).splitlines()
+    assert "recall@4" in tabla[0] and len(tabla) == 5
+
+
+def test_parametros_de_busqueda_por_defecto_y_explicitos():
+    vectors = vectores_agrupados(1000)
+    assert faiss.extract_index_ivf(build_ann_index(vectors, "IVF16,Flat")).nprobe == 16
+    assert faiss.extract_index_ivf(build_ann_index(vectors, "IVF16,Flat", search_params="nprobe=2")).nprobe == 2
+    assert faiss.downcast_index(build_ann_index(vectors, "HNSW16")).hnsw.efSearch == 64
+
+    with pytest.raises(ValueError, match="No se pudo entrenar"):
+        build_ann_index(vectors[:10], "IVF64,PQ8")
+
+
+@pytest.mark.parametrize("spec, params, leer", [
+    ("HNSW16", "efSearch=37", lambda index: faiss.downcast_index(index).hnsw.efSearch),
+    ("IVF4,Flat", "nprobe=3", lambda index: faiss.extract_index_ivf(index).nprobe),
+])
+def test_los_parametros_de_busqueda_sobreviven_a_guardar_y_cargar(tmp_path, spec, params, leer):
+    docs = [Document(page_content=f"Sesión {i}: {i % 7} series de {i % 5 + 1} minutos", metadata={"source": "a.pdf"})
+            for i in range(200)]
+    vectordb = FAISS.from_documents(docs, fake_embeddings(), ids=[f"c{i}" for i in range(len(docs))])
+
+    assert persist_vectorstore(vectordb, {}, 512, 50, str(tmp_path), index_spec=spec, search_params=params) == spec
+    assert os.path.exists(tmp_path / ANN_FILE)
+    assert load_manifest(str(tmp_path))["search_params"] == params
+
+    cargado = load_vectorstore_from_disk(str(tmp_path), embeddings=fake_embeddings())
+    assert leer(cargado.index) == int(params.split("=")[1])
+    assert cargado.index.ntotal == len(docs)
+    consulta = docs[42].page_content
+    assert cargado.similarity_search(consulta, k=1)[0].id == "c42"
@@ -0,0 +1,106 @@
+# tests/test_answer_cache.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.answer_cache import CachedConversationalChain, SemanticAnswerCache
+from app.benchmark import fake_embeddings, fake_llms
+from app.rag_pipeline import build_chain, get_retriever, persist_vectorstore
+
+
+class FakeEmbeddings:
+    VECTORES = {
+        "¿Cuánta agua bebo por hora?": [1.0, 0.0],
+        "¿Cuánta agua debo beber por hora?": [0.99, 0.05],
+        "¿Qué es el FTP?": [0.0, 1.0],
+    }
+
+    def embed_query(self, text):
+        return self.VECTORES[text]
+
+
+class FakeChain:
+    def __init__(self):
+        self.llamadas = 0
+
+    def invoke(self, inputs, config=None):
+        self.llamadas += 1
+        return {"answer": f"respuesta a {inputs['question']}"}
+
+
+def test_preguntas_equivalentes_salen_de_cache_hasta_reconstruir_indice():
+    version = ["v1"]
+    fake = FakeChain()
+    chain = CachedConversationalChain(
+        fake, FakeEmbeddings(), prompt_version="p1", index_version=lambda: version[0],
+        cache=SemanticAnswerCache(threshold=0.95),
+    )
+
+    primera = chain.invoke({"question": "¿Cuánta agua bebo por hora?", "chat_history": []})
+    segunda = chain.invoke({"question": "¿Cuánta agua debo beber por hora?", "chat_history": []})
+    otra = chain.invoke({"question": "¿Qué es el FTP?", "chat_history": []})
+
+    assert primera["cached"] is False and segunda["cached"] is True
+    assert segunda["answer"] == primera["answer"]
+    assert otra["cached"] is False
+    assert fake.llamadas == 2
+
+    version[0] = "v2"  # vectorstore reconstruido
+    assert chain.invoke({"question": "¿Cuánta agua bebo por hora?", "chat_history": []})["cached"] is False
+    assert chain.stats()["hits"] == 1
+
+
+def test_ttl_y_lru():
+    ahora = [0.0]
+    cache = SemanticAnswerCache(threshold=0.9, ttl=10, max_entries=1, clock=lambda: ahora[0])
+    cache.store([1.0, 0.0], ("ns",), {"answer": "a"}, latency=2.0)
+    cache.store([0.0, 1.0], ("ns",), {"answer": "b"}, latency=2.0)
+
+    assert cache.lookup([1.0, 0.0], ("ns",)) is None  # desalojada por LRU
+    assert cache.lookup([0.0, 1.0], ("otro",)) is None  # otro espacio de nombres
+    assert cache.lookup([0.0, 1.0], ("ns",))["answer"] == "b"
+
+    ahora[0] = 11.0
+    assert cache.lookup([0.0, 1.0], ("ns",)) is None  # expirada
+
+
+
+class ConsultasContadas(Embeddings):
+    """Embeddings falsos que anotan cada consulta embebida."""
+
+    def __init__(self):
+        self.inner = fake_embeddings()
+        self.consultas = []
+
+    def embed_documents(self, texts):
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        self.consultas.append(text)
+        return self.inner.embed_query(text)
+
+
+@pytest.mark.parametrize("mode", ["hybrid", "dense"])
+def test_un_fallo_de_cache_embebe_la_pregunta_una_sola_vez(tmp_path, mode):
+    embeddings = ConsultasContadas()
+    docs = [Document(page_content=f"Bloque {i}: series al umbral de lactato", metadata={"source": "a.pdf"})
+            for i in range(10)]
+    vectordb = FAISS.from_documents(docs, embeddings, ids=[f"c{i}" for i in range(len(docs))])
+    persist_vectorstore(vectordb, {}, 512, 50, str(tmp_path))
+    llm, condense = fake_llms()
+    chain = build_chain(vectordb, retriever=get_retriever(vectordb, str(tmp_path), mode=mode),
+                        persist_path=str(tmp_path), cache_answers=True, llm=llm, condense_question_llm=condense)
+
+    result = chain.invoke({"question": "¿Cómo entreno el umbral?", "chat_history": []})
+    assert result["cached"] is False and result["source_documents"]
+    assert embeddings.consultas == ["¿Cómo entreno el umbral?"]
+
+    # Sin caché de respuestas el retriever embebe por su cuenta
+    assert chain.retriever.invoke("¿Y el umbral?") and embeddings.consultas[-1] == "¿Y el umbral?"
@@ -0,0 +1,120 @@
+# tests/test_api.py
+
+import os
+import sys
+import json
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+from app.api import Resources, create_app
+from app.history import ChatHistory
+from app.tracing import Tracer
+
+DOCS = [Document(page_content="El FTP es la potencia umbral.", metadata={"source": "data/pdfs/plan.pdf", "page": 2})]
+
+
+class FakeRetriever:
+    def __init__(self):
+        self.configs = []
+
+    def invoke(self, question, config=None):
+        self.configs.append(config)
+        return DOCS
+
+
+class FakeChain:
+    def __init__(self):
+        self.historiales = []
+
+    def invoke(self, inputs, config=None):
+        self.historiales.append(list(inputs["chat_history"]))
+        for handler in config["callbacks"]:
+            handler.on_retriever_end(DOCS, run_id=None)
+            for token in ["Respuesta ", "sobre ", inputs["question"]]:
+                handler.on_llm_new_token(token, run_id=None)
+        return {"answer": "Respuesta sobre " + inputs["question"], "source_documents": DOCS}
+
+
+def cliente(chain=None, retriever=None):
+    chain = chain or FakeChain()
+    retriever = retriever or FakeRetriever()
+    app = create_app(loader=lambda: Resources(None, chain, retriever, ChatHistory), tracer=Tracer(path=None))
+    return TestClient(app), chain
+
+
+def esperar_carga(client):
+    # La carga corre en segundo plano tras el arranque
+    for _ in range(200):
+        ready = client.get("/readyz")
+        if ready.json()["status"] != "loading":
+            return ready
+        time.sleep(0.01)
+    return ready
+
+
+def eventos(body):
+    out = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        out.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return out
+
+
+def test_salud_y_disponibilidad():
+    client, _ = cliente()
+    with client:
+        assert client.get("/healthz").json() == {"status": "ok"}
+        assert esperar_carga(client).status_code == 200
+
+
+def test_no_disponible_si_falla_la_carga():
+    def falla():
+        raise RuntimeError("sin índice")
+
+    with TestClient(create_app(loader=falla, tracer=Tracer(path=None))) as client:
+        assert client.get("/healthz").status_code == 200
+        ready = esperar_carga(client)
+        assert ready.status_code == 503 and "sin índice" in ready.json()["error"]
+        assert client.post("/retrieve", json={"question": "FTP"}).status_code == 503
+
+
+def test_retrieve():
+    client, _ = cliente()
+    with client:
+        esperar_carga(client)
+        body = client.post("/retrieve", json={"question": "¿Qué es el FTP?"}).json()
+    assert body["documents"] == [{"content": "El FTP es la potencia umbral.", "source": "plan.pdf", "page": 2}]
+
+
+def test_retrieve_pasa_la_disciplina_al_retriever():
+    retriever = FakeRetriever()
+    client, _ = cliente(retriever=retriever)
+    with client:
+        esperar_carga(client)
+        client.post("/retrieve", json={"question": "¿Qué es el FTP?", "sport": "Ciclismo"})
+        client.post("/retrieve", json={"question": "¿Qué es el FTP?"})
+    assert [c["metadata"]["sport"] for c in retriever.configs] == ["Ciclismo", None]
+
+
+def test_chat_en_streaming_con_historial_de_sesion():
+    client, chain = cliente()
+    with client:
+        esperar_carga(client)
+        primero = eventos(client.post("/chat", json={"question": "¿Qué es el FTP?"}).text)
+        session_id = primero[0][1]["session_id"]
+        assert [e for e, _ in primero] == ["session", "sources", "token", "token", "token", "done"]
+        assert primero[-1][1]["answer"] == "Respuesta sobre ¿Qué es el FTP?"
+
+        segundo = client.post("/chat", json={"question": "¿Y eso?", "session_id": session_id, "stream": False}).json()
+        assert segundo["session_id"] == session_id
+        assert segundo["sources"][0]["source"] == "plan.pdf"
+
+        assert client.delete(f"/sessions/{session_id}").json()["deleted"]
+        assert client.delete(f"/sessions/{session_id}").status_code == 404
+
+    assert chain.historiales[0] == []
+    assert chain.historiales[1] == [("¿Qué es el FTP?", "Respuesta sobre ¿Qué es el FTP?")]
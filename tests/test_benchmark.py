@@ -0,0 +1,44 @@
+# tests/test_benchmark.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.documents import Document
+
+from app.benchmark import compare, synthetic_corpus
+
+
+def reporte(**metricas):
+    return {"corpora": {"pdfs": {"n_chunks": 645, **metricas}}}
+
+
+def test_corpus_sintetico_escala_sin_repetir_paginas():
+    docs = [Document(page_content="Frase uno. Frase dos. Frase tres. Frase cuatro", metadata={"source": "data/pdfs/a.pdf", "page": 0})]
+    corpus = synthetic_corpus(docs, 10)
+    assert len(corpus) == 10
+    assert corpus[0] is docs[0]
+    assert len({d.metadata["source"] for d in corpus}) == 10
+    assert all(sorted(d.page_content.split(". ")) == sorted(docs[0].page_content.split(". ")) for d in corpus)
+
+
+def test_compare_marca_regresiones_por_encima_del_umbral():
+    base = reporte(index_build_s=1.0, query_p50_ms=2.0, turn_p95_ms=10.0)
+    actual = reporte(index_build_s=1.5, query_p50_ms=2.1, turn_p95_ms=8.0)
+    rows = {r["metric"]: r for r in compare(actual, base, threshold=0.25, min_delta=0.0)}
+
+    assert set(rows) == {"index_build_s", "query_p50_ms", "turn_p95_ms"}  # n_chunks no es un tiempo
+    assert rows["index_build_s"]["regression"]
+    assert not rows["query_p50_ms"]["regression"]
+    assert not rows["turn_p95_ms"]["regression"]
+
+
+def test_compare_ignora_diferencias_absolutas_pequenas():
+    base, actual = reporte(query_p50_ms=0.2), reporte(query_p50_ms=0.6)  # +200 %, pero 0.4 ms
+    assert not compare(actual, base, threshold=0.25, min_delta=0.002)[0]["regression"]
+    assert compare(actual, base, threshold=0.25, min_delta=0.0)[0]["regression"]
+
+
+def test_compare_omite_corpus_sin_linea_base():
+    assert compare({"corpora": {"x100": {"split_s": 1.0}}}, reporte(split_s=1.0)) == []
@@ -0,0 +1,37 @@
+# tests/test_bm25.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.bm25 import BM25Index, tokenize
+from app.retrievers import reciprocal_rank_fusion
+
+
+def test_tokenize_conserva_terminos_tecnicos():
+    assert tokenize("Apunta a 90 g CHO/h y sube tu FTP con Sweet Spot") == [
+        "apunta", "a", "90", "g", "cho/h", "y", "sube", "tu", "ftp", "con", "sweet", "spot",
+    ]
+    assert tokenize("Hidratación") == ["hidratacion"]
+
+
+def test_bm25_prioriza_terminos_exactos_y_persiste(tmp_path):
+    index = BM25Index.build(
+        ["a", "b", "c"],
+        [
+            "El FTP es la potencia umbral funcional",
+            "Consume 90 g de CHO/h en salidas largas",
+            "Sesiones Sweet Spot al 88-94 % del FTP",
+        ],
+    )
+    assert [doc_id for doc_id, _ in index.search("CHO/h", k=2)] == ["b"]
+    assert [doc_id for doc_id, _ in index.search("sweet spot FTP", k=3)][0] == "c"
+
+    index.save(str(tmp_path))
+    reloaded = BM25Index.load(str(tmp_path))
+    assert reloaded.search("umbral funcional") == index.search("umbral funcional")
+
+
+def test_rrf_fusiona_ambas_listas():
+    assert reciprocal_rank_fusion([["x", "y", "z"], ["z", "w"]]) == ["z", "x", "y", "w"]
@@ -0,0 +1,49 @@
+# tests/test_cache.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.embeddings import Embeddings
+
+from app.cache import CachedEmbeddings, SQLiteCache
+
+
+class ContadorEmbeddings(Embeddings):
+    model = "fake-embedding"
+
+    def __init__(self):
+        self.textos_embebidos = []
+
+    def embed_documents(self, texts):
+        self.textos_embebidos.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+
+def test_embeddings_repetidos_salen_de_cache(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "emb.sqlite"), table="embeddings")
+    fake = ContadorEmbeddings()
+    emb = CachedEmbeddings(fake, cache=cache)
+
+    assert emb.embed_documents(["FTP", "Sweet Spot", "FTP"]) == [[3.0, 1.0], [10.0, 1.0], [3.0, 1.0]]
+    assert emb.embed_documents(["FTP", "CHO/h"]) == [[3.0, 1.0], [5.0, 1.0]]
+
+    assert fake.textos_embebidos == ["FTP", "Sweet Spot", "CHO/h"]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 4
+
+
+def test_desalojo_lru_respeta_el_tope(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "kv.sqlite"), max_entries=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a")
+    cache.set("c", b"3")
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
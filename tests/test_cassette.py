@@ -0,0 +1,86 @@
+# tests/test_cassette.py
+
+import os
+import sys
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from langchain_core.embeddings import Embeddings
+from langchain_core.globals import set_llm_cache
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.cassette import CassetteEmbeddings, CassetteMissError, install_llm_cassette
+from app.judge import MultiCriteriaJudge
+
+
+class ContadorEmbeddings(Embeddings):
+    model = "fake-embedding"
+    llamadas = 0
+
+    def embed_documents(self, texts):
+        self.llamadas += 1
+        return [[float(len(t))] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture(autouse=True)
+def sin_cache_global():
+    yield
+    set_llm_cache(None)
+
+
+def test_chat_grabado_se_reproduce_sin_llamar_al_modelo(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_CASSETTE_MODE", "record")
+    install_llm_cassette(str(tmp_path))
+    grabado = FakeListChatModel(responses=["Bebe 500-750 ml por hora"]).invoke("¿Cuánta agua bebo?")
+
+    monkeypatch.setenv("LLM_CASSETTE_MODE", "replay")
+    install_llm_cassette(str(tmp_path))
+    modelo = FakeListChatModel(responses=["Bebe 500-750 ml por hora"])
+
+    assert modelo.invoke("¿Cuánta agua bebo?").content == grabado.content
+    assert modelo.i == 0  # el modelo no se ha llamado
+    with pytest.raises(CassetteMissError):
+        modelo.invoke("¿Qué es el FTP?")
+
+
+def test_embeddings_grabados_se_reproducen(tmp_path):
+    fake = ContadorEmbeddings()
+    CassetteEmbeddings(fake, str(tmp_path), "record").embed_documents(["FTP", "CHO/h"])
+
+    replay = CassetteEmbeddings(fake, str(tmp_path), "replay")
+    assert replay.embed_documents(["CHO/h", "FTP"]) == [[5.0], [3.0]]
+    assert fake.llamadas == 1
+    with pytest.raises(CassetteMissError):
+        replay.embed_query("Sweet Spot")
+
+
+def test_embeddings_grabados_en_binario_y_solo_se_anaden(tmp_path):
+    fake = ContadorEmbeddings()
+    CassetteEmbeddings(fake, str(tmp_path), "record").embed_documents(["FTP", "CHO/h", "FTP"])
+    CassetteEmbeddings(fake, str(tmp_path), "record").embed_documents(["FTP", "VO2max"])
+
+    assert len((tmp_path / "embeddings.keys").read_text().split()) == 3
+    assert os.path.getsize(tmp_path / "embeddings.f32") == 3 * 1 * 4  # float32, sin JSON
+    replay = CassetteEmbeddings(fake, str(tmp_path), "replay")
+    assert replay.embed_documents(["VO2max", "FTP", "CHO/h"]) == [[6.0], [3.0], [5.0]]
+
+
+def test_un_cassette_que_falta_hace_fallar_la_evaluacion(tmp_path, monkeypatch):
+    # El juez recurre a los evaluadores individuales ante respuestas malformadas,
+    # pero no ante un fallo de cassette: en CI (replay) la evaluación debe fallar
+    monkeypatch.setenv("LLM_CASSETTE_MODE", "replay")
+    install_llm_cassette(str(tmp_path))
+    individuales = []
+
+    async def individual(*args):
+        individuales.append(args)
+
+    judge = MultiCriteriaJudge(FakeListChatModel(responses=["{}"]), {"correctness": "…"}, fallback=individual)
+    with pytest.raises(CassetteMissError):
+        asyncio.run(judge("¿P?", "respuesta", "referencia"))
+    assert individuales == []
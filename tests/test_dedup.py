@@ -0,0 +1,84 @@
+# tests/test_dedup.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.documents import Document
+
+from app.dedup import ChunkDeduplicator
+from app.rag_pipeline import split_by_file
+
+PASAJE = (
+    "El principio de sobrecarga establece que el estímulo de entrenamiento debe superar el umbral "
+    "habitual del deportista para provocar adaptaciones. La progresión gradual de la carga, junto "
+    "con periodos de recuperación suficientes, permite la supercompensación y evita el sobreentrenamiento. "
+    "La individualización ajusta volumen e intensidad a la edad, el nivel y los objetivos de cada atleta."
+)
+OTRO = (
+    "La hidratación durante pruebas largas depende de la tasa de sudoración, la temperatura ambiente "
+    "y la duración del esfuerzo; conviene ensayar la estrategia de bebida en los entrenamientos clave."
+)
+
+
+def chunk(texto, fuente="data/pdfs/a.pdf"):
+    return Document(page_content=texto, metadata={"source": fuente})
+
+
+def test_descarta_duplicados_exactos_y_casi_duplicados():
+    dedup = ChunkDeduplicator()
+    assert not dedup.is_duplicate(chunk(PASAJE))
+    assert dedup.is_duplicate(chunk("  " + PASAJE.upper() + "  "))           # mismo texto normalizado
+    assert dedup.is_duplicate(chunk(PASAJE.replace("gradual", "paulatina")))  # casi idéntico
+    assert not dedup.is_duplicate(chunk(OTRO))
+
+    stats = dedup.stats()
+    assert stats["chunks_in"] == 4 and stats["chunks_removed"] == 2
+    assert stats["exact_duplicates"] == 1 and stats["near_duplicates"] == 1
+    assert stats["tokens_saved"] > 0
+
+
+def test_quita_lineas_repetidas_sin_modificar_las_paginas_originales():
+    paginas = [
+        chunk(f"Revista de Ciencias del Deporte, Vol. 3\n{texto}\nPágina {i}")
+        for i, texto in enumerate([PASAJE, OTRO, "Tabla de cargas semanales", "Conclusiones"], start=1)
+    ]
+    limpias = ChunkDeduplicator().strip_boilerplate(paginas)
+
+    assert [p.page_content for p in limpias] == [PASAJE, OTRO, "Tabla de cargas semanales", "Conclusiones"]
+    assert paginas[0].page_content.startswith("Revista")
+
+
+def test_split_by_file_descarta_el_archivo_repetido_y_ajusta_el_manifest():
+    docs_by_file = {
+        "a.pdf": [chunk(PASAJE, "data/pdfs/a.pdf"), chunk(OTRO, "data/pdfs/a.pdf")],
+        "copia.pdf": [chunk(PASAJE, "data/pdfs/copia.pdf")],
+    }
+    hashes = {"a.pdf": "a" * 64, "copia.pdf": "c" * 64}
+    dedup = ChunkDeduplicator()
+
+    chunks, ids, entries, n_docs = split_by_file(docs_by_file, hashes, 512, 50, dedup)
+
+    assert n_docs == 3
+    assert len(chunks) == len(ids) == 2
+    assert entries["copia.pdf"]["chunk_ids"] == []
+    assert entries["copia.pdf"]["duplicates_of"] == ["a.pdf"]
+    assert "duplicates_of" not in entries["a.pdf"]
+    assert entries["a.pdf"]["chunk_ids"] == ids
+    assert dedup.stats()["chunks_removed"] == 1
+
+    sin_dedup, _, _, _ = split_by_file(docs_by_file, hashes, 512, 50)
+    assert len(sin_dedup) == 3
+
+
+def test_recuerda_que_archivo_conserva_cada_duplicado():
+    dedup = ChunkDeduplicator()
+    dedup.seed([chunk(PASAJE, "data/pdfs/a.pdf")])  # ya indexado
+    assert dedup.is_duplicate(chunk(PASAJE.replace("gradual", "paulatina"), "data/pdfs/copia.pdf"))
+    assert not dedup.is_duplicate(chunk(OTRO, "data/pdfs/copia.pdf"))
+    assert dedup.is_duplicate(chunk(OTRO, "data/pdfs/copia.pdf"))  # repetido dentro del mismo archivo
+
+    assert dedup.duplicates_of("copia.pdf") == ["a.pdf"]
+    assert dedup.duplicates_of("a.pdf") == []
+    assert dedup.stats()["chunks_in"] == 3
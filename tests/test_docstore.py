@@ -0,0 +1,116 @@
+# tests/test_docstore.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import faiss
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from app.benchmark import fake_embeddings
+from app.bm25 import BM25Index, build_from_vectorstore
+from app.docstore import DOCSTORE_FILE, INDEX_FILE, SQLiteDocstore, iter_documents, read_index_mmap, write_docstore
+from app.rag_pipeline import load_vectorstore_from_disk, persist_vectorstore
+
+TEXTOS = [f"Bloque {i}: series de {i} minutos a ritmo de umbral" for i in range(12)]
+
+
+def indice_en_memoria():
+    docs = [Document(page_content=t, metadata={"source": "data/pdfs/a.pdf", "page": i}) for i, t in enumerate(TEXTOS)]
+    return FAISS.from_documents(docs, fake_embeddings(), ids=[f"c{i}" for i in range(len(docs))])
+
+
+def test_persistir_y_cargar_mapeado_devuelve_los_mismos_resultados(tmp_path):
+    vectordb = indice_en_memoria()
+    persist_vectorstore(vectordb, {}, 512, 50, str(tmp_path))
+
+    cargado = load_vectorstore_from_disk(str(tmp_path), embeddings=fake_embeddings())
+    assert isinstance(cargado.docstore, SQLiteDocstore)
+    assert cargado.index.ntotal == len(TEXTOS)
+    assert cargado.index_to_docstore_id == vectordb.index_to_docstore_id
+
+    for consulta in (TEXTOS[3], "ritmo de umbral"):
+        esperado = vectordb.similarity_search(consulta, k=4)
+        obtenido = cargado.similarity_search(consulta, k=4)
+        assert [d.id for d in obtenido] == [d.id for d in esperado]
+        assert [d.page_content for d in obtenido] == [d.page_content for d in esperado]
+        assert obtenido[0].metadata == esperado[0].metadata
+
+
+def test_docstore_de_solo_lectura_no_admite_escrituras(tmp_path):
+    write_docstore(indice_en_memoria(), str(tmp_path))
+    docstore = SQLiteDocstore(os.path.join(tmp_path, DOCSTORE_FILE))
+    assert docstore.search("c5").page_content == TEXTOS[5]
+    assert docstore.search("nada") == "ID nada not found."
+    assert set(docstore.mget(["c1", "c2", "nada"])) == {"c1", "c2"}
+    with pytest.raises(Exception):
+        docstore.delete(["c1"])
+
+
+def test_docstore_escribible_anade_borra_y_fija_posiciones(tmp_path):
+    db_path = os.path.join(tmp_path, "building.sqlite")
+    docstore = SQLiteDocstore(db_path, writable=True)
+    vectordb = FAISS(embedding_function=fake_embeddings(), index=faiss.IndexFlatL2(1536),
+                     docstore=docstore, index_to_docstore_id={})
+    vectordb.add_texts(TEXTOS[:6], ids=[f"c{i}" for i in range(6)])
+    vectordb.delete(["c1", "c4"])
+    vectordb.add_texts(TEXTOS[6:8], ids=["c6", "c7"])
+
+    publicado = docstore.finalize(vectordb.index_to_docstore_id, os.path.join(tmp_path, DOCSTORE_FILE))
+    assert publicado == os.path.join(tmp_path, DOCSTORE_FILE) and not os.path.exists(db_path)
+
+    lector = SQLiteDocstore(publicado)
+    assert lector.index_mapping() == {0: "c0", 1: "c2", 2: "c3", 3: "c5", 4: "c6", 5: "c7"}
+    assert len(lector) == 6 and lector.search("c1") == "ID c1 not found."
+    assert lector.search("c6").page_content == TEXTOS[6]
+
+
+def test_avisa_si_faiss_no_puede_mapear_el_indice_plano(tmp_path, monkeypatch):
+    faiss.write_index(indice_en_memoria().index, os.path.join(tmp_path, INDEX_FILE))
+    monkeypatch.delattr(faiss, "IO_FLAG_MMAP_IFC", raising=False)
+    with pytest.warns(RuntimeWarning, match="RAM"):
+        index = read_index_mmap(os.path.join(tmp_path, INDEX_FILE))
+    assert index.ntotal == len(TEXTOS)
+
+
+@pytest.mark.parametrize("spec", ["Flat", "HNSW16"])
+def test_republicar_no_reescribe_los_indices_mapeados(tmp_path, spec):
+    vectordb = indice_en_memoria()
+    persist_vectorstore(vectordb, {}, 512, 50, str(tmp_path), index_spec=spec)
+    lector = load_vectorstore_from_disk(str(tmp_path), embeddings=fake_embeddings())
+    inodos = {f: os.stat(tmp_path / f).st_ino for f in os.listdir(tmp_path) if f.endswith(".faiss")}
+
+    # Una reconstrucción con el lector abierto publica archivos nuevos (os.replace)
+    persist_vectorstore(indice_en_memoria(), {}, 512, 50, str(tmp_path), index_spec=spec)
+    assert all(os.stat(tmp_path / f).st_ino != inodo for f, inodo in inodos.items())
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp") or f.startswith(".save-")]
+    assert lector.similarity_search(TEXTOS[3], k=1)[0].id == "c3"
+
+
+def test_copia_de_un_docstore_publicado(tmp_path):
+    publicado = write_docstore(indice_en_memoria(), str(tmp_path))
+    copia = SQLiteDocstore(os.path.join(tmp_path, "building.sqlite"), writable=True)
+    copia.copy_from(publicado)
+
+    assert len(copia) == len(TEXTOS)
+    assert copia.index_mapping() == SQLiteDocstore(publicado).index_mapping()
+    copia.delete(["c0"])
+    assert len(SQLiteDocstore(publicado)) == len(TEXTOS)
+
+
+def test_recorrido_por_paginas_y_bm25_sin_cargar_el_docstore(tmp_path):
+    vectordb = indice_en_memoria()
+    persist_vectorstore(vectordb, {}, 512, 50, str(tmp_path))
+    cargado = load_vectorstore_from_disk(str(tmp_path), embeddings=fake_embeddings())
+
+    paginado = list(cargado.docstore.iter_documents(page_size=5))
+    assert [p for p, _ in paginado] == list(range(len(TEXTOS)))
+    assert [d.page_content for _, d in paginado] == [d.page_content for _, d in iter_documents(vectordb)] == TEXTOS
+
+    desde_sqlite = build_from_vectorstore(cargado)
+    en_memoria = BM25Index.build([f"c{i}" for i in range(len(TEXTOS))], TEXTOS)
+    assert desde_sqlite.ids.tolist() == en_memoria.ids.tolist()
+    assert desde_sqlite.search("ritmo de umbral 7", k=3) == en_memoria.search("ritmo de umbral 7", k=3)
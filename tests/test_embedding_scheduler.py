@@ -0,0 +1,121 @@
+# tests/test_embedding_scheduler.py
+
+import os
+import sys
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+import openai
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.embedding_scheduler import EmbeddingScheduler, TokenBucket, is_retryable
+
+
+def error_http(cls, status):
+    respuesta = httpx.Response(status, request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+    return cls(f"{status}", response=respuesta, body=None)
+
+
+class StubEmbeddings(Embeddings):
+    """Servidor de embeddings en proceso: falla la primera llamada y mide concurrencia."""
+
+    def __init__(self):
+        self.llamadas = 0
+        self.en_vuelo = 0
+        self.max_en_vuelo = 0
+        self.bucles = set()
+
+    def embed_documents(self, texts):
+        return [[float(t)] for t in texts]
+
+    def embed_query(self, text):
+        return [float(text)]
+
+    async def aembed_documents(self, texts):
+        self.llamadas += 1
+        self.bucles.add(id(asyncio.get_running_loop()))
+        if self.llamadas == 1:
+            raise error_http(openai.RateLimitError, 429)
+        self.en_vuelo += 1
+        self.max_en_vuelo = max(self.max_en_vuelo, self.en_vuelo)
+        await asyncio.sleep(0.01)
+        self.en_vuelo -= 1
+        return self.embed_documents(texts)
+
+
+def test_lotes_en_orden_con_reintento_y_concurrencia_acotada():
+    stub = StubEmbeddings()
+    scheduler = EmbeddingScheduler(stub, batch_size=3, max_concurrency=2, backoff_base=0.001)
+    textos = [str(i) for i in range(10)]
+
+    vectores = scheduler.embed(textos)
+
+    assert vectores == [[float(i)] for i in range(10)]
+    assert stub.max_en_vuelo <= 2
+    stats = scheduler.stats()
+    assert stats["batches"] == 4
+    assert stats["retries"] == 1
+    assert stats["chunks_per_sec"] > 0
+
+
+def test_las_llamadas_sincronas_comparten_un_bucle_de_larga_vida():
+    # El cliente asíncrono de OpenAI guarda conexiones atadas a su bucle
+    stub = StubEmbeddings()
+    scheduler = EmbeddingScheduler(stub, batch_size=2, backoff_base=0.001)
+    for _ in range(4):
+        assert scheduler.embed(["1", "2", "3"]) == [[1.0], [2.0], [3.0]]
+    assert len(stub.bucles) == 1
+    assert scheduler.stats()["retries"] == 1  # solo el 429 inicial
+
+
+def test_llamada_sincrona_desde_un_bucle_activo():
+    # p. ej. un handler ASGI: el bucle del llamador queda bloqueado, no se anida
+    stub = StubEmbeddings()
+    scheduler = EmbeddingScheduler(stub, backoff_base=0.001)
+
+    async def handler():
+        return scheduler.embed(["4", "5"])
+
+    assert asyncio.run(handler()) == [[4.0], [5.0]]
+
+
+@pytest.mark.parametrize("error, reintenta", [
+    (error_http(openai.RateLimitError, 429), True),
+    (openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com")), True),
+    (openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com")), True),
+    (TimeoutError(), True),
+    (error_http(openai.AuthenticationError, 401), False),
+    (error_http(openai.BadRequestError, 400), False),
+    (ValueError("entrada inválida"), False),
+])
+def test_solo_se_reintentan_los_errores_transitorios(error, reintenta):
+    assert is_retryable(error) == reintenta
+
+
+def test_un_error_de_autenticacion_falla_sin_reintentos():
+    class SinClave(StubEmbeddings):
+        async def aembed_documents(self, texts):
+            self.llamadas += 1
+            raise error_http(openai.AuthenticationError, 401)
+
+    stub = SinClave()
+    scheduler = EmbeddingScheduler(stub, backoff_base=0.001)
+    with pytest.raises(openai.AuthenticationError):
+        scheduler.embed(["1"])
+    assert stub.llamadas == 1 and scheduler.stats()["retries"] == 0
+
+
+def test_token_bucket_espera_cuando_se_agota_el_presupuesto():
+    ahora = [0.0]
+    bucket = TokenBucket(requests_per_minute=60, tokens_per_minute=600, clock=lambda: ahora[0])
+
+    assert bucket.wait_time(600) == 0
+    bucket.request_budget -= 1
+    bucket.token_budget -= 600
+    assert bucket.wait_time(300) == 30.0
+
+    ahora[0] = 30.0
+    assert bucket.wait_time(300) == 0
@@ -0,0 +1,63 @@
+# tests/test_evaluate_dataset.py
+
+import os
+import sys
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from app.run_eval import evaluate_dataset
+
+
+class Concurrencia:
+    """Cadena y juez falsos que cuentan las preguntas en curso (respuesta + juicio)."""
+
+    def __init__(self, n):
+        self.n = n
+        self.en_curso = 0
+        self.maximo = 0
+
+    async def ainvoke(self, inputs, config=None):
+        self.en_curso += 1
+        self.maximo = max(self.maximo, self.en_curso)
+        numero = int(inputs["question"].split()[-1])
+        await asyncio.sleep(0.005 * (self.n - numero))  # las últimas terminan antes
+        return {"answer": f"respuesta {numero}"}
+
+    async def grader(self, question, answer, reference):
+        await asyncio.sleep(0.001)
+        self.en_curso -= 1
+        return {
+            "qa_verdict": "CORRECT" if answer.endswith(reference) else "INCORRECT",
+            "qa_score": 1.0,
+            "crit_scores": {"relevance": 1.0},
+            "crit_values": {"relevance": "ok"},
+            "judge_tokens": 0,
+        }
+
+
+def dataset(n):
+    return [{"question": f"pregunta {i}", "answer": str(i)} for i in range(1, n + 1)]
+
+
+def test_resultados_en_el_orden_del_dataset_aunque_terminen_desordenados():
+    cadena = Concurrencia(6)
+    results = asyncio.run(evaluate_dataset(dataset(6), cadena, cadena.grader, concurrency=6))
+
+    assert [r["idx"] for r in results] == [1, 2, 3, 4, 5, 6]
+    assert [r["answer"] for r in results] == [f"respuesta {i}" for i in range(1, 7)]
+    assert all(r["qa_verdict"] == "CORRECT" for r in results)
+    assert cadena.maximo == 6
+    assert all(r["latency_s"] >= r["answer_s"] >= 0 for r in results)
+
+
+@pytest.mark.parametrize("concurrency, esperado", [(2, 2), (3, 3), (1, 1), (0, 1)])
+def test_el_semaforo_limita_las_preguntas_en_paralelo(concurrency, esperado):
+    cadena = Concurrencia(7)
+    results = asyncio.run(evaluate_dataset(dataset(7), cadena, cadena.grader, concurrency=concurrency))
+
+    assert len(results) == 7
+    assert cadena.maximo == esperado
+    assert cadena.en_curso == 0
@@ -0,0 +1,67 @@
+# tests/test_history.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain.chains.conversational_retrieval.base import _get_chat_history
+
+from app.embedding_scheduler import estimate_tokens
+from app.history import ChatHistory, needs_history
+
+
+class FakeSummarizer:
+    def __init__(self):
+        self.llamadas = []
+
+    def __call__(self, summary, turns):
+        self.llamadas.append(len(turns))
+        return (summary + " " + " / ".join(q for q, _ in turns)).strip()[-400:]
+
+
+def test_preguntas_autonomas_no_necesitan_historial():
+    assert not needs_history("¿Cuántos gramos de carbohidratos por hora necesito en una salida de 4 h?")
+    assert needs_history("¿Y en carrera?")
+    assert needs_history("¿Puedo hacer eso también en la semana de descarga?")
+
+
+def test_primer_turno_sin_historial():
+    history = ChatHistory(summarizer=FakeSummarizer())
+    assert history.for_question("¿Y eso?") == []
+
+
+def test_ventana_y_resumen():
+    summarizer = FakeSummarizer()
+    history = ChatHistory(summarizer=summarizer, max_turns=2, token_budget=10_000)
+    for i in range(5):
+        history.add(f"pregunta {i}", f"respuesta {i}")
+
+    assert len(history) == 5
+    assert [q for q, _ in history.window] == ["pregunta 3", "pregunta 4"]
+    assert "pregunta 0" in history.summary and "pregunta 2" in history.summary
+    assert summarizer.llamadas == [1, 1, 1]
+    assert history.messages()[0].type == "system"
+
+
+def test_clear_reinicia_turnos_resumen_y_contador():
+    history = ChatHistory(summarizer=FakeSummarizer(), max_turns=1, token_budget=10_000)
+    for i in range(3):
+        history.add(f"pregunta {i}", f"respuesta {i}")
+    assert history.n_summaries == 2
+
+    history.clear()
+    assert len(history) == 0 and history.summary == "" and history.n_summaries == 0
+    history.add("pregunta nueva", "respuesta nueva")
+    assert history.window == [("pregunta nueva", "respuesta nueva")] and history.n_summaries == 0
+
+
+def test_tokens_por_turno_acotados():
+    history = ChatHistory(summarizer=FakeSummarizer(), max_turns=4, token_budget=400, turn_tokens=150)
+    sizes = []
+    for i in range(30):
+        history.add(f"pregunta larga {i} " * 20, "respuesta muy detallada " * 200)
+        sizes.append(estimate_tokens(_get_chat_history(history.for_question("¿Y eso?"))))
+    # El texto enviado a la condensación deja de crecer con la sesión
+    assert max(sizes[5:]) <= 400 + 150
+    assert max(sizes[10:]) == max(sizes[20:])
@@ -0,0 +1,34 @@
+# tests/test_import_time.py
+
+import os
+import sys
+import warnings
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.import_time import (
+    IMPORT_BUDGET_MS, LAZY_MODULES, SERVING_MODULES, eager_lazy_modules, format_report, import_report, total_ms,
+)
+
+
+def test_ruta_de_servicio_sin_dependencias_de_ingesta_ni_metricas():
+    report = import_report(SERVING_MODULES)
+    assert eager_lazy_modules(report) == [], format_report(report)
+
+
+def test_importacion_dentro_del_presupuesto():
+    # Tiempo de reloj: solo es un fallo si el entorno fija IMPORT_BUDGET_MS (CI, con margen
+    # para runners lentos); en local se informa sin fallar
+    report = import_report(SERVING_MODULES)
+    total = total_ms(report)
+    if "IMPORT_BUDGET_MS" in os.environ:
+        assert total < IMPORT_BUDGET_MS, format_report(report)
+    elif total >= IMPORT_BUDGET_MS:
+        warnings.warn(f"Importación de la ruta de servicio: {total:.0f} ms (presupuesto {IMPORT_BUDGET_MS:.0f} ms)\n"
+                      + format_report(report))
+
+
+def test_los_modulos_perezosos_se_cargan_al_usarlos():
+    # Sanidad del informe: la evaluación sí necesita mlflow
+    report = import_report(["app.run_eval"])
+    assert "mlflow" in report and "mlflow" in LAZY_MODULES
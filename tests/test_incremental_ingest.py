@@ -0,0 +1,185 @@
+# tests/test_incremental_ingest.py
+
+import os
+import sys
+import shutil
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import mlflow
+import pytest
+from langchain_core.embeddings import Embeddings
+
+import app.cache
+from app.benchmark import fake_embeddings
+from app.rag_pipeline import duplicate_dependents, load_manifest, load_vectorstore_from_disk, save_vectorstore
+
+PDFS = os.path.join(os.path.dirname(__file__), "..", "data", "pdfs")
+CORTO = "EstructuraSesion_cas.pdf"  # 3 páginas, 21 chunks con 512/50
+OTRO = "672971121007.pdf"           # 9 páginas, 108 chunks
+
+
+class EmbeddingsContados(Embeddings):
+    """Embeddings falsos que anotan cada texto enviado a embeber."""
+
+    textos = []
+
+    def __init__(self):
+        self.inner = fake_embeddings()
+
+    def embed_documents(self, texts):
+        EmbeddingsContados.textos.extend(texts)
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.inner.embed_query(text)
+
+
+@pytest.fixture
+def entorno(tmp_path, monkeypatch):
+    # Sin red ni artefactos en el repo: embeddings falsos, caché y MLflow en tmp_path
+    monkeypatch.setattr("langchain_openai.OpenAIEmbeddings", EmbeddingsContados)
+    monkeypatch.setattr(EmbeddingsContados, "textos", [])
+    monkeypatch.setattr("app.cache.EMBEDDING_CACHE_PATH", "")
+    monkeypatch.chdir(tmp_path)  # artefactos de MLflow (./mlruns)
+    previo = mlflow.get_tracking_uri()
+    mlflow.set_tracking_uri(f"sqlite:///{tmp_path / 'mlflow.db'}")
+    (tmp_path / "pdfs").mkdir()
+    yield tmp_path
+    mlflow.set_tracking_uri(previo)
+
+
+def copiar(entorno, origen, destino=None, sufijo=b""):
+    # `sufijo` tras %%EOF: mismo texto, otro sha256
+    destino = entorno / "pdfs" / (destino or origen)
+    shutil.copy(os.path.join(PDFS, origen), destino)
+    with open(destino, "ab") as f:
+        f.write(sufijo)
+
+
+def construir(entorno, **kwargs):
+    # Caché de embeddings nueva en cada construcción: todo lo que se embebe llega a EmbeddingsContados
+    EmbeddingsContados.textos.clear()
+    app.cache.EMBEDDING_CACHE_PATH = str(entorno / f"embeddings-{len(os.listdir(entorno))}.sqlite")
+    save_vectorstore(persist_path=str(entorno / "vs"), path=str(entorno / "pdfs"), **kwargs)
+    manifest = load_manifest(str(entorno / "vs"))
+    vectordb = load_vectorstore_from_disk(str(entorno / "vs"), embeddings=fake_embeddings())
+    return manifest, vectordb
+
+
+def ids_indexados(vectordb):
+    return set(vectordb.index_to_docstore_id.values())
+
+
+def test_dependientes_de_duplicados_en_cadena():
+    previo = {
+        "a.pdf": {"chunk_ids": []},
+        "b.pdf": {"chunk_ids": [], "duplicates_of": ["a.pdf"]},
+        "c.pdf": {"chunk_ids": [], "duplicates_of": ["b.pdf"]},
+        "d.pdf": {"chunk_ids": []},
+    }
+    assert duplicate_dependents(previo, ["a.pdf"]) == {"b.pdf", "c.pdf"}
+    assert duplicate_dependents(previo, ["d.pdf"]) == set()
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_borrar_el_archivo_que_conservaba_los_duplicados_reindexa_la_copia(entorno, streaming):
+    copiar(entorno, CORTO, "a.pdf")
+    copiar(entorno, CORTO, "copia.pdf", sufijo=b"\n% copia\n")
+    manifest, vectordb = construir(entorno, dedup=True, streaming=streaming)
+    originales = manifest["files"]["a.pdf"]["chunk_ids"]
+    assert manifest["files"]["copia.pdf"]["chunk_ids"] == []
+    assert manifest["files"]["copia.pdf"]["duplicates_of"] == ["a.pdf"]
+    assert ids_indexados(vectordb) == set(originales)
+
+    os.remove(entorno / "pdfs" / "a.pdf")
+    manifest, vectordb = construir(entorno, dedup=True, streaming=streaming, incremental=True)
+
+    copia = manifest["files"]["copia.pdf"]
+    assert set(manifest["files"]) == {"copia.pdf"}
+    assert len(copia["chunk_ids"]) == len(originales) and "duplicates_of" not in copia
+    assert ids_indexados(vectordb) == set(copia["chunk_ids"])
+    assert not ids_indexados(vectordb) & set(originales)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_copias_identicas_con_otro_nombre_sin_dedup(entorno, streaming):
+    copiar(entorno, CORTO, "a.pdf")
+    copiar(entorno, CORTO, "b.pdf")
+    manifest, vectordb = construir(entorno, dedup=False, streaming=streaming)
+
+    a, b = manifest["files"]["a.pdf"]["chunk_ids"], manifest["files"]["b.pdf"]["chunk_ids"]
+    assert len(a) == len(b) == 21 and not set(a) & set(b)
+    assert ids_indexados(vectordb) == set(a) | set(b)
+
+    # Otra copia más en una construcción incremental
+    copiar(entorno, CORTO, "c.pdf")
+    manifest, vectordb = construir(entorno, dedup=False, streaming=streaming, incremental=True)
+    c = manifest["files"]["c.pdf"]["chunk_ids"]
+    assert len(c) == 21 and ids_indexados(vectordb) == set(a) | set(b) | set(c)
+    assert len(EmbeddingsContados.textos) == 21  # solo se embebe la copia nueva
+
+
+def ids_de(manifest, file):
+    return manifest["files"][file]["chunk_ids"]
+
+
+def test_sin_cambios_no_se_vuelve_a_embeber_nada(entorno):
+    copiar(entorno, CORTO)
+    copiar(entorno, OTRO)
+    antes, _ = construir(entorno)
+    assert len(EmbeddingsContados.textos) == len(ids_de(antes, CORTO)) + len(ids_de(antes, OTRO))
+
+    despues, vectordb = construir(entorno, incremental=True)
+    assert EmbeddingsContados.textos == []
+    assert despues["files"] == antes["files"]
+    assert ids_indexados(vectordb) == set(ids_de(antes, CORTO)) | set(ids_de(antes, OTRO))
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_archivo_modificado_cambia_sus_ids_y_solo_se_embebe_el(entorno, streaming):
+    copiar(entorno, CORTO)
+    copiar(entorno, OTRO)
+    antes, _ = construir(entorno, streaming=streaming)
+
+    copiar(entorno, CORTO, sufijo=b"\n% revisado\n")
+    despues, vectordb = construir(entorno, streaming=streaming, incremental=True)
+
+    viejos, nuevos = set(ids_de(antes, CORTO)), set(ids_de(despues, CORTO))
+    assert nuevos and not viejos & nuevos
+    assert len(EmbeddingsContados.textos) == len(nuevos)
+    assert ids_de(despues, OTRO) == ids_de(antes, OTRO)
+    assert ids_indexados(vectordb) == nuevos | set(ids_de(antes, OTRO))
+    assert vectordb.index.ntotal == len(vectordb.index_to_docstore_id)
+
+
+def test_archivo_borrado_sale_del_indice_y_del_manifest(entorno):
+    copiar(entorno, CORTO)
+    copiar(entorno, OTRO)
+    antes, _ = construir(entorno)
+
+    os.remove(entorno / "pdfs" / CORTO)
+    despues, vectordb = construir(entorno, incremental=True)
+
+    assert EmbeddingsContados.textos == []
+    assert set(despues["files"]) == {OTRO}
+    assert ids_indexados(vectordb) == set(ids_de(antes, OTRO))
+    assert [d.metadata["source_file"] for d in vectordb.similarity_search("sesión", k=5)] == [OTRO] * 5
+
+
+@pytest.mark.parametrize("cambio, esperado", [
+    ({"chunk_size": 300}, {"chunk_size": 300, "dedup": True}),
+    ({"chunk_overlap": 0}, {"chunk_overlap": 0, "dedup": True}),
+    ({"dedup": False}, {"chunk_size": 512, "dedup": False}),
+])
+def test_otra_configuracion_de_troceo_o_dedup_invalida_el_manifest(entorno, cambio, esperado):
+    copiar(entorno, CORTO)
+    antes, _ = construir(entorno, dedup=True)
+
+    despues, vectordb = construir(entorno, **{"dedup": True, **cambio}, incremental=True)
+
+    # Reconstrucción completa: se vuelve a embeber todo el corpus con la nueva configuración
+    assert len(EmbeddingsContados.textos) == len(ids_de(despues, CORTO)) == vectordb.index.ntotal
+    assert {key: despues[key] for key in esperado} == esperado
+    if "chunk_size" in cambio:
+        assert ids_de(despues, CORTO) != ids_de(antes, CORTO)
@@ -0,0 +1,158 @@
+# tests/test_judge.py
+
+import os
+import sys
+import json
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from app.cache import SQLiteCache
+from app.judge import CachedGrader, MultiCriteriaJudge, parse_judgement
+
+CRITERIA = {"correctness": "…", "relevance": "…", "toxicity": "…"}
+
+
+def test_parse_json_con_bloque_de_codigo_y_puntuaciones_fuera_de_rango():
+    text = "```json\n" + json.dumps({
+        "qa_verdict": "correct",
+        "scores": {
+            "correctness": {"score": 8, "reasoning": "Coincide con la referencia"},
+            "relevance": {"score": "12"},
+            "toxicity": 1,
+        },
+    }) + "\n```"
+
+    parsed = parse_judgement(text, CRITERIA)
+
+    assert parsed["qa_verdict"] == "CORRECT"
+    assert parsed["scores"] == {"correctness": 8.0, "relevance": 10.0, "toxicity": 1.0}
+    assert parsed["values"]["correctness"] == "Coincide con la referencia"
+
+
+def test_parse_devuelve_solo_criterios_validos():
+    text = 'Evaluación: {"qa_verdict": "QUIZÁS", "scores": {"correctness": "n/a", "relevance": 6}}'
+
+    parsed = parse_judgement(text, CRITERIA)
+
+    assert parsed["qa_verdict"] is None
+    assert parsed["scores"] == {"relevance": 6.0}
+
+
+def test_parse_sin_json_lanza_error():
+    with pytest.raises(ValueError):
+        parse_judgement("Rating: [[7]]", CRITERIA)
+
+
+@pytest.mark.parametrize("text", [
+    '{"qa_verdict": "CORRECT", "scores": [8, 7, 1]}',
+    '{"qa_verdict": "CORRECT", "scores": "todo bien"}',
+])
+def test_parse_con_scores_que_no_son_objeto_lanza_error(text):
+    with pytest.raises(ValueError):
+        parse_judgement(text, CRITERIA)
+
+
+class JuezFalso:
+    def __init__(self, respuesta):
+        self.respuesta = respuesta
+
+    async def ainvoke(self, messages):
+        return AIMessage(content=self.respuesta)
+
+
+@pytest.mark.parametrize("respuesta", [
+    '{"qa_verdict": "CORRECT", "scores": ["correctness", 9]}',
+    '["CORRECT", {"correctness": 9}]',
+    "No puedo evaluar esta respuesta.",
+])
+def test_respuesta_malformada_recurre_a_los_evaluadores_individuales(respuesta):
+    llamadas = []
+
+    async def individual(question, prediction, reference, names, with_qa):
+        llamadas.append((list(names), with_qa))
+        return {
+            "qa_verdict": "INCORRECT",
+            "crit_scores": {name: 0.7 for name in names},
+            "crit_values": {name: "individual" for name in names},
+            "judge_tokens": 5,
+        }
+
+    judge = MultiCriteriaJudge(JuezFalso(respuesta), CRITERIA, fallback=individual)
+    result = asyncio.run(judge("¿Pregunta?", "respuesta", "referencia"))
+
+    assert llamadas == [(list(CRITERIA), True)]
+    assert judge.n_fallbacks == 1
+    assert result["qa_verdict"] == "INCORRECT" and result["qa_score"] == 0.0
+    assert result["crit_scores"] == pytest.approx({name: 0.7 for name in CRITERIA})
+    assert result["crit_values"]["toxicity"] == "individual"
+
+
+class EvaluadorContado:
+    def __init__(self, *resultados):
+        self.resultados = list(resultados)
+        self.llamadas = 0
+
+    async def __call__(self, question, prediction, reference):
+        self.llamadas += 1
+        return self.resultados[min(self.llamadas, len(self.resultados)) - 1]
+
+
+def juicio(verdict="CORRECT", failed=()):
+    return {
+        "qa_score": 1.0 if verdict == "CORRECT" else 0.0,
+        "qa_verdict": verdict,
+        "crit_scores": {name: 0.8 for name in CRITERIA},
+        "crit_values": {name: "ok" for name in CRITERIA},
+        "judge_tokens": 10,
+        "judge_failed": list(failed),
+    }
+
+
+def con_cache(tmp_path, evaluador, **kwargs):
+    cache = SQLiteCache(os.path.join(tmp_path, "judge.sqlite"), table="judgements")
+    return CachedGrader(evaluador, CRITERIA, "gpt-4o:multi", cache=cache, **kwargs)
+
+
+def test_cache_del_juez_acierto_y_fallo(tmp_path):
+    evaluador = EvaluadorContado(juicio())
+    grader = con_cache(tmp_path, evaluador)
+
+    primero = asyncio.run(grader("¿P?", "respuesta", "referencia"))
+    segundo = asyncio.run(grader("¿P?", "respuesta", "referencia"))
+    asyncio.run(grader("¿P?", "otra respuesta", "referencia"))
+
+    assert evaluador.llamadas == 2
+    assert segundo["judge_cached"] and segundo["judge_tokens"] == 0
+    assert segundo["crit_scores"] == primero["crit_scores"]
+    assert segundo["qa_verdict"] == "CORRECT"
+
+
+def test_cambiar_el_prompt_del_juez_invalida_la_cache(tmp_path):
+    evaluador = EvaluadorContado(juicio())
+    asyncio.run(con_cache(tmp_path, evaluador)("¿P?", "respuesta", "referencia"))
+    asyncio.run(con_cache(tmp_path, evaluador, prompt_hash="prompt-editado")("¿P?", "respuesta", "referencia"))
+    assert evaluador.llamadas == 2
+
+
+def test_no_se_cachean_veredictos_unknown_ni_criterios_fallidos(tmp_path):
+    evaluador = EvaluadorContado(juicio("UNKNOWN", failed=["toxicity"]), juicio())
+    grader = con_cache(tmp_path, evaluador)
+
+    asyncio.run(grader("¿P?", "respuesta", "referencia"))
+    segundo = asyncio.run(grader("¿P?", "respuesta", "referencia"))  # fallo transitorio: se reevalúa
+    tercero = asyncio.run(grader("¿P?", "respuesta", "referencia"))
+
+    assert evaluador.llamadas == 2
+    assert segundo["qa_verdict"] == "CORRECT" and "judge_cached" not in segundo
+    assert tercero["judge_cached"] and tercero["crit_scores"]["toxicity"] == 0.8
+
+
+def test_sin_respaldo_los_criterios_sin_puntuacion_quedan_marcados_como_fallidos():
+    judge = MultiCriteriaJudge(JuezFalso('{"scores": {"relevance": 7}}'), CRITERIA)
+    result = asyncio.run(judge("¿P?", "respuesta", "referencia"))
+    assert result["qa_verdict"] == "UNKNOWN"
+    assert result["judge_failed"] == ["correctness", "toxicity"]
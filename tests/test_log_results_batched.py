@@ -0,0 +1,89 @@
+# tests/test_log_results_batched.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import mlflow
+import pytest
+
+from app.run_eval import criteria, log_results_batched
+
+CONFIG = {"prompt_version": "v1_asistente_rrhh", "chunk_size": 512, "chunk_overlap": 50, "k": 4, "judge_mode": "multi"}
+
+
+@pytest.fixture
+def tracking(tmp_path, monkeypatch):
+    # MLflow aislado en tmp_path (base de datos y artefactos)
+    monkeypatch.chdir(tmp_path)
+    previo = mlflow.get_tracking_uri()
+    mlflow.set_tracking_uri(f"sqlite:///{tmp_path / 'mlflow.db'}")
+    mlflow.set_experiment("eval_test")
+    yield mlflow.tracking.MlflowClient()
+    mlflow.set_tracking_uri(previo)
+
+
+def resultados(n=3):
+    return [
+        {
+            "idx": i,
+            "question": f"¿Pregunta {i}?",
+            "answer": f"Respuesta {i}",
+            "qa_verdict": "CORRECT" if i % 2 else "INCORRECT",
+            "qa_score": float(i % 2),
+            "crit_scores": {crit: i / 10 for crit in criteria},
+            "crit_values": {crit: "ok" for crit in criteria},
+            "judge_tokens": 100 * i,
+            "judge_s": 0.1 * i,
+            "latency_s": 0.5 * i,
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def test_run_padre_con_agregados_tabla_y_runs_hijos(tracking):
+    results = resultados()
+    run_id = log_results_batched(results, elapsed=2.5, config=CONFIG, tags={"sweep_id": "s1"},
+                                 extra_metrics={"trace_retrieval_p50_s": 0.02})
+
+    parent = tracking.get_run(run_id)
+    assert parent.data.metrics["n_questions"] == 3
+    assert parent.data.metrics["qa_accuracy"] == pytest.approx(2 / 3)
+    assert parent.data.metrics["judge_tokens"] == 600
+    assert parent.data.metrics["eval_wall_s"] == 2.5
+    assert parent.data.metrics["trace_retrieval_p50_s"] == 0.02
+    assert parent.data.metrics["mean_relevance_score"] == pytest.approx(0.2)
+    assert parent.data.params == {key: str(value) for key, value in CONFIG.items()}
+    assert parent.data.tags["eval_parent"] == "true" and parent.data.tags["sweep_id"] == "s1"
+
+    tabla = mlflow.artifacts.load_dict(f"{parent.info.artifact_uri}/eval_results.json")
+    filas = [dict(zip(tabla["columns"], fila)) for fila in tabla["data"]]
+    assert [f["idx"] for f in filas] == [1, 2, 3]
+    assert [f["qa_verdict"] for f in filas] == ["CORRECT", "INCORRECT", "CORRECT"]
+    assert filas[1]["judge_tokens"] == 200
+
+    hijos = tracking.search_runs([parent.info.experiment_id],
+                                 filter_string=f"tags.mlflow.parentRunId = '{run_id}'")
+    assert len(hijos) == 3
+    por_id = {hijo.info.run_id: hijo for hijo in hijos}
+    for res in results:
+        hijo = por_id[res["run_id"]]
+        assert hijo.info.run_name == f"eval_q{res['idx']}"
+        assert hijo.info.status == "FINISHED"
+        assert hijo.data.params["question"] == res["question"]
+        assert hijo.data.metrics["qa_score"] == res["qa_score"]
+        assert hijo.data.tags["sweep_id"] == "s1"
+        assert hijo.data.tags["eval_reasoning"].splitlines() == [f"{crit}: ok" for crit in criteria]
+
+
+def test_sin_runs_hijos_ni_resultados(tracking, monkeypatch):
+    monkeypatch.setattr("app.run_eval.EVAL_NESTED_RUNS", False)
+    results = resultados(2)
+    run_id = log_results_batched(results, elapsed=1.0, config=CONFIG)
+
+    experiment_id = tracking.get_run(run_id).info.experiment_id
+    assert [r.info.run_id for r in tracking.search_runs([experiment_id])] == [run_id]
+    assert all("run_id" not in res for res in results)
+
+    assert log_results_batched([], elapsed=0.0, config=CONFIG) is None
@@ -0,0 +1,60 @@
+# tests/test_metrics_store.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pandas as pd
+
+from app.metrics_store import CRITERIA, frame_from_results, read_aggregates, read_results, write_results
+
+
+def resultados(qa_scores, chunk_size=512):
+    return [
+        {
+            "idx": i,
+            "question": f"pregunta {i}",
+            "qa_score": qa,
+            "crit_scores": {c: 0.5 for c in CRITERIA},
+            "judge_s": 1.0,
+            "judge_tokens": 100,
+        }
+        for i, qa in enumerate(qa_scores, start=1)
+    ]
+
+
+def test_escritura_tipada_y_agregados(tmp_path):
+    params = {"prompt_version": "v1", "chunk_size": 512, "chunk_overlap": 50, "judge_mode": "multi"}
+    write_results("eval_v1", frame_from_results(resultados([1.0, 0.0, 1.0, 1.0]), params, "padre1"), str(tmp_path))
+
+    otros = {**params, "chunk_size": 256}
+    total = write_results("eval_v1", frame_from_results(resultados([0.0, 0.0]), otros, "padre2"), str(tmp_path))
+    assert total == 6
+
+    results = read_results("eval_v1", str(tmp_path))
+    assert str(results["chunk_size"].dtype) == "int32"
+    assert results["result_id"].is_unique
+
+    agg = read_aggregates("eval_v1", str(tmp_path)).set_index(["chunk_size", "metric"])
+    assert agg.loc[(512, "qa_score"), "count"] == 4
+    assert agg.loc[(512, "qa_score"), "mean"] == 0.75
+    assert agg.loc[(256, "qa_score"), "mean"] == 0.0
+    assert agg.loc[(512, "correctness_score"), "p95"] == 0.5
+
+
+def test_reescribir_la_misma_ejecucion_no_duplica(tmp_path):
+    params = {"prompt_version": "v1", "chunk_size": 512, "chunk_overlap": 50}
+    frame = frame_from_results(resultados([1.0, 1.0]), params, "padre1")
+    write_results("eval_v1", frame, str(tmp_path))
+    assert write_results("eval_v1", frame, str(tmp_path)) == 2
+
+
+def test_razonamiento_desde_los_valores_del_juez(tmp_path):
+    res = resultados([1.0, 0.0])
+    res[0]["crit_values"] = {"correctness": "Cita el FTP correctamente", "toxicity": ""}
+    write_results("eval_v1", frame_from_results(res, {"prompt_version": "v1"}, "padre1"), str(tmp_path))
+
+    reasoning = read_results("eval_v1", str(tmp_path)).sort_values("question")["reasoning"].tolist()
+    assert reasoning[0] == "correctness: Cita el FTP correctamente"
+    assert pd.isna(reasoning[1])
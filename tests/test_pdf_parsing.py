@@ -0,0 +1,90 @@
+# tests/test_pdf_parsing.py
+
+import os
+import sys
+import time
+import signal
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from langchain_core.documents import Document
+
+from app.pdf_parsing import format_parse_report, parse_pdf, parse_pdfs
+
+PDFS = os.path.join(os.path.dirname(__file__), "..", "data", "pdfs")
+LARGO = os.path.join(PDFS, "1-Apunte-Entrenamiento-deportivo.pdf")  # 19 páginas
+CORTO = os.path.join(PDFS, "EstructuraSesion_cas.pdf")             # 3 páginas
+
+
+class CargadorLento:
+    """Sustituto de PyPDFLoader que tarda `segundos` en devolver una página."""
+
+    segundos = 5.0
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def load(self):
+        time.sleep(self.segundos)
+        return [Document(page_content="texto", metadata={"source": self.file_path, "page": 0})]
+
+
+def test_el_pool_de_procesos_conserva_el_orden_de_los_archivos():
+    paths = [LARGO, CORTO, LARGO]
+    secuencial, report_secuencial = parse_pdfs(paths, workers=1, timeout=None)
+    paralelo, report = parse_pdfs(paths, workers=3, timeout=None)
+
+    assert [(d.metadata["source"], d.metadata["page"]) for d in paralelo] == \
+           [(d.metadata["source"], d.metadata["page"]) for d in secuencial]
+    assert [e["file"] for e in report] == [os.path.basename(p) for p in paths]
+    assert [e["pages"] for e in report] == [e["pages"] for e in report_secuencial] == [19, 3, 19]
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGALRM"), reason="SIGALRM solo existe en POSIX")
+def test_timeout_por_archivo_con_sigalrm(monkeypatch):
+    monkeypatch.setattr("langchain_community.document_loaders.PyPDFLoader", CargadorLento)
+    docs, entry = parse_pdf("lento.pdf", timeout=0.2)
+
+    assert docs == [] and entry["status"] == "timeout" and entry["pages"] == 0
+    assert entry["seconds"] < 2
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)  # alarma desactivada al terminar
+
+
+def test_fuera_del_hilo_principal_avisa_y_parsea_sin_timeout(monkeypatch):
+    monkeypatch.setattr("langchain_community.document_loaders.PyPDFLoader", CargadorLento)
+    monkeypatch.setattr(CargadorLento, "segundos", 0.05)
+    resultado = {}
+
+    def en_hilo():
+        with pytest.warns(RuntimeWarning, match="SIGALRM"):
+            resultado["entry"] = parse_pdf("lento.pdf", timeout=0.01)[1]
+
+    hilo = threading.Thread(target=en_hilo)
+    hilo.start()
+    hilo.join()
+    assert resultado["entry"]["status"] == "ok" and resultado["entry"]["pages"] == 1
+
+
+def test_un_pdf_ilegible_se_omite_y_se_reporta(tmp_path):
+    roto = tmp_path / "roto.pdf"
+    roto.write_bytes(b"esto no es un PDF")
+    docs, report = parse_pdfs([str(roto), CORTO], workers=2, timeout=None)
+
+    assert [e["status"] for e in report] == ["error", "ok"]
+    assert report[0]["error"] and report[0]["pages"] == 0
+    assert {d.metadata["source"] for d in docs} == {CORTO}
+
+
+def test_informe_ordenado_por_tiempo_y_recortado():
+    report = [
+        {"file": "rapido.pdf", "pages": 2, "seconds": 0.1, "status": "ok"},
+        {"file": "x" * 80 + ".pdf", "pages": 40, "seconds": 3.25, "status": "ok"},
+        {"file": "lento.pdf", "pages": 0, "seconds": 120.0, "status": "timeout"},
+    ]
+    lines = format_parse_report(report, top=2).splitlines()
+
+    assert len(lines) == 3 and lines[0].startswith("archivo")
+    assert lines[1].startswith("lento.pdf") and lines[1].endswith("120.00  timeout")
+    assert lines[2].startswith("x" * 60 + " ") and "3.25" in lines[2]
@@ -0,0 +1,67 @@
+# tests/test_run_store.py
+
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.run_store import column, load_runs, question_runs, runs_to_frame
+
+
+class FakePage(list):
+    token = None
+
+
+class FakeClient:
+    tracking_uri = "sqlite:///fake.db"
+
+    def __init__(self):
+        self.runs = []
+        self.filtros = []
+
+    def add(self, run_id, start_time, status="FINISHED", params=None, metrics=None, tags=None):
+        self.runs.append(SimpleNamespace(
+            info=SimpleNamespace(run_id=run_id, run_name=run_id, start_time=start_time, status=status),
+            data=SimpleNamespace(params=params or {}, metrics=metrics or {}, tags=tags or {}),
+        ))
+
+    def search_runs(self, experiment_ids, filter_string="", order_by=None, max_results=None, page_token=None):
+        self.filtros.append(filter_string)
+        since = int(filter_string.split(">=")[1]) if filter_string else 0
+        return FakePage(r for r in self.runs if r.info.start_time >= since)
+
+
+def test_carga_incremental_y_snapshot(tmp_path):
+    client = FakeClient()
+    client.add("a", 100, params={"question": "q1"}, metrics={"qa_score": 1.0})
+    client.add("b", 200, status="RUNNING", params={"question": "q2"})
+    client.add("p", 300, tags={"eval_parent": "true"})
+
+    primera = load_runs("1", client=client, directory=str(tmp_path))
+    assert list(primera["run_id"]) == ["p", "b", "a"]
+    assert client.filtros == [""]
+
+    # El run en curso termina con métricas nuevas y llega otro run
+    client.runs[1].info.status = "FINISHED"
+    client.runs[1].data.metrics = {"qa_score": 0.0}
+    client.add("c", 400, params={"question": "q3"})
+
+    segunda = load_runs("1", client=client, directory=str(tmp_path))
+    assert client.filtros[-1] == "attributes.start_time >= 200"
+    assert list(segunda["run_id"]) == ["c", "p", "b", "a"]
+    assert segunda.set_index("run_id").loc["b", "metrics.qa_score"] == 0.0
+
+    # Sin runs en curso solo se pide desde el último start_time
+    load_runs("1", client=client, directory=str(tmp_path))
+    assert client.filtros[-1] == "attributes.start_time >= 400"
+
+
+def test_question_runs_descarta_padres():
+    client = FakeClient()
+    client.add("a", 100, params={"question": "q1"})
+    client.add("p", 200, tags={"eval_parent": "true"})
+
+    preguntas = question_runs(runs_to_frame(client.runs))
+    assert list(preguntas["run_id"]) == ["a"]
+    assert column(preguntas, "metrics.inexistente").isna().all()
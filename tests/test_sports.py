@@ -0,0 +1,108 @@
+# tests/test_sports.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from app.benchmark import fake_embeddings, fake_llms
+from app.bm25 import build_from_vectorstore as build_bm25
+from app.rag_pipeline import (build_chain, get_retriever, list_pdfs, load_vectorstore_from_disk, parse_by_file,
+                              persist_vectorstore, split_by_file)
+from app.sports import GENERAL, SportShards, detect_sport, load_sport_map, normalize_sport, tag_chunks
+
+PDFS = os.path.join(os.path.dirname(__file__), "..", "data", "pdfs")
+
+TEXTOS = {
+    "ciclismo": "El ciclista regula la cadencia de pedaleo en la bicicleta durante el entrenamiento",
+    "running": "El corredor ajusta la zancada y el trote antes del maratón en el entrenamiento",
+    "natacion": "El nadador mejora la brazada en la piscina durante el entrenamiento",
+    GENERAL: "La supercompensación y la recuperación ordenan la carga del entrenamiento",
+}
+
+
+def corpus(n=5):
+    docs = [
+        Document(page_content=f"{texto} semana {i}", metadata={"source": f"data/pdfs/{sport}.pdf", "page": i})
+        for sport, texto in TEXTOS.items() for i in range(n)
+    ]
+    return tag_chunks(docs)
+
+
+def indice(tmp_path, docs):
+    vectordb = FAISS.from_documents(docs, fake_embeddings(), ids=[f"c{i}" for i in range(len(docs))])
+    persist_vectorstore(vectordb, {}, 512, 50, str(tmp_path))
+    return load_vectorstore_from_disk(str(tmp_path), embeddings=fake_embeddings())
+
+
+def test_detecta_y_normaliza_disciplinas():
+    assert detect_sport(TEXTOS["ciclismo"]) == "ciclismo"
+    assert detect_sport("Una sola bicicleta") == GENERAL  # menos de SPORT_MIN_HITS menciones
+    assert detect_sport("ciclista bicicleta nadador piscina") == GENERAL  # empate
+    assert normalize_sport("Triatlón") == "triatlon"
+    assert normalize_sport("Otro") is None and normalize_sport(None) is None
+
+
+def test_etiqueta_origen_y_shards_por_alcance():
+    docs = corpus(2)
+    assert {d.metadata["source_file"] for d in docs} == {f"{s}.pdf" for s in TEXTOS}
+    shards = SportShards.build([d.metadata["sport"] for d in docs])
+    assert shards.counts() == {GENERAL: 2, "triatlon": 0, "ciclismo": 2, "running": 2, "natacion": 2}
+    assert shards.mask("Ciclismo").sum() == 4
+    assert shards.mask("Triatlón").sum() == 8
+    assert shards.mask("Otro") is None
+
+
+def test_la_disciplina_del_turno_limita_la_recuperacion(tmp_path):
+    vectordb = indice(tmp_path, corpus())
+    retriever = get_retriever(vectordb, str(tmp_path), mode="hybrid", k=8)
+
+    for sport, permitidos in [("Ciclismo", {"ciclismo", GENERAL}), ("Natación", {"natacion", GENERAL})]:
+        docs = retriever.invoke("entrenamiento de la semana", config={"metadata": {"sport": sport}})
+        assert docs and {d.metadata["sport"] for d in docs} <= permitidos
+
+    todos = retriever.invoke("entrenamiento de la semana", config={"metadata": {"sport": "Otro"}})
+    assert len({d.metadata["sport"] for d in todos}) > 2
+
+    densos = get_retriever(vectordb, str(tmp_path), mode="dense", k=8)
+    docs = densos.invoke("pedaleo", config={"metadata": {"sport": "Running"}})
+    assert docs and {d.metadata["sport"] for d in docs} <= {"running", GENERAL}
+
+
+def test_la_cadena_pasa_sport_de_las_entradas_al_retriever(tmp_path):
+    vectordb = indice(tmp_path, corpus())
+    llm, condense_llm = fake_llms()
+    chain = build_chain(vectordb, persist_path=str(tmp_path), llm=llm, condense_question_llm=condense_llm)
+
+    result = chain.invoke({"question": "¿Cómo entreno?", "chat_history": [], "sport": "Ciclismo"})
+    assert {d.metadata["sport"] for d in result["source_documents"]} <= {"ciclismo", GENERAL}
+
+
+def test_bm25_de_indices_sin_shards_sigue_buscando_en_todo(tmp_path):
+    docs = corpus(1)
+    vectordb = FAISS.from_documents(docs, fake_embeddings())
+    lexical = build_bm25(vectordb)
+    shards = SportShards.build([d.metadata["sport"] for d in docs])
+    assert len(lexical.search("entrenamiento", 10)) == 4
+    assert len(lexical.search("entrenamiento", 10, mask=shards.mask("Running"))) == 2
+
+
+def test_distribucion_de_disciplinas_en_el_corpus_incluido(monkeypatch):
+    # Todos los PDF incluidos están clasificados a nivel de archivo (material general)
+    sport_map = load_sport_map(os.path.join(PDFS, "sports.json"))
+    files = list_pdfs(PDFS)
+    assert set(sport_map) == set(files)
+
+    docs_by_file = parse_by_file(files, PDFS)
+    hashes = {file: file for file in files}
+    monkeypatch.chdir(os.path.join(PDFS, "..", ".."))  # SPORT_MAP_FILE es relativo a la raíz del repo
+    chunks = split_by_file(docs_by_file, hashes, 512, 50)[0]
+    shards = SportShards.build([c.metadata["sport"] for c in chunks])
+    assert shards.counts() == {GENERAL: len(chunks), "triatlon": 0, "ciclismo": 0, "running": 0, "natacion": 0}
+
+    # Sin el mapa, el detector por chunk apenas encuentra disciplinas en este corpus
+    detectadas = [detect_sport(c.page_content) for c in chunks]
+    assert detectadas.count(GENERAL) / len(detectadas) > 0.95
@@ -0,0 +1,52 @@
+# tests/test_streaming.py
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.documents import Document
+
+from app.streaming import StreamHandler, format_sources
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fuentes_antes_que_tokens_y_ttft():
+    clock, eventos = FakeClock(), []
+    handler = StreamHandler(
+        on_token=lambda token, texto: eventos.append(("token", texto)),
+        on_sources=lambda docs: eventos.append(("fuentes", len(docs))),
+        clock=clock,
+    )
+    clock.now = 0.2
+    handler.on_retriever_end([Document(page_content="a"), Document(page_content="b")])
+    clock.now = 0.9
+    handler.on_llm_new_token("Hola")
+    clock.now = 1.5
+    handler.on_llm_new_token(" atleta")
+
+    assert eventos == [("fuentes", 2), ("token", "Hola"), ("token", "Hola atleta")]
+    assert handler.timings() == {"retrieval_s": 0.2, "ttft_s": 0.9, "total_s": 1.5}
+
+
+def test_sin_tokens_el_ttft_es_el_total():
+    clock = FakeClock()
+    handler = StreamHandler(clock=clock)
+    clock.now = 0.05
+    assert handler.timings()["ttft_s"] == 0.05
+
+
+def test_format_sources_sin_repetidos():
+    docs = [
+        Document(page_content="x", metadata={"source": "data/pdfs/plan.pdf", "page": 0}),
+        Document(page_content="y", metadata={"source": "data/pdfs/plan.pdf", "page": 0}),
+        Document(page_content="z", metadata={"source": "data/pdfs/nutricion.pdf"}),
+    ]
+    assert format_sources(docs) == "- plan.pdf, p. 1\n- nutricion.pdf"
@@ -0,0 +1,126 @@
+# tests/test_streaming_ingest.py
+
+import os
+import sys
+import shutil
+from itertools import chain
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import mlflow
+import pytest
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+from app.benchmark import fake_embeddings
+from app.docstore import DOCSTORE_FILE, INDEX_FILE, PICKLE_FILE, SQLiteDocstore
+from app.rag_pipeline import (chunk_id, get_splitter, load_manifest, load_vectorstore_from_disk, save_vectorstore,
+                              split_by_file)
+from app.streaming_ingest import IngestProgress, index_stream, iter_chunks
+
+PDF = os.path.join(os.path.dirname(__file__), "..", "data", "pdfs", "EstructuraSesion_cas.pdf")
+
+
+class EmbeddingsContados:
+    """Embeddings falsos que registran el tamaño de cada lote."""
+
+    def __init__(self):
+        self.inner = fake_embeddings()
+        self.lotes = []
+
+    def embed_documents(self, texts):
+        self.lotes.append(len(texts))
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.inner.embed_query(text)
+
+
+def paginas_por_archivo():
+    texto = "La carga de entrenamiento combina volumen, intensidad y densidad de los estímulos. " * 12
+    return {
+        file: [Document(page_content=f"{texto} Página {i}.", metadata={"source": f"data/pdfs/{file}", "page": i})
+               for i in range(n)]
+        for file, n in [("a.pdf", 3), ("b.pdf", 2)]
+    }
+
+
+@pytest.fixture
+def entorno(tmp_path, monkeypatch):
+    # Sin red ni artefactos en el repo: embeddings falsos, caché y MLflow en tmp_path
+    monkeypatch.setattr("langchain_openai.OpenAIEmbeddings", fake_embeddings)
+    monkeypatch.setattr("app.cache.EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.sqlite"))
+    monkeypatch.chdir(tmp_path)  # artefactos de MLflow (./mlruns)
+    previo = mlflow.get_tracking_uri()
+    mlflow.set_tracking_uri(f"sqlite:///{tmp_path / 'mlflow.db'}")
+    pdfs = tmp_path / "pdfs"
+    pdfs.mkdir()
+    shutil.copy(PDF, pdfs)
+    yield tmp_path
+    mlflow.set_tracking_uri(previo)
+
+
+def test_iter_chunks_genera_los_mismos_ids_y_chunks_que_split_by_file():
+    docs_by_file = paginas_por_archivo()
+    hashes = {"a.pdf": "a" * 64, "b.pdf": "b" * 64}
+
+    chunks, ids, entries, _ = split_by_file(docs_by_file, hashes, 200, 20)
+    en_streaming, entradas = [], {}
+    for cid, chunk in iter_chunks(chain(*docs_by_file.values()), get_splitter(200, 20), hashes, entradas, chunk_id,
+                                  IngestProgress(verbose=False)):
+        en_streaming.append((cid, chunk.page_content))
+
+    assert [cid for cid, _ in en_streaming] == ids
+    assert [texto for _, texto in en_streaming] == [c.page_content for c in chunks]
+    assert {f: e["chunk_ids"] for f, e in entradas.items()} == {f: e["chunk_ids"] for f, e in entries.items()}
+
+
+def test_index_stream_embebe_por_lotes_y_escribe_los_textos_en_sqlite(tmp_path):
+    docs_by_file = paginas_por_archivo()
+    chunks, ids, _, _ = split_by_file(docs_by_file, {"a.pdf": "a" * 64, "b.pdf": "b" * 64}, 200, 20)
+    embeddings = EmbeddingsContados()
+
+    vectordb = index_stream(zip(ids, chunks), embeddings, batch_size=4, docstore_path=str(tmp_path / "docs.sqlite"))
+
+    assert len(chunks) > 8
+    assert embeddings.lotes == [4] * (len(chunks) // 4) + ([len(chunks) % 4] if len(chunks) % 4 else [])
+    assert isinstance(vectordb.docstore, SQLiteDocstore)
+    assert [vectordb.index_to_docstore_id[i] for i in range(len(ids))] == ids
+    assert vectordb.docstore.search(ids[5]).page_content == chunks[5].page_content
+
+    en_memoria = index_stream(zip(ids, chunks), fake_embeddings(), batch_size=4)
+    assert isinstance(en_memoria.docstore, InMemoryDocstore)
+
+
+def test_index_stream_sin_chunks_lanza_un_error_claro():
+    with pytest.raises(ValueError, match="ningún chunk"):
+        index_stream(iter(()), fake_embeddings())
+
+
+def test_ingesta_en_streaming_coincide_con_la_ingesta_por_lotes(entorno):
+    pdfs = str(entorno / "pdfs")
+    streaming, lotes = str(entorno / "streaming"), str(entorno / "lotes")
+    save_vectorstore(persist_path=streaming, path=pdfs, streaming=True, batch_size=8, dedup=False)
+    save_vectorstore(persist_path=lotes, path=pdfs, streaming=False, dedup=False)
+
+    # Sin pickle: el docstore SQLite es la única copia de los textos
+    assert not os.path.exists(os.path.join(streaming, PICKLE_FILE))
+    assert os.path.exists(os.path.join(streaming, INDEX_FILE)) and os.path.exists(os.path.join(streaming, DOCSTORE_FILE))
+    assert not os.path.exists(os.path.join(streaming, DOCSTORE_FILE + ".building"))
+    assert load_manifest(streaming)["files"] == load_manifest(lotes)["files"]
+
+    for mmap in (True, False):  # sin index.pkl también se carga con mmap=False
+        vectordb = load_vectorstore_from_disk(streaming, mmap=mmap, embeddings=fake_embeddings())
+        esperado = load_vectorstore_from_disk(lotes, embeddings=fake_embeddings())
+        assert vectordb.index_to_docstore_id == esperado.index_to_docstore_id
+        consulta = "estructura de la sesión de entrenamiento"
+        assert [d.id for d in vectordb.similarity_search(consulta, k=3)] == \
+               [d.id for d in esperado.similarity_search(consulta, k=3)]
+
+
+def test_ingesta_sin_texto_lanza_un_error_claro(entorno):
+    vacio = entorno / "vacio"
+    vacio.mkdir()
+    for streaming in (True, False):
+        with pytest.raises(ValueError, match="ningún chunk"):
+            save_vectorstore(persist_path=str(entorno / "vs"), path=str(vacio), streaming=streaming)
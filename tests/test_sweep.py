@@ -0,0 +1,121 @@
+# tests/test_sweep.py
+
+import os
+import sys
+import shutil
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import mlflow
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app import sweep
+from app.benchmark import fake_embeddings, fake_llms
+from app.rag_pipeline import build_chain, load_vectorstore_from_disk
+from app.run_eval import criteria
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+PDF = os.path.join(ROOT, "data", "pdfs", "EstructuraSesion_cas.pdf")
+DATASET = [{"question": "¿Cómo se estructura una sesión?", "answer": "Calentamiento, parte principal y vuelta a la calma"},
+           {"question": "¿Qué es el calentamiento?", "answer": "La fase inicial de la sesión"}]
+
+
+class EmbeddingsContados(Embeddings):
+    """Embeddings falsos que anotan cada texto de documento enviado a embeber."""
+
+    textos = []
+
+    def __init__(self):
+        self.inner = fake_embeddings()
+
+    def embed_documents(self, texts):
+        EmbeddingsContados.textos.extend(texts)
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.inner.embed_query(text)
+
+
+async def juez_falso(question, prediction, reference):
+    return {
+        "qa_verdict": "CORRECT",
+        "qa_score": 1.0,
+        "crit_scores": {crit: 0.9 for crit in criteria},
+        "crit_values": {crit: "ok" for crit in criteria},
+        "judge_tokens": 0,
+    }
+
+
+def cadena_falsa(vectordb, **kwargs):
+    llm, condense_llm = fake_llms()
+    return build_chain(vectordb, llm=llm, condense_question_llm=condense_llm, **kwargs)
+
+
+@pytest.fixture
+def entorno(tmp_path, monkeypatch):
+    # Sin red ni procesos: embeddings, cadena y juez falsos; pools en hilos; todo en tmp_path
+    monkeypatch.setattr("langchain_openai.OpenAIEmbeddings", EmbeddingsContados)
+    monkeypatch.setattr(EmbeddingsContados, "textos", [])
+    monkeypatch.setattr("app.cache.EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.sqlite"))
+    monkeypatch.setattr(sweep, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(sweep, "build_chain", cadena_falsa)
+    monkeypatch.setattr(sweep, "build_judge_llm", lambda: None)
+    monkeypatch.setattr(sweep, "build_grader", lambda llm: juez_falso)
+    monkeypatch.setattr("app.rag_pipeline.PROMPT_DIR", os.path.join(ROOT, "app", "prompts"))
+    monkeypatch.chdir(tmp_path)
+    previo = mlflow.get_tracking_uri()
+    mlflow.set_tracking_uri(f"sqlite:///{tmp_path / 'mlflow.db'}")
+    (tmp_path / "pdfs").mkdir()
+    shutil.copy(PDF, tmp_path / "pdfs")
+    yield tmp_path
+    mlflow.set_tracking_uri(previo)
+
+
+def barrer(entorno, sweep_id):
+    return sweep.run_sweep([256, 512], [0, 50], ["v1_asistente_rrhh", "v2_resumido_directo"], [2], DATASET,
+                           path=str(entorno / "pdfs"), directory=str(entorno / "sweeps"), workers=2,
+                           experiment="sweep_test", sweep_id=sweep_id)
+
+
+def test_cada_texto_unico_se_embebe_una_sola_vez_entre_configuraciones(entorno):
+    outcomes = barrer(entorno, "s1")
+
+    embebidos = Counter(EmbeddingsContados.textos)
+    assert embebidos and max(embebidos.values()) == 1
+
+    textos_indices = set()
+    for cs, co in [(256, 0), (256, 50), (512, 0), (512, 50)]:
+        vectordb = load_vectorstore_from_disk(sweep.index_path(cs, co, str(entorno / "sweeps")),
+                                              embeddings=fake_embeddings())
+        textos_indices |= {vectordb.docstore.search(i).page_content for i in vectordb.index_to_docstore_id.values()}
+    assert set(embebidos) == textos_indices
+    assert len(outcomes) == 8 and all(len(o["results"]) == len(DATASET) for o in outcomes)
+
+    # Segundo barrido: los índices se reutilizan y no se embebe nada
+    EmbeddingsContados.textos.clear()
+    barrer(entorno, "s2")
+    assert EmbeddingsContados.textos == []
+
+
+def test_los_runs_llevan_sweep_id_y_sweep_config(entorno):
+    outcomes = barrer(entorno, "s1")
+
+    client = mlflow.tracking.MlflowClient()
+    experiment = client.get_experiment_by_name("sweep_test")
+    runs = client.search_runs([experiment.experiment_id], filter_string="tags.sweep_id = 's1'")
+    padres = [r for r in runs if r.data.tags.get("eval_parent") == "true"]
+    hijos = [r for r in runs if "mlflow.parentRunId" in r.data.tags]
+
+    esperadas = {sweep.config_name(o["config"]) for o in outcomes}
+    assert len(esperadas) == 8
+    assert {r.data.tags["sweep_config"] for r in padres} == esperadas
+    assert {r.info.run_id for r in padres} == {o["run_id"] for o in outcomes}
+    assert len(hijos) == 8 * len(DATASET)
+    assert all(h.data.tags["sweep_config"] in esperadas for h in hijos)
+    for padre in padres:
+        config = next(o["config"] for o in outcomes if o["run_id"] == padre.info.run_id)
+        assert padre.data.params["prompt_version"] == config["prompt_version"]
+        assert padre.data.params["chunk_size"] == str(config["chunk_size"])
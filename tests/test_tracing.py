@@ -0,0 +1,76 @@
+# tests/test_tracing.py
+
+import os
+import sys
+import json
+from itertools import cycle
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.retrievers import BaseRetriever
+
+from app.tracing import TracedEmbeddings, Tracer, span, stage_summary
+
+
+class FakeRetriever(BaseRetriever):
+    def _get_relevant_documents(self, query, *, run_manager):
+        TracedEmbeddings(DeterministicFakeEmbedding(size=8)).embed_query(query)
+        with span("vector_search"):
+            return [Document(page_content="umbral de lactato"), Document(page_content="FTP")]
+
+
+def turno(tracer, pregunta):
+    condense = GenericFakeChatModel(messages=cycle(["¿Qué es el FTP?"]), tags=["condense_question"])
+    answer = GenericFakeChatModel(messages=cycle(["El FTP es la potencia umbral."]), tags=["generation"])
+    with tracer.turn(ui="test") as handler:
+        config = {"callbacks": [handler]}
+        standalone = condense.invoke(pregunta, config=config).content
+        docs = FakeRetriever().invoke(standalone, config=config)
+        answer.invoke(standalone + "\n" + "\n".join(d.page_content for d in docs), config=config)
+    return handler
+
+
+def test_spans_por_etapa_anidados(tmp_path):
+    tracer = Tracer(path=str(tmp_path / "spans.jsonl"))
+    handler = turno(tracer, "¿Y eso?")
+
+    spans = {s["stage"]: s for s in handler.spans}
+    assert set(spans) == {"turn", "condense_question", "retrieval", "embed_query", "vector_search", "generation"}
+    turn_id, retrieval_id = spans["turn"]["span_id"], spans["retrieval"]["span_id"]
+    assert spans["condense_question"]["parent_span_id"] == turn_id
+    assert spans["embed_query"]["parent_span_id"] == retrieval_id
+    assert spans["vector_search"]["parent_span_id"] == retrieval_id
+    assert spans["retrieval"]["attributes"]["retrieval.documents"] == 2
+
+
+def test_archivo_otlp_y_resumen(tmp_path):
+    tracer = Tracer(path=str(tmp_path / "spans.jsonl"))
+    for i in range(3):
+        turno(tracer, f"pregunta {i}")
+
+    lines = (tmp_path / "spans.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 3  # una traza por turno
+    spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert len({s["traceId"] for s in spans}) == 1
+    assert all(int(s["endTimeUnixNano"]) >= int(s["startTimeUnixNano"]) for s in spans)
+
+    summary = tracer.summary()
+    assert list(summary)[0] == "turn"
+    assert summary["generation"]["count"] == 3
+    assert summary["generation"]["p50_s"] <= summary["generation"]["p95_s"]
+
+
+def test_span_fuera_de_turno_no_registra():
+    with span("vector_search") as extra:
+        assert extra is None
+
+
+def test_stage_summary_ignora_etapas_desconocidas():
+    spans = [
+        {"stage": "chain", "start_ns": 0, "end_ns": 10},
+        {"stage": "retrieval", "start_ns": 0, "end_ns": 2_000_000_000},
+    ]
+    assert stage_summary(spans) == {"retrieval": {"p50_s": 2.0, "p95_s": 2.0, "count": 1}}